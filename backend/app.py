@@ -1,14 +1,18 @@
-from fastapi import FastAPI, HTTPException, Depends, status, WebSocket, WebSocketDisconnect
+import time
+STARTUP_BEGAN = time.perf_counter()  # before the framework imports, which are most of a cold start
+
+from fastapi import FastAPI, HTTPException, Depends, Request, status, WebSocket, WebSocketDisconnect, UploadFile, File, Form
 from fastapi.exceptions import RequestValidationError
-from typing import List
+from fastapi.encoders import jsonable_encoder
+from fastapi.concurrency import run_in_threadpool
+from typing import List, Optional
 from fastapi.security import OAuth2PasswordRequestForm
-from fastapi.staticfiles import StaticFiles
-import uvicorn
 from schemas import (
     GruppenRequest,
     FachRequest,
     FachRenameRequest,
-    FachDeleteRequest
+    FachDeleteRequest,
+    FachCloneRequest
 )
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
@@ -18,34 +22,53 @@ from db_operations import (
     create_flashcard,
     add_subject_to_group,
     get_group_id,update_subject_name,
+    clone_subject,
     delete_group,
     get_group,
     delete_user_from_group,get_user_groups,
-    get_subject_cards,
+    find_subject,
+    import_flashcards,
+    get_subject_cards_by_id,
+    get_subject_cards_page,
+    iter_subject_cards,
+    search_group_flashcards,
     delete_subject_from_group,get_invitations,
     create_invitation,
     add_user_to_group,
     delete_invitation,
     update_flashcard,
     delete_flashcard,
+    apply_flashcard_batch,
     start_game,
     get_game_state,
     cast_vote,
     get_question_votes,
     end_question,
     next_question,
+    end_game,
     add_chat_message,
     calculate_final_result,
-    get_chat_messages
+    get_chat_messages,
+    get_cache_stats,
+    get_game_stats,
+    get_subject_card_stats,
+    get_game_history,
+    get_group_analytics_report,
+    expire_abandoned_sessions,
+    release_finished_games,
+    forget_sessions,
+    purge_stale_invitations,
+    purge_orphaned_session_rows
 )
-import os
-from fastapi.responses import JSONResponse, FileResponse
-from sqlalchemy.orm import Session
-from database import get_db, engine
-from auth import hash_password, verify_password, create_access_token, create_refresh_token, get_current_user, validate_refresh_token, verify_token_websocket
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from sqlalchemy.orm import Session, configure_mappers
+from database import get_db, ensure_incremental_vacuum, ensure_schema, sqlite_housekeeping
+from flashcard_search import ensure_search_index
+from auth import hash_password_async, verify_password_async, needs_rehash, create_access_token, issue_refresh_token, rotate_refresh_token, prune_expired_refresh_tokens, get_current_user, verify_token_websocket
+from auth import principal_cache
 from schemas import (
     UserCreate, Token, TokenRefresh, UserResponse, 
-    FlashcardCreate, FlashcardUpdate, FlashcardDelete,
+    FlashcardCreate, FlashcardUpdate, FlashcardDelete, FlashcardBatch,
     SessionCreate, SessionResponse, SessionDetails, SessionJoin,
     InvitationSend, InvitationResponse, PendingInvitation, VoteCreate, 
     ChatMessageCreate
@@ -53,24 +76,79 @@ from schemas import (
 )
 from models import (
     User, RefreshToken, Base, QuizSession, SessionParticipant,
-    LobbyInvitation, Subject, Group, Flashcard
+    LobbyInvitation, Subject, Group, Flashcard, GameState
 )
 from datetime import datetime
 import json
 import random
 import string
 from websocket_manager import manager
+from game_actor import game_actors, CommandRejected
+from game_state_cache import game_state_cache, etag_matches
+from session_access import session_access
+from deck_cache import deck_cache
+from deck_import import parse_import_file, detect_format, IMPORT_FORMATS
 from lobby_routes import router as lobby_router
+from maintenance import maintenance
+from frontend_assets import frontend
+from contextlib import asynccontextmanager
+import asyncio
+import importlib
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+MAX_DECK_PAGE_SIZE = 500
+MAX_SEARCH_PAGE_SIZE = 100
+MAX_HISTORY_PAGE_SIZE = 100
+CACHE_STATS_ENABLED = os.getenv("CACHE_STATS_ENABLED", "") == "1"  # cache internals, for debugging a worker only
 
+# Modules no request needs right away; imported on a worker thread a little after the server is up,
+# so they don't hold the GIL while the first requests come in
+DEFERRED_IMPORTS = ("jose.jwt", "group_analytics")
+DEFERRED_IMPORT_DELAY = 5  # seconds
 
-app = FastAPI()
 
-Base.metadata.create_all(bind=engine)
+def import_deferred_modules():
+    started = time.perf_counter()
+    for module in DEFERRED_IMPORTS:
+        importlib.import_module(module)
+    logger.info("Deferred imports loaded in %.0f ms", (time.perf_counter() - started) * 1000)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Bring the database up to date, load the frontend and start maintenance, timing each step"""
+    timings = {"imports": MODULE_LOADED - STARTUP_BEGAN, "server": time.perf_counter() - MODULE_LOADED}
+
+    def step(name, function):
+        started = time.perf_counter()
+        result = function()
+        timings[name] = time.perf_counter() - started
+        return result
 
-if os.path.exists("../frontend/build/static"):
-    app.mount("/static", StaticFiles(directory="../frontend/build/static"), name="static")
-elif os.path.exists("frontend/build/static"):
-    app.mount("/static", StaticFiles(directory="frontend/build/static"), name="static")
+    step("mappers", configure_mappers)  # otherwise paid by the first query
+    migrated = step("schema", ensure_schema)
+    step("auto_vacuum", ensure_incremental_vacuum)  # one VACUUM for databases from before it was set
+    search = step("search_index", ensure_search_index)
+    step("frontend", frontend.load)
+    step("maintenance", maintenance.start)
+    timings["total"] = time.perf_counter() - STARTUP_BEGAN
+
+    app.state.startup_timings = {name: round(seconds * 1000, 1) for name, seconds in timings.items()}
+    logger.info("Startup in {total:.0f} ms: imports {imports:.0f} ms, server {server:.0f} ms, mappers {mappers:.0f} ms, "
+                "schema {schema:.0f} ms, search index {search_index:.0f} ms, frontend {frontend:.0f} ms".format(
+                    **app.state.startup_timings)
+                + (" (schema migrated)" if migrated else "") + f"; flashcard search: {search}")
+
+    loop = asyncio.get_running_loop()
+    loop.call_later(DEFERRED_IMPORT_DELAY, loop.run_in_executor, None, import_deferred_modules)
+    yield
+    maintenance.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -84,34 +162,27 @@ app.add_middleware(
 app.include_router(lobby_router)
 
 
-def cleanup_old_sessions():
-    """Clean up all existing sessions on server startup"""
-    from database import SessionLocal
-    from models import QuizSession, SessionParticipant, GameState, Vote, ChatMessage
-    
-    db = SessionLocal()
-    try:
-        db.query(Vote).delete()
-        db.query(ChatMessage).delete()
-        db.query(GameState).delete()
-        db.query(SessionParticipant).delete()
-        db.query(QuizSession).delete()
-        
-        db.commit()
-        
-       
-        
-    except Exception:
-        db.rollback()
-    finally:
-        db.close()
+def forget_games(session_ids: list) -> int:
+    """Drop caches and replay buffers of sessions a maintenance job removed; runs on the event loop"""
+    forget_sessions(session_ids)
+    for session_id in session_ids:
+        manager.forget_game(session_id)
+    return len(session_ids)
+
+
+maintenance.add_job("expire_abandoned_sessions", 600, expire_abandoned_sessions, on_loop=forget_games)
+maintenance.add_job("release_finished_games", 600, release_finished_games, on_loop=forget_games)
+maintenance.add_job("purge_stale_invitations", 3600, purge_stale_invitations)
+maintenance.add_job("purge_orphaned_session_rows", 6 * 3600, lambda: len(purge_orphaned_session_rows()), run_at_start=True)
+maintenance.add_job("prune_refresh_tokens", 3600, prune_expired_refresh_tokens, run_at_start=True)
+maintenance.add_job("sqlite_housekeeping", 900, sqlite_housekeeping)
 
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request, exc):
     return JSONResponse(
         status_code=422,
-        content={"detail": exc.errors(), "body": str(exc.body)}
+        content={"detail": jsonable_encoder(exc.errors()), "body": str(exc.body)}
     )
 
 
@@ -134,7 +205,7 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
                 detail="Email already registered"
             )
     
-    hashed_password = hash_password(user_data.password)
+    hashed_password = await hash_password_async(user_data.password)
     new_user = User(
         username=user_data.username,
         email=user_data.email,
@@ -148,14 +219,7 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     db.refresh(new_user)
     
     access_token = create_access_token(data={"sub": new_user.username})
-    refresh_token_str, expires_at = create_refresh_token()
-    
-    refresh_token = RefreshToken(
-        token=refresh_token_str,
-        user_id=new_user.id,
-        expires_at=expires_at
-    )
-    db.add(refresh_token)
+    refresh_token_str = issue_refresh_token(db, new_user.id)
     db.commit()
     
     return {
@@ -169,7 +233,7 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
     """Login with username and password"""
     user = db.query(User).filter(User.username.ilike(form_data.username)).first()
     
-    if not user or not verify_password(form_data.password, user.password_hash):
+    if not user or not await verify_password_async(form_data.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -182,15 +246,11 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
             detail="Inactive user"
         )
     
-    access_token = create_access_token(data={"sub": user.username})
-    refresh_token_str, expires_at = create_refresh_token()
+    if needs_rehash(user.password_hash):
+        user.password_hash = await hash_password_async(form_data.password)  # saved with the refresh token below
     
-    refresh_token = RefreshToken(
-        token=refresh_token_str,
-        user_id=user.id,
-        expires_at=expires_at
-    )
-    db.add(refresh_token)
+    access_token = create_access_token(data={"sub": user.username})
+    refresh_token_str = issue_refresh_token(db, user.id)
     db.commit()
     
     return {
@@ -201,20 +261,21 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
 
 @app.post("/refresh", response_model=Token)
 async def refresh_token(token_data: TokenRefresh, db: Session = Depends(get_db)):
-    """Get new access token using refresh token"""
-    user = validate_refresh_token(token_data.refresh_token, db)
+    """Get new access token using refresh token; the refresh token is rotated"""
+    rotated = rotate_refresh_token(token_data.refresh_token, db)
     
-    if not user:
+    if not rotated:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid refresh token"
         )
     
+    user, new_refresh_token = rotated
     access_token = create_access_token(data={"sub": user.username})
     
     return {
         "access_token": access_token,
-        "refresh_token": token_data.refresh_token,
+        "refresh_token": new_refresh_token,
         "token_type": "bearer"
     }
 
@@ -227,9 +288,9 @@ async def logout(current_user: User = Depends(get_current_user), db: Session = D
     return {"message": "Successfully logged out"}
 
 @app.get("/me", response_model=UserResponse)
-async def get_me(current_user: User = Depends(get_current_user)):
+async def get_me(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
     """Get current user info"""
-    return current_user
+    return db.query(User).filter(User.id == current_user.id).first()
         
 
 @app.post("/gruppe-erstellen")
@@ -280,6 +341,47 @@ async def create_flashcard_new(flashcard_data: FlashcardCreate, current_user: Us
         )
 
 
+@app.post("/flashcard/import")
+async def import_flashcards_route(
+    file: UploadFile = File(...),
+    fach: str = Form(...),
+    gruppe: str = Form(...),
+    format: Optional[str] = Form(None),
+    current_user: User = Depends(get_current_user)
+):
+    """Import a CSV, Anki text, JSON or NDJSON deck; streams NDJSON progress lines and a summary"""
+    if not is_user_in_group(current_user.username, gruppe):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You are not a member of this group"
+        )
+    
+    import_format = format or detect_format(file.filename or "")
+    if import_format not in IMPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unbekanntes Dateiformat, erlaubt sind: {', '.join(IMPORT_FORMATS)}"
+        )
+    
+    subject = find_subject(fach, gruppe)
+    if not subject:
+        result = add_subject_to_group(fach, gruppe)
+        if result:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Fehler beim Erstellen des Fachs: {result}"
+            )
+        subject = find_subject(fach, gruppe)
+    
+    rows = parse_import_file(file.file, import_format)
+    
+    def generate():
+        for report in import_flashcards(subject.id, rows):
+            yield json.dumps(report) + "\n"
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
 @app.post("/fach-erstellen")
 async def create_new_fach(fachrequest: FachRequest, current_user: User = Depends(get_current_user)):
 
@@ -379,6 +481,51 @@ async def delete_fach(delete_request: FachDeleteRequest, current_user: User = De
     return {"message": "Success!", "content": f"Fach '{delete_request.fach_name}' wurde erfolgreich gelöscht"}
 
 
+@app.post("/fach-kopieren")
+def clone_fach(clone_request: FachCloneRequest, current_user: User = Depends(get_current_user)):
+    """Copy a subject with all its flashcards into another (or the same) group.
+
+    A plain def, so FastAPI runs it on the threadpool: copying a large deck doesn't hold up the event loop.
+    """
+    username = current_user.username
+    new_name = (clone_request.neuer_fach_name or clone_request.fach_name).strip()
+    
+    if not new_name:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Der neue Fachname darf nicht leer sein"
+        )
+    
+    for gruppen_name in (clone_request.gruppen_name, clone_request.ziel_gruppen_name):
+        if not is_user_in_group(username, gruppen_name):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"Sie sind nicht Mitglied der Gruppe '{gruppen_name}'"
+            )
+    
+    subject = find_subject(clone_request.fach_name, clone_request.gruppen_name)
+    if not subject:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Das Fach '{clone_request.fach_name}' existiert nicht in der Gruppe '{clone_request.gruppen_name}'"
+        )
+    
+    result = clone_subject(subject.id, get_group_id(clone_request.ziel_gruppen_name), new_name)
+    
+    if result == "Ein Fach mit diesem Namen existiert bereits in der Gruppe":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Ein Fach mit dem Namen '{new_name}' existiert bereits in der Gruppe '{clone_request.ziel_gruppen_name}'"
+        )
+    elif isinstance(result, str):
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Fehler beim Kopieren des Fachs: {result}"
+        )
+    
+    return {"message": "Success!", "content": {"subject_id": result, "fach_name": new_name, "gruppen_name": clone_request.ziel_gruppen_name}}
+
+
 @app.delete("/delete-group")
 async def delete_group_route(gruppenrequest: GruppenRequest, current_user: User = Depends(get_current_user)):
     print("gruppe wird gelöscht!")
@@ -404,7 +551,7 @@ async def leave_group_route(gruppenrequest: GruppenRequest, current_user: User =
 
       
      
-        if len(get_group(gruppenrequest.gruppen_name)["users"]) == 1:
+        if get_group(gruppenrequest.gruppen_name)["member_count"] == 1:
             gelöschte_gruppe = delete_group(gruppenrequest.gruppen_name)
             print(gelöschte_gruppe)
             print("Nur noch ein user. Gruppe wird gelöscht.")
@@ -441,19 +588,103 @@ async def get_gruppen_info(current_user: User = Depends(get_current_user)):
 
     return {"message":"success","content":gruppen}
 
+@app.get("/api/cache-stats", include_in_schema=CACHE_STATS_ENABLED)
+async def get_cache_stats_route(current_user: User = Depends(get_current_user)):
+    """Hit rates of this worker's lookup caches; only served with CACHE_STATS_ENABLED=1"""
+    if not CACHE_STATS_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    return {"message":"success","content":{**get_cache_stats(), "principals": principal_cache.stats()}}
+
 @app.get("/get-subject-cards/")
-async def get_subject_cards_by_name(subjectname:str="OOP mit deiner Mum",gruppenname: str = "Bango"):
-    print(f"Getting subject cards for: '{subjectname}' in group: '{gruppenname}'")
-    cards: dict = get_subject_cards(subjectname,gruppenname)
-    print(f"Cards result: {cards}")
-    if not cards:
+async def get_subject_cards_by_name(request: Request, subjectname:str="OOP mit deiner Mum",gruppenname: str = "Bango"):
+    subject = find_subject(subjectname, gruppenname)
+    if not subject:
         print(f"Subject '{subjectname}' not found in group '{gruppenname}'")
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Das Fach '{subjectname}' existiert nicht in der Gruppe '{gruppenname}'"
         )
     
-    return {"message":"success","content":cards}
+    version = subject.cards_version
+    if etag_matches(request.headers.get("if-none-match"), deck_cache.etag(subject.id, version)):
+        return Response(status_code=304, headers={"ETag": deck_cache.etag(subject.id, version), "Cache-Control": "no-cache"})
+    
+    body = deck_cache.get(subject.id, version)
+    if body is None:
+        cards = get_subject_cards_by_id(subject.id)
+        if not cards:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Das Fach '{subjectname}' existiert nicht in der Gruppe '{gruppenname}'"
+            )
+        version = cards["version"]
+        body = json.dumps({"message":"success","content":cards}).encode("utf-8")
+        deck_cache.store(subject.id, version, body)
+    
+    return Response(content=body, media_type="application/json", headers={"ETag": deck_cache.etag(subject.id, version), "Cache-Control": "no-cache"})
+
+@app.get("/get-subject-cards/page")
+async def get_subject_cards_page_by_name(subjectname: str, gruppenname: str, after: int = 0, limit: int = 100, current_user: User = Depends(get_current_user)):
+    """Cursor-paginated deck; pass next_cursor as after to get the next page"""
+    if not is_user_in_group(current_user.username, gruppenname):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You are not a member of this group"
+        )
+    
+    subject = find_subject(subjectname, gruppenname)
+    if not subject:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Das Fach '{subjectname}' existiert nicht in der Gruppe '{gruppenname}'"
+        )
+    
+    limit = max(1, min(limit, MAX_DECK_PAGE_SIZE))
+    page = get_subject_cards_page(subject.id, after, limit)
+    return {"message":"success","content":page}
+
+@app.get("/get-subject-cards/stream")
+async def stream_subject_cards_by_name(subjectname: str, gruppenname: str, current_user: User = Depends(get_current_user)):
+    """Whole deck as NDJSON: one header line, then one line per card"""
+    if not is_user_in_group(current_user.username, gruppenname):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You are not a member of this group"
+        )
+    
+    subject = find_subject(subjectname, gruppenname)
+    if not subject:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Das Fach '{subjectname}' existiert nicht in der Gruppe '{gruppenname}'"
+        )
+    
+    def generate():
+        yield json.dumps({"subject_id": subject.id, "subject_name": subjectname, "version": subject.cards_version}) + "\n"
+        for card in iter_subject_cards(subject.id):
+            yield json.dumps(card) + "\n"
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+@app.get("/flashcard/search")
+async def search_flashcards_route(q: str, gruppenname: str, subjectname: Optional[str] = None, limit: int = 20, offset: int = 0, current_user: User = Depends(get_current_user)):
+    """Ranked full-text search in the questions and answers of a group, optionally limited to one subject"""
+    if not is_user_in_group(current_user.username, gruppenname):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You are not a member of this group"
+        )
+    
+    limit = max(1, min(limit, MAX_SEARCH_PAGE_SIZE))
+    result = search_group_flashcards(gruppenname, q, subjectname, limit, max(0, offset))
+    
+    if isinstance(result, str):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=result
+        )
+    
+    return {"message":"success","content":result}
 
 @app.get("/get-invitations")
 async def get_those_invitations(current_user: User = Depends(get_current_user)):
@@ -617,6 +848,39 @@ async def delete_flashcard_endpoint(flashcard_data: FlashcardDelete, current_use
     
 
 
+@app.post("/flashcard/batch")
+async def flashcard_batch_endpoint(batch: FlashcardBatch, current_user: User = Depends(get_current_user)):
+    """Apply several create/update/delete operations on one subject in one transaction"""
+    if not is_user_in_group(current_user.username, batch.gruppe):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You are not a member of this group"
+        )
+    
+    subject = find_subject(batch.fach, batch.gruppe)
+    if not subject:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Das Fach '{batch.fach}' existiert nicht in der Gruppe '{batch.gruppe}'"
+        )
+    
+    result = apply_flashcard_batch(subject.id, [operation.model_dump() for operation in batch.operations])
+    
+    if isinstance(result, str):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=result
+        )
+    
+    return {"message": "Success!", "content": result}
+
+
+def raise_for_game_error(result: dict):
+    """Turn an error dict from the game operations into the matching HTTP error"""
+    if "error" in result:
+        status_code = 409 if result.get("conflict") else 400
+        raise HTTPException(status_code=status_code, detail=result["error"])
+
 
 def generate_join_code():
     """Generate a unique 6-character join code"""
@@ -936,8 +1200,14 @@ async def leave_session(
         )
     
     session = db.query(QuizSession).filter(QuizSession.id == session_id).first()
+    if not session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Session not found"
+        )
     
     db.delete(participant)
+    host_changed = False
     
     if participant.is_host:
         next_participant = db.query(SessionParticipant).filter(
@@ -950,26 +1220,60 @@ async def leave_session(
             session.host_user_id = next_participant.user_id
         else:
             db.delete(session)
+        host_changed = True
     
     db.commit()
     
-    if session:
-        await manager.broadcast_to_group(f"lobby_{session_id}", {
-            "type": "participant_left",
-            "username": current_user.username,
-            "user_id": current_user.id
-        })
+    if host_changed:
+        # the cached entry names the old host; the next access check loads the new one
+        session_access.forget(session_id)
+    else:
+        session_access.remove_participant(session_id, current_user.id)
+    
+    await manager.broadcast_to_group(f"lobby_{session_id}", {
+        "type": "participant_left",
+        "username": current_user.username,
+        "user_id": current_user.id
+    })
     
     return {"message": "Left session"}
 
 
 
+def build_game_snapshot(session_id: str, user_id: int) -> dict:
+    """Compact game state for clients whose missed events are no longer buffered"""
+    game_state = get_game_state(session_id)
+    snapshot = {"game_state": game_state}
+    
+    if game_state and game_state.get("current_flashcard_id"):
+        votes_data = get_question_votes(session_id, game_state["current_flashcard_id"])
+        snapshot["votes"] = votes_data["votes"]
+        snapshot["vote_counts"] = votes_data["vote_counts"]
+        snapshot["user_vote"] = next(
+            (vote["answer_id"] for vote in votes_data["votes"] if vote["user_id"] == user_id), None
+        )
+    
+    if game_state and game_state.get("status") == "game_finished":
+        max_possible_score = game_state["max_possible_score"]
+        percentage = (game_state["total_score"] / max_possible_score) * 100 if max_possible_score > 0 else 0
+        snapshot["final_result"] = {
+            "session_id": session_id,
+            "total_score": game_state["total_score"],
+            "max_possible_score": max_possible_score,
+            "percentage": percentage,
+            "status": "won" if percentage >= 90 else "lost",
+            "total_questions": game_state["flashcard_count"]
+        }
+    
+    return snapshot
+
+
 @app.websocket("/ws/{token}")
 async def websocket_endpoint(websocket: WebSocket, token: str):
     """WebSocket endpoint for real-time online user tracking"""
     db = next(get_db())
     
-    user = verify_token_websocket(token, db)
+    user = verify_token_websocket(token)
     if not user:
         await websocket.close(code=1008)  # Close with "Policy Violation" code
         return
@@ -1025,6 +1329,7 @@ async def websocket_endpoint(websocket: WebSocket, token: str):
                     )
                     db.add(new_participant)
                     db.commit()
+                    session_access.add_participant(session_id, user.id)
                     print(f"🔥 DEBUG: Added {user.username} to session participants in DB")
                 
                 manager.join_group(user.id, f"lobby_{session_id}")
@@ -1096,6 +1401,7 @@ async def websocket_endpoint(websocket: WebSocket, token: str):
                             )
                             db.add(participant)
                             db.commit()
+                            session_access.add_participant(session_id, user.id)
                             
                         else:
                             await websocket.send_text(json.dumps({"type": "error", "message": "Not a group member"}))
@@ -1110,10 +1416,24 @@ async def websocket_endpoint(websocket: WebSocket, token: str):
                 manager.join_group(user.id, f"game_{session_id}")
                 print(f"🔥 DEBUG: User {user.username} joined game_{session_id}")
                 
-                await websocket.send_text(json.dumps({
+                joined_message = {
                     "type": "game_joined",
-                    "session_id": session_id
-                }))
+                    "session_id": session_id,
+                    "epoch": manager.epoch,
+                    "seq": manager.get_game_sequence(session_id)
+                }
+                
+                last_seq = message.get("last_seq")
+                if last_seq is not None:
+                    missed_events = manager.get_missed_game_events(session_id, int(last_seq), message.get("epoch"))
+                    if missed_events is not None:
+                        joined_message["resync"] = "replay"
+                        joined_message["events"] = missed_events
+                    else:
+                        joined_message["resync"] = "snapshot"
+                        joined_message["snapshot"] = build_game_snapshot(session_id, user.id)
+                
+                await websocket.send_text(json.dumps(joined_message, default=str))
                 
             elif message["type"] == "leave_lobby":
                 session_id = message["session_id"]
@@ -1129,6 +1449,7 @@ async def websocket_endpoint(websocket: WebSocket, token: str):
                         SessionParticipant.user_id == user.id
                     ).delete()
                     db.commit()
+                    session_access.remove_participant(session_id, user.id)
                     print(f"🔥 DEBUG: Removed {user.username} from session participants in DB")
                 
                 manager.leave_group(user.id, f"lobby_{session_id}")
@@ -1179,6 +1500,7 @@ async def websocket_endpoint(websocket: WebSocket, token: str):
                         SessionParticipant.user_id == user.id
                     ).delete()
                     db.commit()
+                    session_access.remove_participant(session_id, user.id)
                     print(f"🔥 DEBUG: Removed {user.username} from session {session_id} on disconnect")
                     
                     participants = []
@@ -1225,59 +1547,61 @@ async def get_online_users_api(group_name: str, current_user: User = Depends(get
 
 
 @app.post("/api/game/start/{session_id}")
-async def start_game_api(session_id: str, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    """Start the game (Host only)"""
+async def start_game_api(session_id: str, expected_version: Optional[int] = None, adaptive: bool = False, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Start the game (Host only); adaptive=true asks the cards the group tends to miss first.
+
+    Like every host command, expected_version must be the version of the state the host saw (0 in the lobby),
+    otherwise the command is rejected with 409.
+    """
     try:
-        session = db.query(QuizSession).filter(QuizSession.id == session_id).first()
-        if not session:
+        access = session_access.get(db, session_id)
+        if not access:
             raise HTTPException(status_code=404, detail="Session nicht gefunden")
         
-        if session.host_user_id != current_user.id:
+        if access.host_user_id != current_user.id:
             raise HTTPException(status_code=403, detail="Nur der Host kann das Spiel starten")
         
-        result = start_game(session_id)
-        
-        if "error" in result:
-            raise HTTPException(status_code=400, detail=result["error"])
-        
-        session.status = "in_progress"
-        db.commit()
-        
-        game_state_dict = result["game_state"]
-        game_state_dict["flashcard_count"] = result["flashcard_count"]
-        
-        await manager.broadcast_to_group(f"game_{session_id}", {
-            "type": "game_started",
-            "session_id": session_id,
-            "question": result["question"],
-            "game_state": game_state_dict
-        })
+        async def run():
+            result = await run_in_threadpool(start_game, session_id, expected_version, adaptive)
+            raise_for_game_error(result)
+            
+            game_state_dict = result["game_state"]
+            game_state_dict["flashcard_count"] = result["flashcard_count"]
+            
+            await manager.broadcast_to_group(f"game_{session_id}", {
+                "type": "game_started",
+                "session_id": session_id,
+                "question": result["question"],
+                "game_state": game_state_dict,
+                "version": game_state_dict["version"]
+            })
+            
+            return {"message": "Spiel gestartet", "question": result["question"], "game_state": game_state_dict, "version": game_state_dict["version"]}
         
-        return {"message": "Spiel gestartet", "question": result["question"], "game_state": game_state_dict}
+        return await game_actors.submit(session_id, run, key="host_command")
         
+    except CommandRejected:
+        raise HTTPException(status_code=409, detail="Eine andere Host-Aktion wird gerade ausgeführt")
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error starting game: {e}")
         raise HTTPException(status_code=500, detail="Fehler beim Starten des Spiels")
 
 
 @app.get("/api/game/state/{session_id}")
-async def get_game_state_api(session_id: str, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    """Get current game state"""
+async def get_game_state_api(session_id: str, request: Request, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Get current game state (supports If-None-Match)"""
     try:
-        participant = db.query(SessionParticipant).filter(
-            SessionParticipant.session_id == session_id,
-            SessionParticipant.user_id == current_user.id
-        ).first()
-        
-        if not participant:
-            session = db.query(QuizSession).filter(QuizSession.id == session_id).first()
-            if not session:
+        if not session_access.is_participant(db, session_id, current_user.id):
+            access = session_access.get(db, session_id)
+            if not access:
                 raise HTTPException(status_code=404, detail="Session nicht gefunden")
             
             from models import UserGroupAssociation
             is_group_member = db.query(UserGroupAssociation).filter(
                 UserGroupAssociation.user_id == current_user.id,
-                UserGroupAssociation.group_id == session.group_id
+                UserGroupAssociation.group_id == access.group_id
             ).first()
             
             if is_group_member:
@@ -1289,15 +1613,30 @@ async def get_game_state_api(session_id: str, current_user: User = Depends(get_c
                 )
                 db.add(participant)
                 db.commit()
+                session_access.add_participant(session_id, current_user.id)
             
             else:
                 raise HTTPException(status_code=403, detail="Sie sind kein Mitglied dieser Gruppe")
         
-        game_state = get_game_state(session_id)
-        if not game_state:
+        versions = db.query(GameState.version, Subject.cards_version).join(
+            QuizSession, QuizSession.id == GameState.session_id
+        ).outerjoin(Subject, Subject.id == QuizSession.subject_id).filter(GameState.session_id == session_id).first()
+        if not versions:
             raise HTTPException(status_code=404, detail="Spielstatus nicht gefunden")
         
-        return game_state
+        etag = game_state_cache.etag(session_id, versions.version, versions.cards_version)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        
+        body = game_state_cache.get(session_id, etag)
+        if body is None:
+            game_state = get_game_state(session_id)
+            if not game_state:
+                raise HTTPException(status_code=404, detail="Spielstatus nicht gefunden")
+            body = json.dumps(game_state).encode("utf-8")
+            game_state_cache.store(session_id, etag, body)
+        return Response(content=body, media_type="application/json", headers=headers)
         
     except HTTPException:
         raise
@@ -1312,31 +1651,29 @@ async def cast_vote_api(vote_data: VoteCreate, current_user: User = Depends(get_
     
     
     try:
-        participant = db.query(SessionParticipant).filter(
-            SessionParticipant.session_id == vote_data.session_id,
-            SessionParticipant.user_id == current_user.id
-        ).first()
-        
-        if not participant:
+        if not session_access.is_participant(db, vote_data.session_id, current_user.id):
             print(f"❌ VOTE API DEBUG - User {current_user.id} is not participant of session {vote_data.session_id}")
             raise HTTPException(status_code=403, detail="Sie sind kein Teilnehmer dieser Session")
         
        
         
-        vote = cast_vote(vote_data.session_id, current_user.id, vote_data.flashcard_id, vote_data.answer_id)
-        
-      
-        
-        votes_data = get_question_votes(vote_data.session_id, vote_data.flashcard_id)
-        
-        await manager.broadcast_to_group(f"game_{vote_data.session_id}", {
-            "type": "vote_update",
-            "flashcard_id": vote_data.flashcard_id,
-            "votes": votes_data["votes"],
-            "vote_counts": votes_data["vote_counts"]
-        })
+        async def run():
+            vote = await run_in_threadpool(cast_vote, vote_data.session_id, current_user.id, vote_data.flashcard_id, vote_data.answer_id)
+            if isinstance(vote, dict):
+                raise_for_game_error(vote)
+            
+            votes_data = await run_in_threadpool(get_question_votes, vote_data.session_id, vote_data.flashcard_id)
+            
+            await manager.broadcast_to_group(f"game_{vote_data.session_id}", {
+                "type": "vote_update",
+                "flashcard_id": vote_data.flashcard_id,
+                "votes": votes_data["votes"],
+                "vote_counts": votes_data["vote_counts"]
+            })
+            
+            return {"message": "Stimme abgegeben", "vote_id": vote}
         
-        return {"message": "Stimme abgegeben", "vote_id": vote}
+        return await game_actors.submit(vote_data.session_id, run)
         
     except HTTPException:
         raise
@@ -1351,12 +1688,7 @@ async def cast_vote_api(vote_data: VoteCreate, current_user: User = Depends(get_
 async def get_votes_api(session_id: str, flashcard_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
     """Get votes for current question"""
     try:
-        participant = db.query(SessionParticipant).filter(
-            SessionParticipant.session_id == session_id,
-            SessionParticipant.user_id == current_user.id
-        ).first()
-        
-        if not participant:
+        if not session_access.is_participant(db, session_id, current_user.id):
             raise HTTPException(status_code=403, detail="Sie sind kein Teilnehmer dieser Session")
         
         votes_data = get_question_votes(session_id, flashcard_id)
@@ -1370,28 +1702,32 @@ async def get_votes_api(session_id: str, flashcard_id: int, current_user: User =
 
 
 @app.post("/api/game/end-question/{session_id}")
-async def end_question_api(session_id: str, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def end_question_api(session_id: str, expected_version: Optional[int] = None, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
     """End current question and show results (Host only)"""
     try:
-        session = db.query(QuizSession).filter(QuizSession.id == session_id).first()
-        if not session:
+        access = session_access.get(db, session_id)
+        if not access:
             raise HTTPException(status_code=404, detail="Session nicht gefunden")
         
-        if session.host_user_id != current_user.id:
+        if access.host_user_id != current_user.id:
             raise HTTPException(status_code=403, detail="Nur der Host kann das Voting beenden")
         
-        result = end_question(session_id)
-        
-        if "error" in result:
-            raise HTTPException(status_code=400, detail=result["error"])
-        
-        await manager.broadcast_to_group(f"game_{session_id}", {
-            "type": "question_ended",
-            "result": result
-        })
+        async def run():
+            result = await run_in_threadpool(end_question, session_id, expected_version)
+            raise_for_game_error(result)
+            
+            await manager.broadcast_to_group(f"game_{session_id}", {
+                "type": "question_ended",
+                "result": result,
+                "version": result["version"]
+            })
+            
+            return {"message": "Frage beendet", "result": result, "version": result["version"]}
         
-        return {"message": "Frage beendet", "result": result}
+        return await game_actors.submit(session_id, run, key="host_command")
         
+    except CommandRejected:
+        raise HTTPException(status_code=409, detail="Eine andere Host-Aktion wird gerade ausgeführt")
     except HTTPException:
         raise
     except Exception as e:
@@ -1400,48 +1736,57 @@ async def end_question_api(session_id: str, current_user: User = Depends(get_cur
 
 
 @app.post("/api/game/next-question/{session_id}")
-async def next_question_api(session_id: str, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def next_question_api(session_id: str, expected_version: Optional[int] = None, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
     """End current question and move to next (Host only)"""
     try:
-        session = db.query(QuizSession).filter(QuizSession.id == session_id).first()
-        if not session:
+        access = session_access.get(db, session_id)
+        if not access:
             raise HTTPException(status_code=404, detail="Session nicht gefunden")
         
-        if session.host_user_id != current_user.id:
+        if access.host_user_id != current_user.id:
             raise HTTPException(status_code=403, detail="Nur der Host kann zur nächsten Frage wechseln")
         
-        current_state = get_game_state(session_id)
-        
-        if current_state and current_state.get("status") == "question_active":
-            question_result = end_question(session_id)
-            if "error" in question_result:
-                raise HTTPException(status_code=400, detail=question_result["error"])
+        async def run():
+            version = expected_version
+            current_state = await run_in_threadpool(get_game_state, session_id)
             
-            await manager.broadcast_to_group(f"game_{session_id}", {
-                "type": "question_ended",
-                "result": question_result
-            })
-        
-        next_result = next_question(session_id)
-        
-        if next_result["game_finished"]:
-            await manager.broadcast_to_group(f"game_{session_id}", {
-                "type": "game_finished",
-                "result": next_result["result"]
-            })
-            
-            session.status = "finished"
-            db.commit()
+            if current_state and current_state.get("status") == "question_active":
+                question_result = await run_in_threadpool(end_question, session_id, version)
+                raise_for_game_error(question_result)
+                version = question_result["version"]
+                
+                await manager.broadcast_to_group(f"game_{session_id}", {
+                    "type": "question_ended",
+                    "result": question_result,
+                    "version": version
+                })
             
-            return {"game_finished": True, "result": next_result["result"]}
-        else:
-            await manager.broadcast_to_group(f"game_{session_id}", {
-                "type": "new_question",
-                "question": next_result["question"]
-            })
+            next_result = await run_in_threadpool(next_question, session_id, version)
+            raise_for_game_error(next_result)
             
-            return {"game_finished": False, "question": next_result["question"]}
+            if next_result["game_finished"]:
+                forget_sessions([session_id])
+                await manager.broadcast_to_group(f"game_{session_id}", {
+                    "type": "game_finished",
+                    "result": next_result["result"],
+                    "version": next_result["version"]
+                })
+                manager.forget_game(session_id)
+                
+                return {"game_finished": True, "result": next_result["result"], "version": next_result["version"]}
+            else:
+                await manager.broadcast_to_group(f"game_{session_id}", {
+                    "type": "new_question",
+                    "question": next_result["question"],
+                    "version": next_result["version"]
+                })
+                
+                return {"game_finished": False, "question": next_result["question"], "version": next_result["version"]}
         
+        return await game_actors.submit(session_id, run, key="host_command")
+        
+    except CommandRejected:
+        raise HTTPException(status_code=409, detail="Eine andere Host-Aktion wird gerade ausgeführt")
     except HTTPException:
         raise
     except Exception as e:
@@ -1450,49 +1795,34 @@ async def next_question_api(session_id: str, current_user: User = Depends(get_cu
 
 
 @app.post("/api/game/end/{session_id}")
-async def end_game_api(session_id: str, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def end_game_api(session_id: str, expected_version: Optional[int] = None, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
     """End the game manually (Host only)"""
     try:
-        session = db.query(QuizSession).filter(QuizSession.id == session_id).first()
-        if not session:
+        access = session_access.get(db, session_id)
+        if not access:
             raise HTTPException(status_code=404, detail="Session nicht gefunden")
         
-        if session.host_user_id != current_user.id:
+        if access.host_user_id != current_user.id:
             raise HTTPException(status_code=403, detail="Nur der Host kann das Spiel beenden")
         
-        from models import GameState
-        game_state = db.query(GameState).filter(GameState.session_id == session_id).first()
-        if game_state:
-            game_state.status = "game_finished"
-            game_state.ended_at = datetime.utcnow()
-        
-        session.status = "finished"
-        db.commit()
-        
-        if game_state:
-            percentage = (game_state.total_score / game_state.max_possible_score) * 100 if game_state.max_possible_score > 0 else 0
-            result = {
-                "session_id": session_id,
-                "total_score": game_state.total_score,
-                "max_possible_score": game_state.max_possible_score,
-                "percentage": percentage,
-                "status": "ended_manually",
-                "questions_answered": game_state.current_question_index,
-                "total_questions": game_state.max_possible_score // 100
-            }
-        else:
-            result = {
-                "session_id": session_id,
-                "status": "ended_manually"
-            }
-        
-        await manager.broadcast_to_group(f"game_{session_id}", {
-            "type": "game_finished",
-            "result": result
-        })
+        async def run():
+            result = await run_in_threadpool(end_game, session_id, expected_version)
+            raise_for_game_error(result)
+            
+            forget_sessions([session_id])
+            await manager.broadcast_to_group(f"game_{session_id}", {
+                "type": "game_finished",
+                "result": result,
+                "version": result.get("version")
+            })
+            manager.forget_game(session_id)
+            
+            return {"message": "Spiel beendet", "result": result}
         
-        return {"message": "Spiel beendet", "result": result}
+        return await game_actors.submit(session_id, run, key="host_command")
         
+    except CommandRejected:
+        raise HTTPException(status_code=409, detail="Eine andere Host-Aktion wird gerade ausgeführt")
     except HTTPException:
         raise
     except Exception as e:
@@ -1504,12 +1834,7 @@ async def end_game_api(session_id: str, current_user: User = Depends(get_current
 async def send_chat_message_api(message_data: ChatMessageCreate, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
     """Send chat message"""
     try:
-        participant = db.query(SessionParticipant).filter(
-            SessionParticipant.session_id == message_data.session_id,
-            SessionParticipant.user_id == current_user.id
-        ).first()
-        
-        if not participant:
+        if not session_access.is_participant(db, message_data.session_id, current_user.id):
             raise HTTPException(status_code=403, detail="Sie sind kein Teilnehmer dieser Session")
         
         chat_message = add_chat_message(message_data.session_id, current_user.id, message_data.message)
@@ -1538,12 +1863,7 @@ async def send_chat_message_api(message_data: ChatMessageCreate, current_user: U
 async def get_game_result_api(session_id: str, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
     """Get final game result"""
     try:
-        participant = db.query(SessionParticipant).filter(
-            SessionParticipant.session_id == session_id,
-            SessionParticipant.user_id == current_user.id
-        ).first()
-        
-        if not participant:
+        if not session_access.is_participant(db, session_id, current_user.id):
             raise HTTPException(status_code=403, detail="Sie sind kein Teilnehmer dieser Session")
         
         result = calculate_final_result(session_id)
@@ -1563,12 +1883,7 @@ async def get_game_result_api(session_id: str, current_user: User = Depends(get_
 async def get_chat_messages_api(session_id: str, limit: int = 50, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
     """Get chat messages"""
     try:
-        participant = db.query(SessionParticipant).filter(
-            SessionParticipant.session_id == session_id,
-            SessionParticipant.user_id == current_user.id
-        ).first()
-        
-        if not participant:
+        if not session_access.is_participant(db, session_id, current_user.id):
             raise HTTPException(status_code=403, detail="Sie sind kein Teilnehmer dieser Session")
         
         messages = get_chat_messages(session_id, limit)
@@ -1581,20 +1896,94 @@ async def get_chat_messages_api(session_id: str, limit: int = 50, current_user:
         raise HTTPException(status_code=500, detail="Fehler beim Abrufen der Chat-Nachrichten")
 
 
-@app.get("/{full_path:path}")
-async def serve_react_app(full_path: str):
+def raise_for_stats_error(result):
+    if isinstance(result, str):
+        code = status.HTTP_400_BAD_REQUEST if result == "Ungültiger Cursor" else status.HTTP_404_NOT_FOUND
+        raise HTTPException(status_code=code, detail=result)
+
+
+def require_group_member(username: str, gruppenname: str):
+    if not is_user_in_group(username, gruppenname):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You are not a member of this group"
+        )
+
+
+@app.get("/api/stats/me")
+async def get_my_stats(current_user: User = Depends(get_current_user)):
+    """Games played, win rate and accuracy of the current user"""
+    return {"message":"success","content":get_game_stats(user_id=current_user.id)}
+
+
+@app.get("/api/stats/group/{gruppenname}")
+async def get_group_stats(gruppenname: str, subjectname: Optional[str] = None, current_user: User = Depends(get_current_user)):
+    """Totals and most missed cards of a group, or of one of its subjects"""
+    require_group_member(current_user.username, gruppenname)
+    result = get_game_stats(groupname=gruppenname, subjectname=subjectname)
+    raise_for_stats_error(result)
+    return {"message":"success","content":result}
+
+
+@app.get("/api/stats/group/{gruppenname}/cards")
+async def get_card_stats(gruppenname: str, subjectname: str, after: int = 0, limit: int = 100, current_user: User = Depends(get_current_user)):
+    """Accuracy per card of a subject; pass next_cursor as after to get the next page"""
+    require_group_member(current_user.username, gruppenname)
+    limit = max(1, min(limit, MAX_DECK_PAGE_SIZE))
+    result = get_subject_card_stats(gruppenname, subjectname, after, limit)
+    raise_for_stats_error(result)
+    return {"message":"success","content":result}
+
+
+@app.get("/api/analytics/group/{gruppenname}")
+def get_group_analytics_route(gruppenname: str, limit: int = 20, current_user: User = Depends(get_current_user)):
+    """Hardest cards with discrimination and trend, plus accuracy per subject and player.
+
+    A plain def, so FastAPI runs it on the threadpool: loading and aggregating a large group's
+    outcomes takes long enough to stall the websockets if it ran on the event loop.
+    """
+    require_group_member(current_user.username, gruppenname)
+    limit = max(1, min(limit, MAX_HISTORY_PAGE_SIZE))
+    result = get_group_analytics_report(gruppenname, limit)
+    raise_for_stats_error(result)
+    return {"message":"success","content":result}
+
+
+@app.get("/api/history/me")
+async def get_my_history(before: Optional[str] = None, limit: int = 20, current_user: User = Depends(get_current_user)):
+    """Finished games of the current user, newest first; pass next_cursor as before to get the next page"""
+    limit = max(1, min(limit, MAX_HISTORY_PAGE_SIZE))
+    result = get_game_history(user_id=current_user.id, before=before, limit=limit)
+    raise_for_stats_error(result)
+    return {"message":"success","content":result}
+
+
+@app.get("/api/history/group/{gruppenname}")
+async def get_group_history(gruppenname: str, subjectname: Optional[str] = None, before: Optional[str] = None, limit: int = 20, current_user: User = Depends(get_current_user)):
+    """Finished games of a group or one of its subjects, newest first"""
+    require_group_member(current_user.username, gruppenname)
+    limit = max(1, min(limit, MAX_HISTORY_PAGE_SIZE))
+    result = get_game_history(groupname=gruppenname, subjectname=subjectname, before=before, limit=limit)
+    raise_for_stats_error(result)
+    return {"message":"success","content":result}
+
+
+@app.api_route("/{full_path:path}", methods=["GET", "HEAD"])
+async def serve_react_app(full_path: str, request: Request):
     if full_path.startswith("api/"):
         raise HTTPException(status_code=404, detail="API endpoint not found")
-    
-    index_file = "../frontend/build/index.html"
-    if os.path.exists(index_file):
-        return FileResponse(index_file)
-    elif os.path.exists("frontend/build/index.html"):
-        return FileResponse("frontend/build/index.html")
-    else:
+    if not frontend.loaded:
         raise HTTPException(status_code=404, detail="Frontend build not found. Run 'npm run build' in frontend directory.")
 
-Base.metadata.create_all(bind=engine)
+    response = frontend.response(full_path, request.headers)
+    if response is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    return response
+
+
+MODULE_LOADED = time.perf_counter()
+
 
 if __name__ == '__main__':
+    import uvicorn
     uvicorn.run("app:app", host="0.0.0.0", port=8000, reload=True)
@@ -1,28 +1,73 @@
 from datetime import datetime, timedelta, timezone
 from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import hashlib
 import bcrypt
-from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from database import get_db
+from sqlalchemy import select
+from sqlalchemy.orm import Session, joinedload
+from database import SessionLocal
+from caching import TTLCache, cached_lookup
 from models import User, RefreshToken
 import os
 from dotenv import load_dotenv
 import secrets
 
+# python-jose (and the cryptography backend it loads) is imported inside the token functions: it
+# takes about 50 ms to import and isn't needed until the first request. app.py warms it up after startup.
+
 load_dotenv()
 
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "15"))
 REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
+REFRESH_TOKENS_PER_USER = int(os.getenv("REFRESH_TOKENS_PER_USER", "10"))  # oldest sessions are logged out beyond this
+REFRESH_TOKEN_ROTATION_GRACE_SECONDS = 30  # a rotated token stays valid briefly for parallel refreshes from other tabs
+
+# bcrypt takes a few hundred ms per call and must never run on the event loop.
+# Hashing runs on a small thread pool (bcrypt releases the GIL); when too many jobs are
+# waiting, new logins are shed with 503 instead of queueing behind a login storm.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
+# Principals of recently seen users, so authenticated requests don't query the users table every time.
+# The app never renames, deactivates or deletes users; when that is done in the database, access
+# tokens of the user keep working for up to PRINCIPAL_CACHE_TTL seconds. That TTL is the only bound.
+PRINCIPAL_CACHE_TTL = int(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+
+
+class Principal:
+    """The authenticated user as seen by the endpoints: only what they need, detached from any DB session"""
+
+    def __init__(self, id: int, username: str, is_active: bool):
+        self.id = id
+        self.username = username
+        self.is_active = is_active
+
+
+principal_cache = TTLCache(maxsize=10000, ttl=PRINCIPAL_CACHE_TTL)
+
+
+def load_principal(username: str) -> Optional[Principal]:
+    """Principal for a token subject, from the cache or the users table"""
+    def load():
+        db = SessionLocal()
+        try:
+            user = db.query(User.id, User.username, User.is_active).filter(User.username == username).first()
+            return Principal(user.id, user.username, user.is_active) if user else None
+        finally:
+            db.close()
+    return cached_lookup(principal_cache, username, load)
+
 def hash_password(password: str) -> str:
     """Hash a password using bcrypt"""
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed.decode('utf-8')
 
@@ -30,8 +75,44 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against a hash"""
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
 
+def needs_rehash(hashed_password: str) -> bool:
+    """True if the hash was made with a different cost than BCRYPT_ROUNDS ("$2b$12$...")"""
+    try:
+        return int(hashed_password.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+
+password_pool = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+pending_password_jobs = 0
+
+
+async def _run_password_job(function, *args):
+    global pending_password_jobs
+    if pending_password_jobs >= PASSWORD_HASH_MAX_PENDING:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please try again in a moment",
+            headers={"Retry-After": "2"},
+        )
+
+    pending_password_jobs += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(password_pool, function, *args)
+    finally:
+        pending_password_jobs -= 1
+
+async def hash_password_async(password: str) -> str:
+    """hash_password on the password pool; raises 503 when the pool is saturated"""
+    return await _run_password_job(hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the password pool; raises 503 when the pool is saturated"""
+    return await _run_password_job(verify_password, plain_password, hashed_password)
+
 def create_access_token(data: dict) -> str:
     """Create a JWT access token"""
+    from jose import jwt
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire, "type": "access"})
@@ -46,6 +127,7 @@ def create_refresh_token() -> tuple[str, datetime]:
 
 def decode_token(token: str) -> dict:
     """Decode and validate a JWT token"""
+    from jose import JWTError, jwt
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         return payload
@@ -56,7 +138,7 @@ def decode_token(token: str) -> dict:
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> Principal:
     """Get current user from JWT token"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -75,7 +157,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     except HTTPException:
         raise credentials_exception
     
-    user = db.query(User).filter(User.username == username).first()
+    user = load_principal(username)
     if user is None:
         raise credentials_exception
     
@@ -84,20 +166,80 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     
     return user
 
-def validate_refresh_token(token: str, db: Session) -> Optional[User]:
-    """Validate a refresh token and return the associated user"""
-    refresh_token = db.query(RefreshToken).filter(
-        RefreshToken.token == token,
+def hash_refresh_token(token: str) -> str:
+    """Refresh tokens are stored as SHA-256 digests, a leaked table can't be used to log in"""
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+def issue_refresh_token(db: Session, user_id: int) -> str:
+    """Add a new refresh token for a user to the caller's transaction and return it in plain text.
+
+    Only the newest REFRESH_TOKENS_PER_USER tokens of a user are kept.
+    """
+    keep = select(RefreshToken.id).where(RefreshToken.user_id == user_id).order_by(
+        RefreshToken.expires_at.desc()
+    ).limit(REFRESH_TOKENS_PER_USER - 1)
+    db.query(RefreshToken).filter(
+        RefreshToken.user_id == user_id,
+        RefreshToken.id.not_in(keep)
+    ).delete(synchronize_session=False)
+
+    token, expires_at = create_refresh_token()
+    db.add(RefreshToken(token=hash_refresh_token(token), user_id=user_id, expires_at=expires_at))
+    return token
+
+def _find_refresh_token(token: str, db: Session) -> Optional[RefreshToken]:
+    # Tokens issued before hashing was introduced are still stored in plain text
+    return db.query(RefreshToken).options(joinedload(RefreshToken.user)).filter(
+        RefreshToken.token.in_((hash_refresh_token(token), token)),
         RefreshToken.expires_at > datetime.now(timezone.utc)
     ).first()
+
+def validate_refresh_token(token: str, db: Session) -> Optional[User]:
+    """Validate a refresh token and return the associated user"""
+    refresh_token = _find_refresh_token(token, db)
     
     if not refresh_token:
         return None
     
     return refresh_token.user
 
-def verify_token_websocket(token: str, db: Session) -> Optional[User]:
-    """Verify JWT token for WebSocket connections - returns User or None"""
+def rotate_refresh_token(token: str, db: Session) -> Optional[tuple[User, str]]:
+    """Exchange a valid refresh token for a new one; returns the user and the new token"""
+    refresh_token = _find_refresh_token(token, db)
+    if not refresh_token:
+        return None
+
+    user = refresh_token.user
+    db.expunge(refresh_token)  # the per-user cap below may delete this row
+    grace_end = datetime.now(timezone.utc) + timedelta(seconds=REFRESH_TOKEN_ROTATION_GRACE_SECONDS)
+    db.query(RefreshToken).filter(
+        RefreshToken.id == refresh_token.id,
+        RefreshToken.expires_at > grace_end
+    ).update({RefreshToken.expires_at: grace_end}, synchronize_session=False)
+    new_token = issue_refresh_token(db, user.id)
+    db.commit()
+    return user, new_token
+
+def prune_expired_refresh_tokens(batch_size: int = 1000) -> int:
+    """Delete expired refresh tokens in small transactions; returns how many were removed"""
+    db = SessionLocal()
+    removed = 0
+    try:
+        while True:
+            expired = select(RefreshToken.id).where(
+                RefreshToken.expires_at <= datetime.now(timezone.utc)
+            ).limit(batch_size)
+            deleted = db.query(RefreshToken).filter(RefreshToken.id.in_(expired)).delete(synchronize_session=False)
+            db.commit()
+            removed += deleted
+            if deleted < batch_size:
+                return removed
+    finally:
+        db.close()
+
+def verify_token_websocket(token: str) -> Optional[Principal]:
+    """Verify JWT token for WebSocket connections - returns the Principal or None"""
+    from jose import JWTError, jwt
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
@@ -106,7 +248,7 @@ def verify_token_websocket(token: str, db: Session) -> Optional[User]:
     except JWTError:
         return None
     
-    user = db.query(User).filter(User.username == username).first()
+    user = load_principal(username)
     if user is None or not user.is_active:
         return None
     
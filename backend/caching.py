@@ -0,0 +1,77 @@
+"""
+Small in-process caches with a size bound and an expiry time
+"""
+from typing import Any, Callable, Hashable, Optional
+from collections import OrderedDict
+import time
+
+
+class TTLCache:
+    """LRU cache whose entries expire after ttl seconds.
+
+    Every worker process has its own copy, so the ttl bounds how long another worker's
+    change can go unnoticed; changes made in this process are invalidated explicitly.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (expires_at, value)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self.entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return default
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """The live value without counting a hit or miss or refreshing its LRU position, for code that updates entries"""
+        entry = self.entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            return default
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def pop(self, key: Hashable):
+        self.entries.pop(key, None)
+
+    def pop_where(self, predicate: Callable[[Hashable], bool]):
+        """Drop all entries whose key matches, e.g. everything belonging to a deleted group"""
+        for key in [key for key in self.entries if predicate(key)]:
+            del self.entries[key]
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None
+        }
+
+
+def cached_lookup(cache: TTLCache, key: Hashable, load: Callable[[], Optional[Any]]) -> Optional[Any]:
+    """Return the cached value or load and cache it; None results are not cached"""
+    value = cache.get(key)
+    if value is None:
+        value = load()
+        if value is not None:
+            cache.set(key, value)
+    return value
@@ -1,5 +1,9 @@
+from datetime import datetime
+import hashlib
+import logging
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, create_engine, event, inspect, text
+from sqlalchemy.schema import CreateColumn
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 test_db = os.getenv("TEST_DATABASE")
@@ -18,6 +22,21 @@ engine = create_engine(
 )
 SessionLocal = sessionmaker(autocommit=False,autoflush=False,bind=engine)
 
+logger = logging.getLogger(__name__)
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine, "connect")
+    def _configure_sqlite(dbapi_connection, connection_record):
+        """WAL lets readers go on while a write commits. auto_vacuum only takes hold in a database without
+        tables yet; older ones are switched over by ensure_incremental_vacuum."""
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA auto_vacuum={AUTO_VACUUM_INCREMENTAL}")
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.close()
+
 Base = declarative_base()
 
 def get_db():
@@ -26,3 +45,104 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Fingerprint of the models the database was last brought up to date with. Kept outside
+# Base.metadata so it is not part of what it fingerprints.
+schema_version = Table(
+    "schema_version", MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("fingerprint", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False)
+)
+
+
+def schema_fingerprint() -> str:
+    """Hash of every table, column and index the models declare; changes whenever a migration would"""
+    parts = []
+    for table in Base.metadata.sorted_tables:
+        parts.append(table.name)
+        parts.extend(f"{column.name} {column.type} {column.nullable}" for column in table.columns)
+        parts.extend(sorted(index.name for index in table.indexes))
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def ensure_schema() -> bool:
+    """Create missing tables and add columns and indexes that were introduced after the database was created.
+
+    Skipped when the stored fingerprint matches the models, so a restart without model changes costs
+    one query instead of inspecting every table. Returns whether anything had to be checked.
+    """
+    fingerprint = schema_fingerprint()
+    schema_version.create(bind=engine, checkfirst=True)
+    with engine.connect() as connection:
+        stored = connection.execute(
+            schema_version.select().with_only_columns(schema_version.c.fingerprint).where(schema_version.c.id == 1)
+        ).scalar()
+    if stored == fingerprint:
+        return False
+
+    Base.metadata.create_all(bind=engine)
+
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing_columns:
+                    column_ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                    connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column_ddl}"))
+
+            existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(bind=connection)
+
+        connection.execute(schema_version.delete())
+        connection.execute(schema_version.insert().values(id=1, fingerprint=fingerprint, applied_at=datetime.utcnow()))
+    return True
+
+
+def ensure_incremental_vacuum() -> bool:
+    """Rewrite a database created without auto_vacuum=INCREMENTAL once, so the housekeeping can return free pages.
+
+    The VACUUM copies the whole file and blocks writers while it runs; afterwards the mode is stored in
+    the file and this is a single PRAGMA. Returns whether the database had to be rewritten.
+    """
+    if engine.dialect.name != "sqlite":
+        return False
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        if connection.exec_driver_sql("PRAGMA auto_vacuum").scalar() == AUTO_VACUUM_INCREMENTAL:
+            return False
+        started = datetime.utcnow()
+        connection.exec_driver_sql(f"PRAGMA auto_vacuum={AUTO_VACUUM_INCREMENTAL}")
+        connection.exec_driver_sql("VACUUM")
+    logger.info(f"Database switched to incremental auto_vacuum in {(datetime.utcnow() - started).total_seconds():.1f} s")
+    return True
+
+
+INCREMENTAL_VACUUM_PAGES = 200  # free pages returned to the OS per maintenance run
+
+
+def sqlite_housekeeping() -> dict:
+    """Return a few free pages and checkpoint the WAL; both modes are set up when connecting.
+
+    PASSIVE checkpoints and small incremental_vacuum steps never wait for readers or hold the lock for long.
+    """
+    if engine.dialect.name != "sqlite":
+        return {}
+
+    done = {}
+    with engine.connect() as connection:
+        if connection.exec_driver_sql("PRAGMA auto_vacuum").scalar() == AUTO_VACUUM_INCREMENTAL:
+            free_pages = connection.exec_driver_sql("PRAGMA freelist_count").scalar()
+            # The sqlite3 module steps the pragma once and each step frees one page, so ask page by page
+            for _ in range(min(free_pages, INCREMENTAL_VACUUM_PAGES)):
+                connection.exec_driver_sql("PRAGMA incremental_vacuum(1)")
+            done["incremental_vacuum"] = free_pages - connection.exec_driver_sql("PRAGMA freelist_count").scalar()
+        if connection.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal":
+            busy, log_frames, checkpointed = connection.exec_driver_sql("PRAGMA wal_checkpoint(PASSIVE)").first()
+            done["wal_checkpoint"] = {"log_frames": log_frames, "checkpointed": checkpointed}
+        connection.commit()
+    return done
@@ -1,9 +1,66 @@
-from database import SessionLocal,engine,Base
+from typing import Optional
+from database import SessionLocal
+from sqlalchemy import Column, Integer, MetaData, Table, delete, func, insert, literal, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+from caching import TTLCache, cached_lookup
+from deck_cache import deck_cache
+from difficulty_index import adaptive_queues
+from flashcard_search import index_flashcards, index_subject, remove_flashcards, remove_subjects, search_flashcards
+from game_archive import archive_games, finalize_game, get_game_summary, load_archive
+from game_journal import record_event, record_snapshot_if_due
+from game_stats import (
+    decode_cursor, get_flashcard_stats_page, get_history_page, get_most_missed, get_stats,
+    remove_flashcard_stats, remove_scope_stats
+)
+from game_state_cache import game_state_cache
+from session_access import session_access
 from models import User,Group,Invitation,Flashcard,Answer,UserGroupAssociation,Subject,QuizSession,GameState,Vote,ChatMessage
-from datetime import datetime
+from models import SessionParticipant,LobbyInvitation,GameEvent,GameSnapshot,GameArchive,GameSummary,QuestionSummary,PlayerGame
+from datetime import datetime, timedelta
+import logging
 import random
+import time
+
+logger = logging.getLogger(__name__)
+
+# Name -> id lookups. Renames and deletes in this process invalidate entries explicitly; a rename or
+# delete on another worker is picked up after NAME_CACHE_TTL seconds. Missing names are never cached.
+NAME_CACHE_TTL = 60
+user_id_cache = TTLCache(maxsize=10000, ttl=NAME_CACHE_TTL)
+group_id_cache = TTLCache(maxsize=5000, ttl=NAME_CACHE_TTL)
+subject_id_cache = TTLCache(maxsize=10000, ttl=NAME_CACHE_TTL)  # (group_id, subject name) -> id
+
+
+def _lookup_user_id(username):
+    def load():
+        db = SessionLocal()
+        try:
+            return db.query(User.id).filter(User.username == username).scalar()
+        finally:
+            db.close()
+    return cached_lookup(user_id_cache, username, load)
+
+
+def _lookup_group_id(groupname):
+    def load():
+        db = SessionLocal()
+        try:
+            return db.query(Group.id).filter(Group.name == groupname).scalar()
+        finally:
+            db.close()
+    return cached_lookup(group_id_cache, groupname, load)
+
+
+def _lookup_subject_id(subjectname, group_id):
+    def load():
+        db = SessionLocal()
+        try:
+            return db.query(Subject.id).filter(Subject.name == subjectname, Subject.group_id == group_id).scalar()
+        finally:
+            db.close()
+    return cached_lookup(subject_id_cache, (group_id, subjectname), load)
 
-Base.metadata.create_all(bind=engine)
 
 def create_user(username:str,password:str):
     db = SessionLocal()
@@ -59,25 +116,11 @@ def get_invitations(username):
 
 
 def is_username_taken(username):
-    db = SessionLocal()
-    user = db.query(User).filter(User.username == username).first()
-    if user is not None:
-        db.close()
-        return True
-    else:
-        db.close()
-        return False
+    return _lookup_user_id(username) is not None
     
 
 def get_user_id(username):
-    db = SessionLocal()
-    user = db.query(User).filter(User.username == username).first()
-    if user is not None:
-        db.close()
-        return user.id
-    else:
-        db.close()
-        return user
+    return _lookup_user_id(username)
 
 
 
@@ -94,15 +137,7 @@ def get_username_by_id(id):
 
 
 def is_groupname_taken(groupname):
-    db = SessionLocal()
-
-    gruppenname = db.query(Group).filter(Group.name == groupname).first()
-    if gruppenname is not None:
-        db.close()
-        return True
-    else:
-        db.close()
-        return False
+    return _lookup_group_id(groupname) is not None
     
 
 
@@ -126,47 +161,120 @@ def create_group(gruppenname,username):
     except Exception as e:
         print("Fehler beim Gruppe anlegen",e)
 
-def delete_group(gruppenname):
-    db = SessionLocal()
+SESSION_CHILD_MODELS = (
+    Vote, ChatMessage, GameEvent, GameSnapshot, GameState, SessionParticipant, LobbyInvitation,
+    QuestionSummary, GameSummary, GameArchive, PlayerGame
+)
 
-    if not is_groupname_taken(gruppenname):
-        return "Die Gruppe existiert nicht."
 
-    zu_loeschende_gruppe = db.query(Group).filter(Group.name == gruppenname).first()
+def _purge_sessions(db, session_filter) -> list:
+    """Delete quiz sessions matching session_filter and everything hanging off them with one DELETE per table.
 
-    db.delete(zu_loeschende_gruppe)
-    db.commit()
-    db.close()
+    Every DELETE selects its sessions in a subquery, so a group with any number of sessions stays within
+    SQLite's bound parameter limit. Returns the deleted session ids for the in-memory cleanup.
+    """
+    sessions = select(QuizSession.id).where(session_filter)
+    session_ids = db.scalars(sessions).all()
+    if not session_ids:
+        return []
 
+    for model in SESSION_CHILD_MODELS:
+        db.execute(delete(model).where(model.session_id.in_(sessions)))
+    db.execute(delete(QuizSession).where(QuizSession.id.in_(sessions)))
+    return session_ids
 
-def get_user_groups(username: str):
-    db = SessionLocal()
-    
-    user = db.query(User).filter(User.username == username).first()  # Nutzer abrufen
-    
-    if not user:
-        db.close()
-        return {"message": "Benutzer nicht gefunden", "groups": []}
-    
-    groups = [{"id": assoc.group.id, "name": assoc.group.name} for assoc in user.user_groups if assoc.group is not None]
 
-    db.close()
-    
-    return {"groups": groups}  
+def _purge_subjects(db, subject_filter) -> tuple:
+    """Delete subjects matching subject_filter with their flashcards, answers and quiz sessions.
 
+    Set-based replacement for the ORM cascade, which loads every child row and deletes it one by one.
+    Returns the deleted subject ids and session ids.
+    """
+    subjects = select(Subject.id).where(subject_filter)
+    subject_ids = db.scalars(subjects).all()
+    if not subject_ids:
+        return [], []
 
+    session_ids = _purge_sessions(db, QuizSession.subject_id.in_(subjects))
 
+    remove_subjects(db, subjects)
+    remove_scope_stats(db, "subject", subjects)
+    flashcard_ids = select(Flashcard.id).where(Flashcard.subject_id.in_(subjects))
+    db.execute(delete(Vote).where(Vote.flashcard_id.in_(flashcard_ids)))
+    db.execute(
+        update(GameState).where(GameState.current_flashcard_id.in_(flashcard_ids)).values(current_flashcard_id=None)
+    )
+    db.execute(delete(Answer).where(Answer.flashcard_id.in_(flashcard_ids)))
+    db.execute(delete(Flashcard).where(Flashcard.subject_id.in_(subjects)))
+    db.execute(delete(Subject).where(Subject.id.in_(subjects)))
+    return subject_ids, session_ids
 
-def get_group_id(gruppenname):
+
+def _forget_deleted(subject_ids: list, session_ids: list):
+    """Drop in-memory copies of deleted decks and sessions, call after the commit"""
+    for subject_id in subject_ids:
+        deck_cache.forget(subject_id)
+    for session_id in session_ids:
+        session_access.forget(session_id)
+        game_state_cache.forget(session_id)
+        adaptive_queues.forget(session_id)
+
+
+def forget_sessions(session_ids: list):
+    """Drop in-memory state of sessions a maintenance job deleted or archived.
+
+    The caches are plain dicts the event loop uses without locks, so this has to run on the loop thread.
+    """
+    _forget_deleted([], session_ids)
+
+
+def delete_group(gruppenname):
     db = SessionLocal()
-    group = db.query(Group).filter(Group.name == gruppenname).first()
-    if group is not None:
-        group_id = group.id
+    try:
+        group_id = db.query(Group.id).filter(Group.name == gruppenname).scalar()
+        if group_id is None:
+            return "Die Gruppe existiert nicht."
+
+        subject_ids, subject_session_ids = _purge_subjects(db, Subject.group_id == group_id)
+        session_ids = subject_session_ids + _purge_sessions(db, QuizSession.group_id == group_id)
+        db.execute(delete(Invitation).where(Invitation.group_id == group_id))
+        db.execute(delete(UserGroupAssociation).where(UserGroupAssociation.group_id == group_id))
+        remove_scope_stats(db, "group", [group_id])
+        db.execute(delete(Group).where(Group.id == group_id))
+        db.commit()
+
+        membership_cache.pop_where(lambda key: key[1] == gruppenname)
+        group_id_cache.pop(gruppenname)
+        subject_id_cache.pop_where(lambda key: key[0] == group_id)
+        _forget_deleted(subject_ids, session_ids)
+        print(f"Deleted group '{gruppenname}' with {len(subject_ids)} subjects and {len(session_ids)} sessions")
+    except Exception as e:
+        db.rollback()
+        print("Fehler beim löschen der Gruppe", e)
+        return f"Fehler: {e}"
+    finally:
         db.close()
-        return group_id
-    else:
+
+
+def get_user_groups(username: str):
+    db = SessionLocal()
+    try:
+        groups = db.query(Group.id, Group.name).join(
+            UserGroupAssociation, UserGroupAssociation.group_id == Group.id
+        ).join(User, User.id == UserGroupAssociation.user_id).filter(
+            User.username == username
+        ).order_by(UserGroupAssociation.id).all()
+
+        if not groups and not db.query(User.id).filter(User.username == username).first():
+            return {"message": "Benutzer nicht gefunden", "groups": []}
+
+        return {"groups": [{"id": group.id, "name": group.name} for group in groups]}
+    finally:
         db.close()
-        return False
+
+
+def get_group_id(gruppenname):
+    return _lookup_group_id(gruppenname) or False
     
 
 
@@ -220,6 +328,7 @@ def delete_user_from_group(username:str,groupname:str):
         zu_loeschende_association = db.query(UserGroupAssociation).filter(UserGroupAssociation.user_id == user_id, UserGroupAssociation.group_id == group_id).first()
         db.delete(zu_loeschende_association)
         db.commit()
+        membership_cache.pop((username, groupname))
         db.close()
         print("Nutzer hinzugefügt")
 
@@ -227,54 +336,77 @@ def delete_user_from_group(username:str,groupname:str):
         return f"Fehler beim hinzufügen des Nutzers zur gruppe {e}"
     
 
-def is_user_in_group(username,groupname):
-    db = SessionLocal()
-    group = db.query(Group).filter(Group.name == groupname).first()
+# Only positive answers are cached, a user who just joined through another worker is never refused.
+# Leaving is invalidated here; on other workers a stale membership lives at most MEMBERSHIP_CACHE_TTL seconds.
+MEMBERSHIP_CACHE_TTL = 30
+membership_cache = TTLCache(maxsize=10000, ttl=MEMBERSHIP_CACHE_TTL)
 
-    if group is not None:
-        result = username in [userassociation.user.username for userassociation in group.group_users]
-        db.close()
-        return result
-    else:
+
+def _load_membership(username, groupname):
+    db = SessionLocal()
+    try:
+        membership = db.query(UserGroupAssociation.id).join(
+            User, User.id == UserGroupAssociation.user_id
+        ).join(Group, Group.id == UserGroupAssociation.group_id).filter(
+            User.username == username,
+            Group.name == groupname
+        ).first()
+        return True if membership else None
+    finally:
         db.close()
-        return False  # Changed from string to False for consistency
+
+
+def is_user_in_group(username,groupname):
+    return bool(cached_lookup(membership_cache, (username, groupname), lambda: _load_membership(username, groupname)))
         
 
 def is_subject_in_group(subjectname,group_id):
-    db = SessionLocal()
-    subject = db.query(Subject).filter(Subject.name == subjectname, Subject.group_id == group_id).first()
-    print(f"Checking if subject '{subjectname}' exists in group {group_id}: {subject is not None}")
-
-    if subject is not None:
-       db.close()
-       return True
-    else:
-       db.close()
-       return False
+    subject_id = _lookup_subject_id(subjectname, group_id)
+    print(f"Checking if subject '{subjectname}' exists in group {group_id}: {subject_id is not None}")
+    return subject_id is not None
     
 
 def get_group(name):
+    """Group overview: members, subjects with their flashcard counts and the number of open lobbies.
+
+    Built from four aggregate queries, so the cost does not grow with lazy loads per member or subject.
+    """
     db = SessionLocal()
-    group = db.query(Group).filter(Group.name == name).first()
+    try:
+        group_id = db.query(Group.id).filter(Group.name == name).scalar()
+        if group_id is None:
+            return "Gruppe wurde nicht gefunden"
+
+        users = [
+            username for (username,) in db.query(User.username).join(
+                UserGroupAssociation, UserGroupAssociation.user_id == User.id
+            ).filter(UserGroupAssociation.group_id == group_id).order_by(UserGroupAssociation.id)
+        ]
 
-    
-    if group is not None:
-        subjects = [subjectobject.name for subjectobject in group.subjects]
-        print(f"Group '{name}' has {len(subjects)} subjects: {subjects}")
-        
-        group_details = {
-        "name":name,
-        "id":group.id,
-        "users":[userassociation.user.username for userassociation in group.group_users],
-        "subjects": subjects
-        
-    }
-        db.close()
-        return group_details
-    else:
+        subject_details = [
+            {"name": subject_name, "flashcard_count": flashcard_count}
+            for subject_name, flashcard_count in db.query(Subject.name, func.count(Flashcard.id)).outerjoin(
+                Flashcard, Flashcard.subject_id == Subject.id
+            ).filter(Subject.group_id == group_id).group_by(Subject.id).order_by(Subject.id)
+        ]
+
+        active_lobbies = db.query(func.count(QuizSession.id)).filter(
+            QuizSession.group_id == group_id,
+            QuizSession.status.in_(("waiting", "in_progress"))
+        ).scalar()
+
+        return {
+            "name": name,
+            "id": group_id,
+            "users": users,
+            "subjects": [subject["name"] for subject in subject_details],
+            "subject_details": subject_details,
+            "member_count": len(users),
+            "active_lobbies": active_lobbies
+        }
+    finally:
         db.close()
-        return "Gruppe wurde nicht gefunden"
-    
+
 
 def add_subject_to_group(subjectname,groupname):
     db = SessionLocal()
@@ -306,16 +438,15 @@ def delete_subject_from_group(subjectname,group_id):
     try:
         print(f"DEBUG: Deleting subject '{subjectname}' from group_id {group_id}")
         
-        zu_loeschendes_subject = db.query(Subject).filter(Subject.name == subjectname, Subject.group_id == group_id).first()
+        subject_ids, session_ids = _purge_subjects(db, (Subject.name == subjectname) & (Subject.group_id == group_id))
         
-        if not zu_loeschendes_subject:
+        if not subject_ids:
             print(f"DEBUG: Subject '{subjectname}' not found in group {group_id}")
             return "Subject existiert nicht in der Gruppe"
         
-        print(f"DEBUG: Found subject to delete: '{zu_loeschendes_subject.name}' (ID: {zu_loeschendes_subject.id})")
-        
-        db.delete(zu_loeschendes_subject)
         db.commit()
+        subject_id_cache.pop((group_id, subjectname))
+        _forget_deleted(subject_ids, session_ids)
         print(f"DEBUG: Successfully deleted subject '{subjectname}'")
         return "Subject erfolgreich gelöscht"
         
@@ -349,8 +480,10 @@ def update_subject_name(old_subjectname, new_subjectname, group_id):
             return "Ein Fach mit diesem Namen existiert bereits in der Gruppe"
         
         subject.name = new_subjectname
+        subject.cards_version = subject.cards_version + 1
         db.merge(subject)  # Use merge instead of direct commit
         db.commit()
+        subject_id_cache.pop((group_id, old_subjectname))
         
         return "Subject erfolgreich umbenannt"
         
@@ -361,59 +494,243 @@ def update_subject_name(old_subjectname, new_subjectname, group_id):
     finally:
         db.close()
 
-def get_subject_id(subjectname, groupname):
+# The n-th source flashcard of a clone belongs to the n-th copy. Both id lists are numbered by
+# INSERT ... SELECT into temp tables and joined on that number; joining two row_number() subqueries
+# is quadratic in SQLite.
+CLONE_SOURCES = Table(
+    "clone_sources", MetaData(),
+    Column("position", Integer, primary_key=True),
+    Column("source_id", Integer, nullable=False, unique=True),
+    prefixes=["TEMPORARY"]
+)
+CLONE_COPIES = Table(
+    "clone_copies", MetaData(),
+    Column("position", Integer, primary_key=True),
+    Column("clone_id", Integer, nullable=False),
+    prefixes=["TEMPORARY"]
+)
+
+
+def clone_subject(source_subject_id: int, target_group_id: int, new_subjectname: str):
+    """Copy a subject with all flashcards and answers into a group in one transaction.
+
+    Flashcards, answers and the mapping between them are copied with set-based INSERT ... SELECT
+    statements, so neither the number of statements nor the Python work depends on the deck size.
+    Returns the new subject id, or an error string.
+    """
     db = SessionLocal()
-    group_id = get_group_id(groupname)
+    try:
+        if db.query(Subject.id).filter(Subject.name == new_subjectname, Subject.group_id == target_group_id).first():
+            return "Ein Fach mit diesem Namen existiert bereits in der Gruppe"
 
-    subject = db.query(Subject).filter(
-    Subject.name == subjectname,
-    Subject.group_id == group_id
-        ).first()
+        new_subject = Subject(name=new_subjectname, group_id=target_group_id)
+        db.add(new_subject)
+        db.flush()
+        new_subject_id = new_subject.id
+
+        copied = db.execute(insert(Flashcard).from_select(
+            ["question", "subject_id"],
+            select(Flashcard.question, literal(new_subject_id)).where(
+                Flashcard.subject_id == source_subject_id
+            ).order_by(Flashcard.id)
+        )).rowcount
+
+        if copied:
+            connection = db.connection()
+            CLONE_SOURCES.create(connection, checkfirst=True)
+            CLONE_COPIES.create(connection, checkfirst=True)
+            try:
+                # Emptied after every clone, so both tables number their rows from 1
+                for column, subject_id in ((CLONE_SOURCES.c.source_id, source_subject_id), (CLONE_COPIES.c.clone_id, new_subject_id)):
+                    db.execute(insert(column.table).from_select(
+                        [column.name],
+                        select(Flashcard.id).where(Flashcard.subject_id == subject_id).order_by(Flashcard.id)
+                    ))
+                db.execute(insert(Answer).from_select(
+                    ["antwort", "is_correct", "flashcard_id"],
+                    select(Answer.antwort, Answer.is_correct, CLONE_COPIES.c.clone_id)
+                    .join(CLONE_SOURCES, Answer.flashcard_id == CLONE_SOURCES.c.source_id)
+                    .join(CLONE_COPIES, CLONE_COPIES.c.position == CLONE_SOURCES.c.position)
+                    .order_by(Answer.id)
+                ))
+            finally:
+                db.execute(CLONE_SOURCES.delete())
+                db.execute(CLONE_COPIES.delete())
+
+        index_subject(db, new_subject_id)
+        db.commit()
+        logger.info("Cloned subject %s into '%s' (ID: %s) with %s flashcards", source_subject_id, new_subjectname, new_subject_id, copied)
+        return new_subject_id
+    except Exception as e:
+        db.rollback()
+        logger.exception("Fehler beim Kopieren des Subjects")
+        return f"Fehler: {e}"
+    finally:
+        db.close()
 
 
-    if subject is not None:
-        subject_id = subject.id
-        db.close()
+def get_subject_id(subjectname, groupname):
+    group_id = _lookup_group_id(groupname)
+    subject_id = _lookup_subject_id(subjectname, group_id) if group_id is not None else None
+
+    if subject_id is not None:
         return subject_id
     else:
-        db.close()
         return "Subject konnte nicht gefunden werden"
 
-def get_subject_cards(subjectname, groupname):
+def _bump_deck_version(db, subject_id: int):
+    """Invalidate cached copies of a deck; part of the caller's transaction"""
+    db.query(Subject).filter(Subject.id == subject_id).update(
+        {Subject.cards_version: Subject.cards_version + 1}, synchronize_session=False
+    )
+
+
+def find_subject(subjectname, groupname):
+    """Id and cards_version of a subject in a group, or None"""
     db = SessionLocal()
-    group_id = get_group_id(groupname)  # Gruppe-ID holen
-    print(f"Looking for subject '{subjectname}' in group with ID: {group_id}")
-    
-    subject = db.query(Subject).filter(Subject.name == subjectname, Subject.group_id == group_id).first()
-    print(f"Subject found: {subject}")
+    try:
+        return db.query(Subject.id, Subject.cards_version).join(Group).filter(
+            Subject.name == subjectname,
+            Group.name == groupname
+        ).first()
+    finally:
+        db.close()
 
-    if not subject:
-        print(f"Subject '{subjectname}' not found in group '{groupname}' (ID: {group_id})")
+
+def get_subject_cards_by_id(subject_id: int):
+    """Whole deck of a subject with answers loaded in one extra query"""
+    db = SessionLocal()
+    try:
+        subject = db.query(Subject).filter(Subject.id == subject_id).first()
+        if not subject:
+            return False
+
+        flashcards = db.query(Flashcard).options(selectinload(Flashcard.answers)).filter(
+            Flashcard.subject_id == subject.id
+        ).order_by(Flashcard.id).all()
+
+        return {
+            "subject_id": subject.id,
+            "subject_name": subject.name,
+            "version": subject.cards_version,
+            "flashcards": [_serialize_flashcard(flashcard) for flashcard in flashcards]
+        }
+    finally:
         db.close()
-        return False
 
-    
-    flashcards = db.query(Flashcard).filter(Flashcard.subject_id == subject.id).all()
 
-   
-    subject_cards = {
-        "subject_id": subject.id,
-        "subject_name": subject.name,
-        "flashcards": [
-            {
-                "flashcard_id": flashcard.id,
-                "question": flashcard.question,
-                "answers": [
-                    {"answer_id": answer.id, "text": answer.antwort, "is_correct": answer.is_correct}
-                    for answer in flashcard.answers
-                ]
-            }
-            for flashcard in flashcards
+def _serialize_flashcard(flashcard: Flashcard) -> dict:
+    return {
+        "flashcard_id": flashcard.id,
+        "question": flashcard.question,
+        "answers": [
+            {"answer_id": answer.id, "text": answer.antwort, "is_correct": answer.is_correct}
+            for answer in flashcard.answers
         ]
     }
 
-    db.close()
-    return subject_cards
+
+def _flashcards_after(db, subject_id: int, after_id: int, limit: int):
+    """Keyset page of flashcards ordered by id, answers loaded in one query"""
+    return db.query(Flashcard).options(selectinload(Flashcard.answers)).filter(
+        Flashcard.subject_id == subject_id,
+        Flashcard.id > after_id
+    ).order_by(Flashcard.id).limit(limit).all()
+
+
+def get_subject_cards_page(subject_id: int, after_id: int = 0, limit: int = 100):
+    """One page of a deck; next_cursor is the after_id for the following page"""
+    db = SessionLocal()
+    try:
+        subject = db.query(Subject).filter(Subject.id == subject_id).first()
+        if not subject:
+            return False
+
+        flashcards = _flashcards_after(db, subject_id, after_id, limit + 1)
+        has_more = len(flashcards) > limit
+        flashcards = flashcards[:limit]
+
+        return {
+            "subject_id": subject.id,
+            "subject_name": subject.name,
+            "version": subject.cards_version,
+            "flashcards": [_serialize_flashcard(flashcard) for flashcard in flashcards],
+            "next_cursor": flashcards[-1].id if has_more else None
+        }
+    finally:
+        db.close()
+
+
+def iter_subject_cards(subject_id: int, batch_size: int = 500):
+    """Yield the cards of a deck one by one, reading batch_size cards at a time"""
+    db = SessionLocal()
+    try:
+        after_id = 0
+        while True:
+            flashcards = _flashcards_after(db, subject_id, after_id, batch_size)
+            if not flashcards:
+                return
+            for flashcard in flashcards:
+                yield _serialize_flashcard(flashcard)
+            after_id = flashcards[-1].id
+            db.expunge_all()  # keep memory bounded to one batch
+    finally:
+        db.close()
+
+
+def search_group_flashcards(groupname: str, search_text: str, subjectname: str = None, limit: int = 20, offset: int = 0):
+    """Ranked full-text search over the flashcards of a group or one of its subjects"""
+    db = SessionLocal()
+    try:
+        group_id = db.query(Group.id).filter(Group.name == groupname).scalar()
+        if group_id is None:
+            return "Gruppe wurde nicht gefunden"
+
+        subject_id = None
+        if subjectname:
+            subject_id = db.query(Subject.id).filter(Subject.name == subjectname, Subject.group_id == group_id).scalar()
+            if subject_id is None:
+                return "Subject existiert nicht in der Gruppe"
+
+        matches = search_flashcards(db, search_text, group_id, subject_id, limit + 1, offset)
+        has_more = len(matches) > limit
+        matches = matches[:limit]
+
+        flashcards = {
+            flashcard.id: flashcard
+            for flashcard in db.query(Flashcard).options(
+                selectinload(Flashcard.answers), selectinload(Flashcard.subject)
+            ).filter(Flashcard.id.in_([match["flashcard_id"] for match in matches]))
+        }
+
+        results = []
+        for match in matches:
+            flashcard = flashcards.get(match["flashcard_id"])
+            if flashcard is None:
+                continue
+            results.append({
+                **_serialize_flashcard(flashcard),
+                "subject_name": flashcard.subject.name,
+                "question_snippet": match["question_snippet"],
+                "answers_snippet": match["answers_snippet"],
+                "score": match["score"]
+            })
+
+        return {
+            "results": results,
+            "next_offset": offset + limit if has_more else None
+        }
+    finally:
+        db.close()
+
+
+def get_subject_cards(subjectname, groupname):
+    subject = find_subject(subjectname, groupname)
+    if not subject:
+        print(f"Subject '{subjectname}' not found in group '{groupname}'")
+        return False
+
+    return get_subject_cards_by_id(subject.id)
 
 
 
@@ -446,11 +763,16 @@ def create_flashcard(subjectname:str,groupname:str,frage:str,antwortdict:dict):
                 return False
             
         karteikarte = Flashcard(question=frage,subject_id=subject_id)
+        karteikarte.answers = [
+            Answer(antwort=antwort["text"], is_correct=antwort["is_correct"])
+            for antwort in antwortdict
+        ]
         
         db.add(karteikarte)
+        _bump_deck_version(db, subject_id)
+        db.flush()
+        index_flashcards(db, [karteikarte.id])
         db.commit()
-        db.refresh(karteikarte)
-        add_answers_to_flashcard(karteikarte.id,antwortdict)
         return True
     except Exception as e:
         print(f"Error creating flashcard: {e}")
@@ -462,6 +784,117 @@ def create_flashcard(subjectname:str,groupname:str,frage:str,antwortdict:dict):
 
 
 
+MAX_REPORTED_IMPORT_ERRORS = 100
+
+
+def _insert_flashcard_batch(db, subject_id: int, cards: list):
+    """Insert cards and their answers with two multi-row INSERTs"""
+    flashcard_ids = db.execute(
+        insert(Flashcard).returning(Flashcard.id, sort_by_parameter_order=True),
+        [{"question": card["frage"], "subject_id": subject_id} for card in cards]
+    ).scalars().all()
+
+    db.execute(insert(Answer), [
+        {"antwort": answer["text"], "is_correct": answer["is_correct"], "flashcard_id": flashcard_id}
+        for flashcard_id, card in zip(flashcard_ids, cards)
+        for answer in card["antworten"]
+    ])
+    index_flashcards(db, flashcard_ids)
+    _bump_deck_version(db, subject_id)
+    db.commit()
+
+
+def import_flashcards(subject_id: int, rows, batch_size: int = 500):
+    """Import parsed rows into a subject in batched transactions.
+
+    rows yields (row_number, card, error) as produced by deck_import.parse_import_file.
+    Questions that already exist in the subject or earlier in the file are skipped.
+    Yields a progress dict after every batch and a summary dict at the end.
+    """
+    db = SessionLocal()
+    processed = imported = duplicates = error_count = 0
+    errors = []
+    try:
+        known_questions = {
+            question.strip().casefold()
+            for (question,) in db.query(Flashcard.question).filter(Flashcard.subject_id == subject_id)
+        }
+
+        batch = []
+        for row_number, card, error in rows:
+            processed += 1
+            if error:
+                error_count += 1
+                if len(errors) < MAX_REPORTED_IMPORT_ERRORS:
+                    errors.append({"row": row_number, "error": error})
+                continue
+
+            key = card["frage"].strip().casefold()
+            if key in known_questions:
+                duplicates += 1
+                continue
+            known_questions.add(key)
+
+            batch.append(card)
+            if len(batch) >= batch_size:
+                _insert_flashcard_batch(db, subject_id, batch)
+                imported += len(batch)
+                batch = []
+                yield {"type": "progress", "processed": processed, "imported": imported}
+
+        if batch:
+            _insert_flashcard_batch(db, subject_id, batch)
+            imported += len(batch)
+
+        yield {
+            "type": "summary",
+            "processed": processed,
+            "imported": imported,
+            "duplicates": duplicates,
+            "error_count": error_count,
+            "errors": errors
+        }
+    except Exception as e:
+        db.rollback()
+        print(f"Error importing flashcards: {e}")
+        yield {"type": "error", "error": f"Fehler beim Import: {e}", "imported": imported}
+    finally:
+        db.close()
+
+
+def _apply_answer_diff(db, flashcard: Flashcard, antwortdict: list):
+    """Bring the answers of a flashcard in line with antwortdict while keeping unchanged rows and ids.
+
+    An answer is matched by its answer_id if given, otherwise by identical text, otherwise it
+    reuses the next unmatched row. Leftover rows are deleted, missing ones inserted.
+    """
+    unmatched = sorted(flashcard.answers, key=lambda answer: answer.id)
+    by_id = {answer.id: answer for answer in unmatched}
+    targets = []
+
+    for answer_data in antwortdict:
+        answer = by_id.get(answer_data.get("answer_id"))
+        if answer is None or answer not in unmatched:
+            answer = next((a for a in unmatched if a.antwort == answer_data["text"]), None)
+        if answer is not None:
+            unmatched.remove(answer)
+        targets.append((answer, answer_data))
+
+    for answer, answer_data in targets:
+        if answer is None and unmatched:
+            answer = unmatched.pop(0)
+        if answer is None:
+            flashcard.answers.append(Answer(antwort=answer_data["text"], is_correct=answer_data["is_correct"]))
+            continue
+        if answer.antwort != answer_data["text"]:
+            answer.antwort = answer_data["text"]
+        if answer.is_correct != answer_data["is_correct"]:
+            answer.is_correct = answer_data["is_correct"]
+
+    for answer in unmatched:
+        db.delete(answer)
+
+
 def update_flashcard(flashcard_id: int, frage: str, antwortdict: dict):
     """Update an existing flashcard with new question and answers"""
     db = SessionLocal()
@@ -474,16 +907,10 @@ def update_flashcard(flashcard_id: int, frage: str, antwortdict: dict):
             return f"Fehler: Flashcard mit ID {flashcard_id} wurde nicht gefunden."
         
         flashcard.question = frage
-        
-        db.query(Answer).filter(Answer.flashcard_id == flashcard_id).delete()
-        
-        for answer_data in antwortdict:
-            new_answer = Answer(
-                antwort=answer_data["text"],
-                is_correct=answer_data["is_correct"],
-                flashcard_id=flashcard_id
-            )
-            db.add(new_answer)
+        _apply_answer_diff(db, flashcard, antwortdict)
+        _bump_deck_version(db, flashcard.subject_id)
+        db.flush()
+        index_flashcards(db, [flashcard_id])
         
         db.commit()
         return f"Flashcard mit ID {flashcard_id} wurde aktualisiert."
@@ -502,6 +929,9 @@ def delete_flashcard(flashcard_id: int):
         if not flashcard:
             return f"Fehler: Flashcard mit ID {flashcard_id} wurde nicht gefunden."
         
+        _bump_deck_version(db, flashcard.subject_id)
+        remove_flashcards(db, [flashcard_id])
+        remove_flashcard_stats(db, [flashcard_id])
         db.delete(flashcard) 
         db.commit()
         return f"Flashcard mit ID {flashcard_id} wurde gelöscht."
@@ -512,12 +942,123 @@ def delete_flashcard(flashcard_id: int):
         db.close()
 
 
+def apply_flashcard_batch(subject_id: int, operations: list):
+    """Apply create/update/delete operations on one subject in a single transaction.
+
+    Returns a summary dict, or an error string if any operation is invalid (nothing is applied then).
+    """
+    db = SessionLocal()
+    try:
+        referenced_ids = {op["flashcard_id"] for op in operations if op["action"] in ("update", "delete")}
+        flashcards = {}
+        if referenced_ids:
+            flashcards = {
+                flashcard.id: flashcard
+                for flashcard in db.query(Flashcard).options(selectinload(Flashcard.answers)).filter(
+                    Flashcard.id.in_(referenced_ids),
+                    Flashcard.subject_id == subject_id
+                )
+            }
+
+        created = []
+        updated_ids = []
+        deleted_ids = []
+
+        for index, op in enumerate(operations):
+            if op["action"] == "create":
+                flashcard = Flashcard(question=op["frage"], subject_id=subject_id, answers=[
+                    Answer(antwort=answer["text"], is_correct=answer["is_correct"]) for answer in op["antworten"]
+                ])
+                db.add(flashcard)
+                created.append(flashcard)
+                continue
+
+            flashcard = flashcards.get(op["flashcard_id"])
+            if flashcard is None:
+                db.rollback()
+                return f"Fehler in Operation {index + 1}: Flashcard mit ID {op['flashcard_id']} wurde in diesem Fach nicht gefunden."
+
+            if op["action"] == "update":
+                if flashcard.question != op["frage"]:
+                    flashcard.question = op["frage"]
+                _apply_answer_diff(db, flashcard, op["antworten"])
+                updated_ids.append(flashcard.id)
+            else:
+                db.delete(flashcard)
+                del flashcards[op["flashcard_id"]]
+                deleted_ids.append(flashcard.id)
+
+        _bump_deck_version(db, subject_id)
+        db.flush()
+        created_ids = [flashcard.id for flashcard in created]
+        remove_flashcards(db, deleted_ids)
+        remove_flashcard_stats(db, deleted_ids)
+        index_flashcards(db, created_ids + updated_ids)
+        version = db.query(Subject.cards_version).filter(Subject.id == subject_id).scalar()
+        db.commit()
+
+        return {
+            "created_ids": created_ids,
+            "updated": len(updated_ids),
+            "deleted": len(deleted_ids),
+            "version": version
+        }
+    except Exception as e:
+        db.rollback()
+        return f"Fehler beim Speichern der Änderungen: {e}"
+    finally:
+        db.close()
+
+
 
 
 
 
-def start_game(session_id: str) -> dict:
-    """Start the game and prepare first question"""
+GAME_STATE_CONFLICT = "Spielstatus wurde zwischenzeitlich geändert"
+
+
+def _conflict(message: str = GAME_STATE_CONFLICT) -> dict:
+    return {"error": message, "conflict": True}
+
+
+def _version_conflict(game_state: GameState, expected_version: Optional[int]) -> Optional[dict]:
+    """Host commands name the state version they were issued against; a missing or stale one is a conflict.
+
+    That way a double-clicked command is applied once even if the clicks arrive one after the other.
+    """
+    if expected_version is None:
+        return _conflict("Die Spielversion fehlt, bitte den Spielstand neu laden")
+    if game_state.version != expected_version:
+        return _conflict()
+    return None
+
+
+def _save_game_state(db, game_state: GameState, event_type: str, details: dict = None, **changes) -> bool:
+    """Compare-and-swap write: only applies the changes if nobody else wrote the row since it was read.
+
+    The matching journal event is written in the same transaction.
+    """
+    new_version = game_state.version + 1
+    updated = db.query(GameState).filter(
+        GameState.session_id == game_state.session_id,
+        GameState.version == game_state.version
+    ).update({**changes, "version": new_version}, synchronize_session="evaluate")
+
+    if updated != 1:
+        db.rollback()
+        return False
+
+    record_event(db, game_state.session_id, new_version, event_type, changes, **(details or {}))
+    record_snapshot_if_due(db, game_state)
+    db.commit()
+    return True
+
+
+def start_game(session_id: str, expected_version: Optional[int], adaptive: bool = False) -> dict:
+    """Start the game and prepare first question.
+
+    Adaptive games ask the cards in a random order weighted towards the ones the group tends to miss.
+    """
     db = SessionLocal()
     try:
         game_state = db.query(GameState).filter(GameState.session_id == session_id).first()
@@ -534,9 +1075,22 @@ def start_game(session_id: str) -> dict:
                 max_possible_score=max_possible_score,
                 status="waiting"
             )
-            db.add(game_state)
-            db.commit()
+            try:
+                db.add(game_state)
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+                return _conflict()
             db.refresh(game_state)
+
+        conflict = _version_conflict(game_state, expected_version)
+        if conflict:
+            return conflict
+
+        if game_state.status == "game_finished":
+            return _conflict("Das Spiel ist bereits beendet")
+        if game_state.status != "waiting":
+            return _conflict("Das Spiel läuft bereits")
             
         session = db.query(QuizSession).filter(QuizSession.id == session_id).first()
         flashcards = db.query(Flashcard).filter(Flashcard.subject_id == session.subject_id).all()
@@ -545,13 +1099,28 @@ def start_game(session_id: str) -> dict:
             return {"error": "Keine Karteikarten gefunden"}
             
         first_flashcard = flashcards[0]
-        game_state.status = "question_active"
-        game_state.started_at = datetime.utcnow()
-        game_state.current_flashcard_id = first_flashcard.id
-        game_state.current_question_index = 0
-        game_state.question_started_at = datetime.utcnow()
-        
-        db.commit()
+        adaptive_seed = None
+        if adaptive:
+            adaptive_seed = random.getrandbits(31)
+            first_id = adaptive_queues.start(db, session_id, session.subject_id, [flashcard.id for flashcard in flashcards], adaptive_seed)
+            first_flashcard = next(flashcard for flashcard in flashcards if flashcard.id == first_id)
+
+        now = datetime.utcnow()
+        session.status = "in_progress"
+        saved = _save_game_state(
+            db, game_state, "started",
+            status="question_active",
+            max_possible_score=game_state.max_possible_score,
+            started_at=now,
+            current_flashcard_id=first_flashcard.id,
+            current_question_index=0,
+            question_started_at=now,
+            adaptive_seed=adaptive_seed
+        )
+        if not saved:
+            adaptive_queues.forget(session_id)
+            return _conflict()
+        adaptive_queues.pop(session_id)
         
         game_state_dict = {
             "session_id": game_state.session_id,
@@ -562,7 +1131,8 @@ def start_game(session_id: str) -> dict:
             "status": game_state.status,
             "question_started_at": game_state.question_started_at.isoformat() if game_state.question_started_at else None,
             "started_at": game_state.started_at.isoformat() if game_state.started_at else None,
-            "flashcard_count": len(flashcards)
+            "flashcard_count": len(flashcards),
+            "version": game_state.version
         }
         
         return {
@@ -587,16 +1157,28 @@ def prepare_question_data(flashcard: Flashcard, question_index: int, total_quest
     }
 
 
-def cast_vote(session_id: str, user_id: int, flashcard_id: int, answer_id: int) -> int:
-    """Cast or update a user's vote for current question"""
+def cast_vote(session_id: str, user_id: int, flashcard_id: int, answer_id: int):
+    """Cast or update a user's vote for the current question; returns the vote id or an error dict.
+
+    Votes are only taken while the question is open. The state ETag is built from GameState.version,
+    which votes don't bump, so a vote after the question ended would change the state unnoticed.
+    """
     db = SessionLocal()
     try:
+        game_state = db.query(GameState.status, GameState.current_flashcard_id).filter(
+            GameState.session_id == session_id
+        ).first()
+        if not game_state or game_state.status != "question_active" or game_state.current_flashcard_id != flashcard_id:
+            return _conflict("Die Abstimmung für diese Frage ist beendet")
+
         existing_vote = db.query(Vote).filter(
             Vote.session_id == session_id,
             Vote.user_id == user_id,
             Vote.flashcard_id == flashcard_id
         ).first()
         
+        record_event(db, session_id, None, "vote", user_id=user_id, flashcard_id=flashcard_id, answer_id=answer_id)
+        
         if existing_vote:
             existing_vote.answer_id = answer_id
             existing_vote.voted_at = datetime.utcnow()
@@ -653,13 +1235,20 @@ def get_question_votes(session_id: str, flashcard_id: int) -> dict:
         db.close()
 
 
-def end_question(session_id: str) -> dict:
+def end_question(session_id: str, expected_version: Optional[int]) -> dict:
     """End current question and calculate results"""
     db = SessionLocal()
     try:
         game_state = db.query(GameState).filter(GameState.session_id == session_id).first()
         if not game_state:
             return {"error": "Spielstatus nicht gefunden"}
+
+        conflict = _version_conflict(game_state, expected_version)
+        if conflict:
+            return conflict
+
+        if game_state.status != "question_active":
+            return _conflict("Die Frage ist bereits beendet")
             
         flashcard = db.query(Flashcard).filter(Flashcard.id == game_state.current_flashcard_id).first()
         if not flashcard:
@@ -684,9 +1273,20 @@ def end_question(session_id: str) -> dict:
         was_correct = winning_answer_id == correct_answer.id
         points_earned = 100 if was_correct else 0
         
-        game_state.total_score += points_earned
-        game_state.status = "question_ended"
-        db.commit()
+        saved = _save_game_state(
+            db, game_state, "question_ended",
+            details={
+                "flashcard_id": flashcard.id,
+                "correct_answer_id": correct_answer.id,
+                "winning_answer_id": winning_answer_id,
+                "was_correct": was_correct,
+                "vote_counts": vote_counts
+            },
+            total_score=game_state.total_score + points_earned,
+            status="question_ended"
+        )
+        if not saved:
+            return _conflict()
         
         return {
             "flashcard_id": flashcard.id,
@@ -695,31 +1295,62 @@ def end_question(session_id: str) -> dict:
             "points_earned": points_earned,
             "total_score": game_state.total_score,
             "winning_answer_id": winning_answer_id,
-            "vote_counts": vote_counts
+            "vote_counts": vote_counts,
+            "version": game_state.version
         }
     finally:
         db.close()
 
 
-def next_question(session_id: str) -> dict:
-    """Move to next question or end game"""
+def _next_adaptive_flashcard(db, session_id: str, subject_id: int, seed: int):
+    """Head of the game's difficulty queue; cards deleted since the game started are dropped"""
+    while True:
+        flashcard_id = adaptive_queues.next_card(db, session_id, subject_id, seed)
+        if flashcard_id is None:
+            return None
+        flashcard = db.get(Flashcard, flashcard_id)
+        if flashcard is not None:
+            return flashcard
+        adaptive_queues.pop(session_id)
+
+
+def next_question(session_id: str, expected_version: Optional[int]) -> dict:
+    """Move to next question or end game.
+
+    Runs on a worker thread; once the game finished the caller drops its in-memory state with forget_sessions.
+    """
     db = SessionLocal()
     try:
         game_state = db.query(GameState).filter(GameState.session_id == session_id).first()
+        if not game_state:
+            return {"error": "Spielstatus nicht gefunden"}
+
+        conflict = _version_conflict(game_state, expected_version)
+        if conflict:
+            return conflict
+
+        if game_state.status not in ("question_active", "question_ended"):
+            return _conflict("Das Spiel ist bereits beendet")
+
         session = db.query(QuizSession).filter(QuizSession.id == session_id).first()
-        
-        flashcards = db.query(Flashcard).filter(Flashcard.subject_id == session.subject_id).all()
-        total_questions = len(flashcards)
-        
         next_index = game_state.current_question_index + 1
+
+        if game_state.adaptive_seed is not None:
+            # the deck size was fixed when the game started, the queue knows which cards are left
+            total_questions = game_state.max_possible_score // 100
+            next_flashcard = _next_adaptive_flashcard(db, session_id, session.subject_id, game_state.adaptive_seed)
+        else:
+            flashcards = db.query(Flashcard).filter(Flashcard.subject_id == session.subject_id).all()
+            total_questions = len(flashcards)
+            next_flashcard = flashcards[next_index] if next_index < total_questions else None
         
-        
-        if next_index >= total_questions:
+        if next_index >= total_questions or next_flashcard is None:
             percentage = (game_state.total_score / game_state.max_possible_score) * 100
             status = "won" if percentage >= 90 else "lost"
-            game_state.status = "game_finished"
-            game_state.ended_at = datetime.utcnow()
-            db.commit()
+            session.status = "finished"
+            if not _save_game_state(db, game_state, "finished", details={"reason": status}, status="game_finished", ended_at=datetime.utcnow()):
+                return _conflict()
+            finalize_game(session_id)
             
             return {
                 "game_finished": True,
@@ -731,24 +1362,78 @@ def next_question(session_id: str) -> dict:
                     "status": status,
                     "questions_answered": total_questions,
                     "total_questions": total_questions
-                }
+                },
+                "version": game_state.version
             }
         else:
-            next_flashcard = flashcards[next_index]
-            game_state.current_question_index = next_index
-            game_state.current_flashcard_id = next_flashcard.id
-            game_state.question_started_at = datetime.utcnow()
-            game_state.status = "question_active"
-            db.commit()
+            saved = _save_game_state(
+                db, game_state, "advanced",
+                current_question_index=next_index,
+                current_flashcard_id=next_flashcard.id,
+                question_started_at=datetime.utcnow(),
+                status="question_active"
+            )
+            if not saved:
+                return _conflict()
+            if game_state.adaptive_seed is not None:
+                adaptive_queues.pop(session_id)
             
             return {
                 "game_finished": False,
-                "question": prepare_question_data(next_flashcard, next_index, total_questions)
+                "question": prepare_question_data(next_flashcard, next_index, total_questions),
+                "version": game_state.version
             }
     finally:
         db.close()
 
 
+def end_game(session_id: str, expected_version: Optional[int]) -> dict:
+    """Finish the game manually and build the result.
+
+    Runs on a worker thread like next_question, the caller calls forget_sessions afterwards.
+    """
+    db = SessionLocal()
+    try:
+        game_state = db.query(GameState).filter(GameState.session_id == session_id).first()
+        session = db.query(QuizSession).filter(QuizSession.id == session_id).first()
+
+        if game_state:
+            conflict = _version_conflict(game_state, expected_version)
+            if conflict:
+                return conflict
+            if game_state.status == "game_finished":
+                return _conflict("Das Spiel ist bereits beendet")
+            if not _save_game_state(db, game_state, "finished", details={"reason": "ended_manually"}, status="game_finished", ended_at=datetime.utcnow()):
+                return _conflict()
+
+        if session:
+            session.status = "finished"
+            db.commit()
+
+        if game_state:
+            finalize_game(session_id)
+
+        if game_state:
+            percentage = (game_state.total_score / game_state.max_possible_score) * 100 if game_state.max_possible_score > 0 else 0
+            return {
+                "session_id": session_id,
+                "total_score": game_state.total_score,
+                "max_possible_score": game_state.max_possible_score,
+                "percentage": percentage,
+                "status": "ended_manually",
+                "questions_answered": game_state.current_question_index,
+                "total_questions": game_state.max_possible_score // 100,
+                "version": game_state.version
+            }
+
+        return {
+            "session_id": session_id,
+            "status": "ended_manually"
+        }
+    finally:
+        db.close()
+
+
 def get_game_state(session_id: str) -> dict:
     """Get current game state with current question"""
     db = SessionLocal()
@@ -768,7 +1453,8 @@ def get_game_state(session_id: str) -> dict:
             "max_possible_score": game_state.max_possible_score,
             "status": game_state.status,
             "question_started_at": game_state.question_started_at.isoformat() if game_state.question_started_at else None,
-            "flashcard_count": flashcard_count
+            "flashcard_count": flashcard_count,
+            "version": game_state.version
         }
         
         if game_state.current_flashcard_id:
@@ -841,6 +1527,9 @@ def get_chat_messages(session_id: str, limit: int = 50) -> list:
         messages = db.query(ChatMessage).filter(
             ChatMessage.session_id == session_id
         ).order_by(ChatMessage.sent_at.desc()).limit(limit).all()
+
+        if not messages:
+            return _archived_chat_messages(db, session_id, limit)
         
         result = []
         for msg in reversed(messages):  # Reverse to get chronological order
@@ -860,10 +1549,45 @@ def get_chat_messages(session_id: str, limit: int = 50) -> list:
 
 
 
+def _archived_chat_messages(db, session_id: str, limit: int) -> list:
+    archive = load_archive(db, session_id)
+    if archive is None:
+        return []
+
+    messages = archive["chat"][-limit:] if limit > 0 else []
+    usernames = dict(db.query(User.id, User.username).filter(
+        User.id.in_({message["user_id"] for message in messages})
+    ).all())
+    return [
+        {
+            "id": message["id"],
+            "user_id": message["user_id"],
+            "username": usernames.get(message["user_id"], "Unknown"),
+            "message": message["message"],
+            "sent_at": datetime.fromisoformat(message["sent_at"]) if message["sent_at"] else None
+        }
+        for message in messages
+    ]
+
+
 def calculate_final_result(session_id: str):
-    """Calculate final game result"""
+    """Calculate final game result, with per-question details once the game is summarized"""
     db = SessionLocal()
     try:
+        summary = get_game_summary(db, session_id)
+        if summary:
+            return {
+                "final_score": summary["total_score"],
+                "questions_correct": summary["questions_correct"],
+                "questions_total": summary["questions_total"],
+                "max_possible_score": summary["max_possible_score"],
+                "target_score": summary["target_score"],
+                "victory": summary["victory"],
+                "percentage": (summary["total_score"] / summary["max_possible_score"]) * 100 if summary["max_possible_score"] > 0 else 0,
+                "outcome": summary["outcome"],
+                "questions": summary["questions"]
+            }
+
         game_state = db.query(GameState).filter(GameState.session_id == session_id).first()
         if not game_state:
             return None
@@ -890,10 +1614,241 @@ def calculate_final_result(session_id: str):
         db.close()
 
 
+def _resolve_stats_scope(db, groupname: str = None, subjectname: str = None):
+    """(scope, scope_id, group_id) for a group or one of its subjects, or an error string"""
+    group_id = db.query(Group.id).filter(Group.name == groupname).scalar()
+    if group_id is None:
+        return "Gruppe wurde nicht gefunden"
+    if not subjectname:
+        return "group", group_id, group_id
+
+    subject_id = db.query(Subject.id).filter(Subject.name == subjectname, Subject.group_id == group_id).scalar()
+    if subject_id is None:
+        return "Subject existiert nicht in der Gruppe"
+    return "subject", subject_id, group_id
+
+
+def get_game_stats(user_id: int = None, groupname: str = None, subjectname: str = None, most_missed_limit: int = 10):
+    """Totals of a player, or of a group or subject together with its most missed cards"""
+    db = SessionLocal()
+    try:
+        if user_id is not None:
+            return {"stats": get_stats(db, "user", user_id)}
+
+        resolved = _resolve_stats_scope(db, groupname, subjectname)
+        if isinstance(resolved, str):
+            return resolved
+        scope, scope_id, group_id = resolved
+        return {
+            "stats": get_stats(db, scope, scope_id),
+            "most_missed": get_most_missed(
+                db, group_id, scope_id if scope == "subject" else None, most_missed_limit
+            )
+        }
+    finally:
+        db.close()
+
+
+def get_subject_card_stats(groupname: str, subjectname: str, after_id: int = 0, limit: int = 100):
+    """Per-card accuracy of a subject, cursor-paginated by flashcard id"""
+    db = SessionLocal()
+    try:
+        resolved = _resolve_stats_scope(db, groupname, subjectname)
+        if isinstance(resolved, str):
+            return resolved
+        return get_flashcard_stats_page(db, resolved[1], after_id, limit)
+    finally:
+        db.close()
+
+
+def get_group_analytics_report(groupname: str, card_limit: int = 20):
+    """Card difficulty, subject and player performance of a group, from its archived question outcomes"""
+    from group_analytics import get_group_report  # pulls in NumPy, kept off the startup path
+    db = SessionLocal()
+    try:
+        group_id = db.query(Group.id).filter(Group.name == groupname).scalar()
+        if group_id is None:
+            return "Gruppe wurde nicht gefunden"
+        return get_group_report(db, group_id, card_limit)
+    finally:
+        db.close()
+
+
+def get_game_history(user_id: int = None, groupname: str = None, subjectname: str = None, before: str = None, limit: int = 20):
+    """Newest-first finished games; pass next_cursor as before to get the next page"""
+    db = SessionLocal()
+    try:
+        try:
+            cursor = decode_cursor(before) if before else None
+        except ValueError:
+            return "Ungültiger Cursor"
+
+        if user_id is not None:
+            return get_history_page(db, "user", user_id, cursor, limit)
+
+        resolved = _resolve_stats_scope(db, groupname, subjectname)
+        if isinstance(resolved, str):
+            return resolved
+        scope, scope_id, _ = resolved
+        return get_history_page(db, scope, scope_id, cursor, limit)
+    finally:
+        db.close()
+
+
+MAINTENANCE_BATCH_SIZE = 200  # sessions per maintenance transaction
+WAITING_LOBBY_MAX_AGE = timedelta(hours=6)
+RUNNING_GAME_MAX_AGE = timedelta(hours=24)
+FINISHED_GAME_RELEASE_AGE = timedelta(hours=1)
+PENDING_LOBBY_INVITATION_MAX_AGE = timedelta(days=1)
+
+
+def _in_time_boxed_batches(run_batch, time_budget: float) -> list:
+    """Call run_batch (one short transaction returning the ids it handled) until it runs dry or the budget is used up.
+
+    Keeping every transaction small means the SQLite write lock is never held for long;
+    whatever is left over is handled on the next maintenance run.
+    """
+    handled = []
+    deadline = time.monotonic() + time_budget
+    while time.monotonic() < deadline:
+        batch = run_batch()
+        handled.extend(batch)
+        if len(batch) < MAINTENANCE_BATCH_SIZE:
+            break
+    return handled
+
+
+def expire_abandoned_sessions(time_budget: float = 0.5) -> list:
+    """Delete lobbies nobody started and games nobody finished; returns the deleted session ids.
+
+    Runs on a maintenance thread, so the caller drops their in-memory state with forget_sessions.
+    """
+    def run_batch():
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            abandoned = db.query(QuizSession.id).filter(
+                ((QuizSession.status == "waiting") & (QuizSession.created_at < now - WAITING_LOBBY_MAX_AGE)) |
+                ((QuizSession.status == "in_progress") & (QuizSession.created_at < now - RUNNING_GAME_MAX_AGE))
+            ).order_by(QuizSession.id).limit(MAINTENANCE_BATCH_SIZE).subquery()
+            session_ids = _purge_sessions(db, QuizSession.id.in_(select(abandoned.c.id)))
+            db.commit()
+            return session_ids
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    return _in_time_boxed_batches(run_batch, time_budget)
+
+
+def release_finished_games(time_budget: float = 0.5) -> list:
+    """Archive finished games and drop their open invitations; returns their session ids.
+
+    Votes, chat and journal events move into one compressed GameArchive row per game, next to the
+    summary rows written when the game finished. Participants and the final game state stay.
+    Like expire_abandoned_sessions, leaves forget_sessions to the caller.
+    """
+    def run_batch():
+        db = SessionLocal()
+        try:
+            finished = db.query(QuizSession.id).join(
+                GameState, GameState.session_id == QuizSession.id
+            ).outerjoin(
+                GameArchive, GameArchive.session_id == QuizSession.id
+            ).filter(
+                QuizSession.status == "finished",
+                GameState.status == "game_finished",
+                GameState.ended_at < datetime.utcnow() - FINISHED_GAME_RELEASE_AGE,
+                GameArchive.session_id.is_(None)
+            ).limit(MAINTENANCE_BATCH_SIZE)
+            session_ids = [session_id for (session_id,) in finished]
+            if session_ids:
+                archive_games(db, session_ids)
+                db.execute(delete(LobbyInvitation).where(LobbyInvitation.session_id.in_(session_ids)))
+                db.commit()
+            return session_ids
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    return _in_time_boxed_batches(run_batch, time_budget)
+
+
+def purge_stale_invitations() -> int:
+    """Delete lobby invitations that can no longer be accepted and group invitations of existing members"""
+    db = SessionLocal()
+    try:
+        open_sessions = select(QuizSession.id).where(QuizSession.status == "waiting")
+        removed = db.execute(delete(LobbyInvitation).where(
+            (LobbyInvitation.session_id.not_in(open_sessions)) |
+            ((LobbyInvitation.status != "pending") & (LobbyInvitation.created_at < datetime.utcnow() - timedelta(hours=1))) |
+            (LobbyInvitation.created_at < datetime.utcnow() - PENDING_LOBBY_INVITATION_MAX_AGE)
+        )).rowcount
+
+        already_member = select(UserGroupAssociation.id).where(
+            UserGroupAssociation.user_id == Invitation.to_user_id,
+            UserGroupAssociation.group_id == Invitation.group_id
+        ).exists()
+        removed += db.execute(delete(Invitation).where(
+            already_member | Invitation.group_id.not_in(select(Group.id))
+        )).rowcount
+
+        db.commit()
+        return removed
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def purge_orphaned_session_rows(time_budget: float = 0.5) -> list:
+    """Delete rows left behind by sessions that no longer exist; returns the orphaned session ids"""
+    def run_batch():
+        db = SessionLocal()
+        try:
+            existing_sessions = select(QuizSession.id)
+            orphaned = set()
+            for model in SESSION_CHILD_MODELS:
+                orphaned.update(session_id for (session_id,) in db.query(model.session_id).filter(
+                    model.session_id.not_in(existing_sessions)
+                ).distinct().limit(MAINTENANCE_BATCH_SIZE - len(orphaned)))
+                if len(orphaned) >= MAINTENANCE_BATCH_SIZE:
+                    break
+            if orphaned:
+                for model in SESSION_CHILD_MODELS:
+                    db.execute(delete(model).where(model.session_id.in_(orphaned)))
+                db.commit()
+            return list(orphaned)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    return _in_time_boxed_batches(run_batch, time_budget)
+
+
+def get_cache_stats() -> dict:
+    """Hit rates of the in-process lookup caches of this worker"""
+    return {
+        "membership": membership_cache.stats(),
+        "user_ids": user_id_cache.stats(),
+        "group_ids": group_id_cache.stats(),
+        "subject_ids": subject_id_cache.stats(),
+        "session_access": session_access.entries.stats()
+    }
+
+
 
 
 
 if __name__ == '__main__':
     add_user_to_group("Hongfa","blabubb")
     
-    pass
\ No newline at end of file
+    pass
+
@@ -0,0 +1,36 @@
+"""
+Cache of serialized subject decks, validated by the subject's cards_version
+"""
+from typing import Optional
+from collections import OrderedDict
+
+MAX_CACHED_DECKS = 64
+
+
+class DeckCache:
+    def __init__(self, max_decks: int = MAX_CACHED_DECKS):
+        self.max_decks = max_decks
+        self.bodies: "OrderedDict[int, tuple]" = OrderedDict()  # subject_id -> (version, body)
+
+    def etag(self, subject_id: int, version: int) -> str:
+        return f'"deck-{subject_id}-{version}"'
+
+    def get(self, subject_id: int, version: int) -> Optional[bytes]:
+        """Serialized deck if it was built for exactly this version"""
+        cached = self.bodies.get(subject_id)
+        if cached is None or cached[0] != version:
+            return None
+        self.bodies.move_to_end(subject_id)
+        return cached[1]
+
+    def store(self, subject_id: int, version: int, body: bytes):
+        self.bodies[subject_id] = (version, body)
+        self.bodies.move_to_end(subject_id)
+        while len(self.bodies) > self.max_decks:
+            self.bodies.popitem(last=False)
+
+    def forget(self, subject_id: int):
+        self.bodies.pop(subject_id, None)
+
+
+deck_cache = DeckCache()
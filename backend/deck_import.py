@@ -0,0 +1,126 @@
+"""
+Incremental parsers for flashcard import files (CSV, Anki text export, JSON, NDJSON)
+
+Every parser yields (row_number, card, error) tuples where card is
+{"frage": str, "antworten": [{"text": str, "is_correct": bool}, ...]} or None.
+"""
+from typing import BinaryIO, Iterator, Optional, Tuple
+import csv
+import io
+import json
+
+from schemas import check_answers
+
+IMPORT_FORMATS = ("csv", "anki", "json", "ndjson")
+
+ParsedRow = Tuple[int, Optional[dict], Optional[str]]
+
+
+def detect_format(filename: str) -> Optional[str]:
+    """Guess the import format from the file extension"""
+    extension = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    return {
+        "csv": "csv",
+        "txt": "anki",
+        "tsv": "anki",
+        "json": "json",
+        "ndjson": "ndjson",
+        "jsonl": "ndjson",
+    }.get(extension)
+
+
+def _card_from_columns(columns: list, extra_columns: bool = False) -> dict:
+    """question, correct answer, three wrong answers - the layout of CSV and Anki rows.
+
+    Anki exports can append further fields such as tags; with extra_columns those are ignored.
+    """
+    columns = [column.strip() for column in columns if column is not None]
+    if extra_columns:
+        columns = columns[:5]
+    if len(columns) != 5 or not all(columns):
+        raise ValueError("Erwartet: Frage, richtige Antwort und drei falsche Antworten")
+    return {
+        "frage": columns[0],
+        "antworten": [{"text": columns[1], "is_correct": True}] + [
+            {"text": text, "is_correct": False} for text in columns[2:]
+        ],
+    }
+
+
+def _card_from_json(item) -> dict:
+    if not isinstance(item, dict):
+        raise ValueError("Jeder Eintrag muss ein Objekt sein")
+    frage = str(item.get("frage") or item.get("question") or "").strip()
+    if not frage:
+        raise ValueError("Frage fehlt")
+    antworten = [
+        {"text": str(answer.get("text", "")).strip(), "is_correct": bool(answer.get("is_correct", False))}
+        for answer in item.get("antworten") or item.get("answers") or []
+        if isinstance(answer, dict)
+    ]
+    if not all(answer["text"] for answer in antworten):
+        raise ValueError("Leere Antwort")
+    return {"frage": frage, "antworten": antworten}
+
+
+def _validated(row_number: int, build, raw) -> ParsedRow:
+    try:
+        card = build(raw)
+        check_answers(card["antworten"])
+        return row_number, card, None
+    except ValueError as e:
+        return row_number, None, str(e)
+
+
+def _parse_delimited(text: io.TextIOBase, delimiter: str) -> Iterator[ParsedRow]:
+    reader = csv.reader(text, delimiter=delimiter)
+    anki = delimiter == "\t"
+    for row_number, columns in enumerate(reader, start=1):
+        if not any(column.strip() for column in columns):
+            continue
+        if row_number == 1 and columns[0].strip().lower() in ("frage", "question"):
+            continue  # header line
+        if anki and columns[0].startswith("#"):
+            continue  # Anki export metadata such as "#separator:tab"
+        yield _validated(row_number, lambda columns: _card_from_columns(columns, extra_columns=anki), columns)
+
+
+def _parse_ndjson(text: io.TextIOBase) -> Iterator[ParsedRow]:
+    for row_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield row_number, None, f"Ungültiges JSON: {e.msg}"
+            continue
+        yield _validated(row_number, _card_from_json, item)
+
+
+def _parse_json(text: io.TextIOBase) -> Iterator[ParsedRow]:
+    # A JSON array can't be read incrementally with the standard library, use NDJSON for huge decks
+    try:
+        items = json.load(text)
+    except json.JSONDecodeError as e:
+        yield 1, None, f"Ungültiges JSON: {e.msg}"
+        return
+    if not isinstance(items, list):
+        yield 1, None, "Erwartet wird eine Liste von Karteikarten"
+        return
+    for row_number, item in enumerate(items, start=1):
+        yield _validated(row_number, _card_from_json, item)
+
+
+def parse_import_file(file: BinaryIO, import_format: str) -> Iterator[ParsedRow]:
+    """Read an uploaded file lazily and yield one validated row at a time"""
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+
+    if import_format == "csv":
+        return _parse_delimited(text, ",")
+    if import_format == "anki":
+        return _parse_delimited(text, "\t")
+    if import_format == "ndjson":
+        return _parse_ndjson(text)
+    if import_format == "json":
+        return _parse_json(text)
+    raise ValueError(f"Unbekanntes Format '{import_format}'")
@@ -0,0 +1,126 @@
+"""
+Card difficulty per subject and the per-game queues adaptive games draw their questions from
+
+The difficulty of a card is its smoothed miss rate from flashcard_stats. Each subject's values are
+kept in memory and updated in place when a game of that subject finishes. An adaptive game
+orders its deck once at the start as a weighted random permutation (Efraimidis-Spirakis: every
+card gets the key Exp(1) / difficulty) kept in a heap, so harder cards tend to come first and
+every transition is a heap pop instead of a scan over the deck.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+import heapq
+import json
+import math
+import random
+
+from caching import TTLCache, cached_lookup
+from models import Flashcard, FlashcardStats, GameEvent, GameSummary, QuestionSummary
+
+DIFFICULTY_INDEX_TTL = 600  # seconds; finished games of this process update the index right away
+MIN_DIFFICULTY = 0.05  # cards the team always gets right still come up now and then
+
+
+class DifficultyIndex:
+    """(times asked, times correct) of every played card of a subject"""
+
+    def __init__(self, counts: Dict[int, Tuple[int, int]]):
+        self.counts = counts
+
+    def difficulty(self, flashcard_id: int) -> float:
+        asked, correct = self.counts.get(flashcard_id, (0, 0))
+        return max(MIN_DIFFICULTY, (asked - correct + 1) / (asked + 2))
+
+    def record(self, flashcard_id: int, was_correct: bool):
+        asked, correct = self.counts.get(flashcard_id, (0, 0))
+        self.counts[flashcard_id] = (asked + 1, correct + int(was_correct))
+
+
+difficulty_cache = TTLCache(maxsize=1000, ttl=DIFFICULTY_INDEX_TTL)  # subject_id -> DifficultyIndex
+
+
+def get_difficulty_index(db, subject_id: int) -> DifficultyIndex:
+    def load():
+        return DifficultyIndex({
+            flashcard_id: (asked, correct)
+            for flashcard_id, asked, correct in db.query(
+                FlashcardStats.flashcard_id, FlashcardStats.times_asked, FlashcardStats.times_correct
+            ).filter(FlashcardStats.subject_id == subject_id)
+        })
+
+    return cached_lookup(difficulty_cache, subject_id, load)
+
+
+def record_finished_game(db, session_id: str):
+    """Fold a just summarized game into the cached index of its subject, if this process has one"""
+    subject_id = db.query(GameSummary.subject_id).filter(GameSummary.session_id == session_id).scalar()
+    index = difficulty_cache.get(subject_id)
+    if index is None:
+        return
+    for flashcard_id, was_correct in db.query(QuestionSummary.flashcard_id, QuestionSummary.was_correct).filter(
+        QuestionSummary.session_id == session_id
+    ):
+        index.record(flashcard_id, was_correct)
+
+
+def _build_queue(index: DifficultyIndex, flashcard_ids: Iterable[int], seed: int) -> List[Tuple[float, int]]:
+    """Heap of (key, flashcard_id); the random draw of a card depends only on the seed and its id,
+    so a rebuilt queue keeps the order of the original as long as the difficulties didn't change"""
+    queue = []
+    for flashcard_id in flashcard_ids:
+        draw = 1.0 - random.Random(seed * 1_000_003 + flashcard_id).random()  # in (0, 1]
+        queue.append((-math.log(draw) / index.difficulty(flashcard_id), flashcard_id))
+    heapq.heapify(queue)
+    return queue
+
+
+class AdaptiveQueues:
+    """The remaining cards of every adaptive game this process is running.
+
+    A game whose queue isn't here (another worker started it, or the process restarted) gets it
+    rebuilt from its deck minus the cards its journal says were already asked.
+    """
+
+    def __init__(self):
+        self.queues: Dict[str, List[Tuple[float, int]]] = {}
+
+    def start(self, db, session_id: str, subject_id: int, flashcard_ids: List[int], seed: int) -> Optional[int]:
+        self.queues[session_id] = _build_queue(get_difficulty_index(db, subject_id), flashcard_ids, seed)
+        return self.peek(session_id)
+
+    def _rebuild(self, db, session_id: str, subject_id: int, seed: int):
+        asked = set()
+        for event_type, payload in db.query(GameEvent.event_type, GameEvent.payload).filter(
+            GameEvent.session_id == session_id,
+            GameEvent.event_type.in_(("started", "advanced"))
+        ).order_by(GameEvent.id):
+            if event_type == "started":
+                asked.clear()
+            flashcard_id = json.loads(payload).get("changes", {}).get("current_flashcard_id")
+            if flashcard_id is not None:
+                asked.add(flashcard_id)
+        deck = [flashcard_id for (flashcard_id,) in db.query(Flashcard.id).filter(Flashcard.subject_id == subject_id)]
+        self.queues[session_id] = _build_queue(
+            get_difficulty_index(db, subject_id), [flashcard_id for flashcard_id in deck if flashcard_id not in asked], seed
+        )
+
+    def next_card(self, db, session_id: str, subject_id: int, seed: int) -> Optional[int]:
+        """The card to ask next, without taking it off the queue; None once the deck is used up"""
+        if session_id not in self.queues:
+            self._rebuild(db, session_id, subject_id, seed)
+        return self.peek(session_id)
+
+    def peek(self, session_id: str) -> Optional[int]:
+        queue = self.queues.get(session_id)
+        return queue[0][1] if queue else None
+
+    def pop(self, session_id: str):
+        """Take the current head off the queue, after its card was saved as the current question"""
+        queue = self.queues.get(session_id)
+        if queue:
+            heapq.heappop(queue)
+
+    def forget(self, session_id: str):
+        self.queues.pop(session_id, None)
+
+
+adaptive_queues = AdaptiveQueues()
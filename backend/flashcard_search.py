@@ -0,0 +1,178 @@
+"""
+Full-text search over flashcard questions and answers, backed by an SQLite FTS5 table
+
+Each flashcard has one row in flashcard_search (rowid = flashcard id). Besides question and
+answer text it carries scope tokens "s<subject_id> g<group_id>", so a search limited to a group
+or subject is an intersection inside the FTS index instead of a filter over all matches.
+Databases without FTS5 fall back to a LIKE search over the flashcards table.
+
+Every word of a query is matched as a prefix. FTS5 keeps extra index entries for prefixes of 3 to 6
+characters, without them a short prefix expands to thousands of terms whose lists are merged on
+every search; shorter words are matched exactly.
+
+Whether a database has the index is looked up in sqlite_master on first use, once per engine, so
+writers outside the app process (scripts, the importer, tests) keep the index in sync as well.
+"""
+from typing import Dict, Iterable, Optional
+import logging
+import re
+
+from sqlalchemy import bindparam, column, delete, select, table, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+
+from database import engine
+from models import Answer, Flashcard, Subject
+
+logger = logging.getLogger(__name__)
+
+fts_tables: Dict[Engine, bool] = {}  # engine -> whether its database has the FTS table
+search_table = table("flashcard_search", column("rowid"))  # the FTS table is not part of the ORM metadata
+
+TABLE_EXISTS_SQL = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'flashcard_search'"
+TABLE_DEFINITION_SQL = "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'flashcard_search'"
+MIN_PREFIX_LENGTH = 3  # shorter words are matched exactly, they would match most of the index
+
+CREATE_INDEX_SQL = """
+CREATE VIRTUAL TABLE flashcard_search USING fts5(
+    question, answers, scope, tokenize = 'unicode61 remove_diacritics 2', prefix = '3 4 5 6'
+)
+"""
+
+INDEX_ROWS_SQL = """
+INSERT INTO flashcard_search (rowid, question, answers, scope)
+SELECT flashcards.id,
+       flashcards.question,
+       (SELECT group_concat(answers.antwort, ' ') FROM answers WHERE answers.flashcard_id = flashcards.id),
+       's' || flashcards.subject_id || ' g' || subjects.group_id
+FROM flashcards JOIN subjects ON subjects.id = flashcards.subject_id
+"""
+
+SEARCH_SQL = """
+SELECT flashcard_search.rowid AS flashcard_id,
+       snippet(flashcard_search, 0, '[', ']', '…', 12) AS question_snippet,
+       snippet(flashcard_search, 1, '[', ']', '…', 12) AS answers_snippet,
+       bm25(flashcard_search, 2.0, 1.0, 0.0) AS score
+FROM flashcard_search
+WHERE flashcard_search MATCH :query
+ORDER BY score
+LIMIT :limit OFFSET :offset
+"""
+
+
+def _same_definition(stored: str) -> bool:
+    return " ".join(stored.split()) == " ".join(CREATE_INDEX_SQL.split())
+
+
+def ensure_search_index() -> str:
+    """Create the FTS table on first start and fill it from the existing flashcards; returns the search in use, fts5 or like.
+
+    A table created with an older definition is dropped and rebuilt, once.
+    """
+    if engine.dialect.name != "sqlite":
+        logger.warning("Full-text index is only available on SQLite, using LIKE search")
+        fts_tables[engine] = False
+        return "like"
+
+    try:
+        with engine.begin() as connection:
+            stored = connection.execute(text(TABLE_DEFINITION_SQL)).scalar()
+            if stored is None or not _same_definition(stored):
+                if stored is not None:
+                    logger.warning("Full-text index definition changed, rebuilding it")
+                    connection.execute(text("DROP TABLE flashcard_search"))
+                connection.execute(text(CREATE_INDEX_SQL))
+                connection.execute(text(INDEX_ROWS_SQL))
+                logger.info("Built full-text index over existing flashcards")
+        fts_tables[engine] = True
+    except OperationalError as e:
+        logger.warning(f"SQLite without FTS5, using LIKE search: {e}")
+        fts_tables[engine] = False
+        return "like"
+    logger.info("Flashcard search uses the FTS5 index")
+    return "fts5"
+
+
+def fts_enabled(db) -> bool:
+    """Whether the database behind the session has the FTS table, checked once per engine"""
+    bind = db.get_bind()
+    enabled = fts_tables.get(bind)
+    if enabled is None:
+        enabled = bind.dialect.name == "sqlite" and db.execute(text(TABLE_EXISTS_SQL)).first() is not None
+        fts_tables[bind] = enabled
+    return enabled
+
+
+def _ids_param(name: str):
+    return bindparam(name, expanding=True)
+
+
+def remove_flashcards(db, flashcard_ids: Iterable[int]):
+    """Drop index rows of flashcards; part of the caller's transaction"""
+    flashcard_ids = list(flashcard_ids)
+    if not flashcard_ids or not fts_enabled(db):
+        return
+    db.execute(
+        text("DELETE FROM flashcard_search WHERE rowid IN :ids").bindparams(_ids_param("ids")),
+        {"ids": flashcard_ids}
+    )
+
+
+def remove_subjects(db, subjects):
+    """Drop index rows of all flashcards of the subjects, a select of their ids; call before the flashcards are deleted"""
+    if not fts_enabled(db):
+        return
+    flashcard_ids = select(Flashcard.id).where(Flashcard.subject_id.in_(subjects))
+    db.execute(delete(search_table).where(search_table.c.rowid.in_(flashcard_ids)))
+
+
+def index_flashcards(db, flashcard_ids: Iterable[int]):
+    """(Re)index flashcards after they were written; the caller must have flushed the changes"""
+    flashcard_ids = list(flashcard_ids)
+    if not flashcard_ids or not fts_enabled(db):
+        return
+    remove_flashcards(db, flashcard_ids)
+    db.execute(
+        text(INDEX_ROWS_SQL + " WHERE flashcards.id IN :ids").bindparams(_ids_param("ids")),
+        {"ids": flashcard_ids}
+    )
+
+
+def index_subject(db, subject_id: int):
+    """Index all flashcards of a freshly filled subject, e.g. a cloned deck"""
+    if not fts_enabled(db):
+        return
+    db.execute(text(INDEX_ROWS_SQL + " WHERE flashcards.subject_id = :subject_id"), {"subject_id": subject_id})
+
+
+def build_match_query(search_text: str, group_id: int, subject_id: Optional[int] = None) -> Optional[str]:
+    """Turn user input into an FTS5 query: every word as a prefix term, limited to the scope"""
+    words = re.findall(r"\w+", search_text)
+    if not words:
+        return None
+    terms = " ".join(f'"{word}"*' if len(word) >= MIN_PREFIX_LENGTH else f'"{word}"' for word in words)
+    scope = f"s{subject_id}" if subject_id is not None else f"g{group_id}"
+    return f'{{question answers}} : ({terms}) AND scope : "{scope}"'
+
+
+def search_flashcards(db, search_text: str, group_id: int, subject_id: Optional[int] = None,
+                      limit: int = 20, offset: int = 0) -> list:
+    """Ranked matches as (flashcard_id, question_snippet, answers_snippet, score) rows"""
+    if fts_enabled(db):
+        query = build_match_query(search_text, group_id, subject_id)
+        if query is None:
+            return []
+        return db.execute(
+            text(SEARCH_SQL), {"query": query, "limit": limit, "offset": offset}
+        ).mappings().all()
+
+    pattern = f"%{search_text.strip()}%"
+    scope = Flashcard.subject_id == subject_id if subject_id is not None else Subject.group_id == group_id
+    rows = db.query(Flashcard.id, Flashcard.question).join(Subject).filter(
+        scope,
+        Flashcard.question.ilike(pattern) | Flashcard.answers.any(Answer.antwort.ilike(pattern))
+    ).order_by(Flashcard.id).limit(limit).offset(offset).all()
+    return [
+        {"flashcard_id": row.id, "question_snippet": row.question, "answers_snippet": None, "score": None}
+        for row in rows
+    ]
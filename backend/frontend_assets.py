@@ -0,0 +1,163 @@
+"""
+The React build, served from memory
+
+Every file of the build is read once at startup together with the .br/.gz copies precompress.py
+wrote next to it, and gets its strong ETags and response headers computed up front. A request is a
+dict lookup plus picking the encoding the client accepts. Client-side routes get index.html.
+Bundles with a content hash in their name are cached by browsers for good; everything else is
+revalidated with its ETag.
+"""
+from typing import Dict, Optional
+from functools import lru_cache
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+
+from fastapi.responses import FileResponse, Response
+
+from game_state_cache import etag_matches
+
+logger = logging.getLogger(__name__)
+
+BUILD_DIRECTORIES = ("../frontend/build", "frontend/build")  # run from backend/ or the repository root
+INDEX_FILE = "index.html"
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))  # preferred first
+HASHED_NAME = re.compile(r"\.[0-9a-f]{8,}\.")  # main.07818dc5.chunk.js, precache-manifest.<hash>.js
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+MAX_IN_MEMORY_SIZE = 8 * 1024 * 1024  # bytes; larger files are streamed from disk on every request
+TEXT_TYPES = ("application/javascript", "application/json", "application/manifest+json")
+
+
+def _media_type(name: str) -> str:
+    media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    if media_type.startswith("text/") or media_type in TEXT_TYPES:
+        media_type += "; charset=utf-8"
+    return media_type
+
+
+@lru_cache(maxsize=64)
+def choose_encoding(accept_encoding: str, available: tuple) -> Optional[str]:
+    """Best of the available encodings the Accept-Encoding header allows, None for the plain file.
+
+    Browsers send only a handful of distinct headers, so the parsed result is cached.
+    """
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding.strip()] = weight
+    for encoding in available:
+        if weights.get(encoding, weights.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+class Representation:
+    """One encoding of a file with the headers every response for it carries"""
+
+    def __init__(self, body: Optional[bytes], path: str, headers: Dict[str, str]):
+        self.body = body  # None if too large to keep, then path is streamed
+        self.path = path
+        self.headers = headers
+        self.etag = headers["ETag"]
+
+
+class BuildFile:
+    def __init__(self, representations: Dict[Optional[str], Representation]):
+        self.representations = representations  # None -> plain file, "br"/"gzip" -> precompressed copy
+        self.encodings = tuple(encoding for encoding, _ in ENCODINGS if encoding in representations)
+
+    def representation(self, accept_encoding: str) -> Representation:
+        encoding = choose_encoding(accept_encoding, self.encodings) if self.encodings and accept_encoding else None
+        return self.representations[encoding]
+
+
+def _read(path: str) -> Optional[bytes]:
+    if os.path.getsize(path) > MAX_IN_MEMORY_SIZE:
+        return None
+    with open(path, "rb") as file:
+        return file.read()
+
+
+def _load_file(path: str, name: str) -> BuildFile:
+    """Read a file and its precompressed copies; copies older than the file are left out as stale"""
+    with open(path, "rb") as file:
+        digest = hashlib.sha256()
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    etag = digest.hexdigest()[:32]
+    mtime = os.path.getmtime(path)
+
+    copies = [
+        (encoding, path + suffix) for encoding, suffix in ENCODINGS
+        if os.path.exists(path + suffix) and os.path.getmtime(path + suffix) >= mtime
+    ]
+    common = {
+        "Content-Type": _media_type(name),
+        "Cache-Control": IMMUTABLE if HASHED_NAME.search(name) else REVALIDATE,
+    }
+    if copies:
+        common["Vary"] = "Accept-Encoding"
+
+    representations = {None: Representation(_read(path), path, {**common, "ETag": f'"{etag}"'})}
+    for encoding, copy_path in copies:
+        representations[encoding] = Representation(_read(copy_path), copy_path, {
+            **common, "Content-Encoding": encoding, "ETag": f'"{etag}-{encoding}"'
+        })
+    return BuildFile(representations)
+
+
+class FrontendBuild:
+    def __init__(self, directories=BUILD_DIRECTORIES):
+        self.directories = directories
+        self.root: Optional[str] = None
+        self.files: Dict[str, BuildFile] = {}  # path relative to the build directory -> file
+
+    @property
+    def loaded(self) -> bool:
+        return INDEX_FILE in self.files
+
+    def load(self) -> int:
+        """Read the first build directory that exists; returns the number of files"""
+        self.root = next((directory for directory in self.directories if os.path.isdir(directory)), None)
+        self.files = {}
+        if self.root is None:
+            logger.warning("Frontend build not found, only the API is served")
+            return 0
+
+        suffixes = tuple(suffix for _, suffix in ENCODINGS)
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                if name.endswith(suffixes):
+                    continue
+                path = os.path.join(directory, name)
+                relative = os.path.relpath(path, self.root).replace(os.sep, "/")
+                self.files[relative] = _load_file(path, name)
+        return len(self.files)
+
+    def response(self, path: str, headers) -> Optional[Response]:
+        """The build file at path, index.html for client-side routes, None for a missing asset"""
+        build_file = self.files.get(path)
+        if build_file is None:
+            if path.startswith("static/") or not self.loaded:
+                return None
+            build_file = self.files[INDEX_FILE]
+
+        representation = build_file.representation(headers.get("accept-encoding", ""))
+        if etag_matches(headers.get("if-none-match"), representation.etag):
+            return Response(status_code=304, headers=representation.headers)
+        if representation.body is None:
+            return FileResponse(representation.path, headers=representation.headers)
+        return Response(content=representation.body, headers=representation.headers)
+
+
+frontend = FrontendBuild()
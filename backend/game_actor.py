@@ -0,0 +1,90 @@
+"""
+Per-session actors that serialize all game mutations
+"""
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+ACTOR_IDLE_TIMEOUT = 60  # seconds without commands before an actor shuts down
+
+
+class CommandRejected(Exception):
+    """Raised when a command conflicts with one that is already queued or running"""
+
+
+class GameActor:
+    def __init__(self, session_id: str, registry: "GameActorRegistry"):
+        self.session_id = session_id
+        self.registry = registry
+        self.loop = asyncio.get_running_loop()
+        self.mailbox: asyncio.Queue = asyncio.Queue()
+        self.in_flight: Set[str] = set()
+        self.task: Optional[asyncio.Task] = None
+
+    async def submit(self, handler: Callable[[], Awaitable[Any]], key: Optional[str] = None) -> Any:
+        """Queue a command and wait for its result.
+
+        Commands with the same key are not allowed to be queued twice, so a double-clicked
+        host action is rejected immediately instead of being applied a second time.
+        """
+        if key is not None:
+            if key in self.in_flight:
+                raise CommandRejected(f"Command '{key}' is already being processed for session {self.session_id}")
+            self.in_flight.add(key)
+
+        future = self.loop.create_future()
+        await self.mailbox.put((handler, key, future))
+        self._ensure_running()
+        return await future
+
+    def _ensure_running(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                handler, key, future = await asyncio.wait_for(self.mailbox.get(), timeout=ACTOR_IDLE_TIMEOUT)
+            except asyncio.TimeoutError:
+                if self.mailbox.empty():
+                    self.registry.discard(self.session_id, self)
+                    return
+                continue
+
+            try:
+                result = await handler()
+                if not future.done():
+                    future.set_result(result)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                if key is not None:
+                    self.in_flight.discard(key)
+
+
+class GameActorRegistry:
+    def __init__(self):
+        self.actors: Dict[str, GameActor] = {}
+
+    def get(self, session_id: str) -> GameActor:
+        actor = self.actors.get(session_id)
+        if actor is None or actor.loop is not asyncio.get_running_loop():
+            actor = GameActor(session_id, self)
+            self.actors[session_id] = actor
+        return actor
+
+    def discard(self, session_id: str, actor: GameActor):
+        """Forget an idle actor (only if it is still the registered one)"""
+        if self.actors.get(session_id) is actor:
+            del self.actors[session_id]
+            logger.info(f"Game actor for session {session_id} stopped after being idle")
+
+    async def submit(self, session_id: str, handler: Callable[[], Awaitable[Any]], key: Optional[str] = None) -> Any:
+        """Run a mutation for a session on that session's actor"""
+        return await self.get(session_id).submit(handler, key=key)
+
+
+game_actors = GameActorRegistry()
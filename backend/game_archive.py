@@ -0,0 +1,271 @@
+"""
+Compact records of finished games: one summary row per game and per question, plus the raw
+votes, chat messages and journal events packed into a single compressed blob per game
+"""
+from typing import Dict, List, Optional
+from collections import defaultdict
+from datetime import datetime
+import json
+import logging
+import zlib
+
+from sqlalchemy import delete
+
+from database import SessionLocal
+from difficulty_index import record_finished_game
+from game_stats import record_game_stats
+from models import (
+    Answer, ChatMessage, GameArchive, GameEvent, GameSnapshot, GameState, GameSummary,
+    QuestionSummary, QuizSession, SessionParticipant, Vote
+)
+
+logger = logging.getLogger(__name__)
+
+TARGET_SHARE = 0.9  # share of the maximum score needed to win, as in next_question
+
+ARCHIVE_COLUMNS = {
+    "votes": ("user_id", "flashcard_id", "answer_id", "voted_at"),
+    "chat": ("id", "user_id", "message", "sent_at"),
+    "events": ("version", "event_type", "payload", "created_at"),
+}
+
+
+def _parse_datetime(value) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def _duration_ms(started_at: Optional[datetime], ended_at: Optional[datetime]) -> Optional[int]:
+    if started_at is None or ended_at is None:
+        return None
+    return int((ended_at - started_at).total_seconds() * 1000)
+
+
+def _played_questions(events: List[GameEvent]) -> tuple:
+    """Walk the journal once and return (questions, outcome); every question a dict of what happened to it"""
+    questions = []
+    outcome = None
+    current = None
+
+    def close(ended_at):
+        if current is not None and current["ended_at"] is None:
+            current["ended_at"] = ended_at
+
+    for event in events:
+        payload = json.loads(event.payload)
+        changes = payload.get("changes", {})
+
+        if event.event_type in ("started", "advanced") and "current_flashcard_id" in changes:
+            close(event.created_at)
+            if event.event_type == "started":
+                questions = []
+            current = {
+                "question_index": changes.get("current_question_index", 0),
+                "flashcard_id": changes["current_flashcard_id"],
+                "started_at": _parse_datetime(changes.get("question_started_at")) or event.created_at,
+                "ended_at": None,
+                "result": None,
+            }
+            questions.append(current)
+        elif event.event_type == "question_ended" and current is not None:
+            current["ended_at"] = event.created_at
+            current["result"] = payload
+        elif event.event_type == "finished":
+            close(event.created_at)
+            outcome = payload.get("reason")
+
+    return questions, outcome
+
+
+def summarize_game(db, session_id: str) -> Optional[GameSummary]:
+    """Write the summary rows of a finished game into the caller's transaction; existing summaries are kept"""
+    summary = db.get(GameSummary, session_id)
+    if summary is not None:
+        return summary
+
+    game_state = db.get(GameState, session_id)
+    session = db.get(QuizSession, session_id)
+    if game_state is None or session is None or game_state.status != "game_finished":
+        return None
+
+    events = db.query(GameEvent).filter(
+        GameEvent.session_id == session_id,
+        GameEvent.event_type != "vote"
+    ).order_by(GameEvent.id).all()
+    questions, outcome = _played_questions(events)
+
+    # Skipped questions have no question_ended event, their votes and correct answer come from the tables
+    flashcard_ids = [question["flashcard_id"] for question in questions]
+    votes = db.query(Vote.user_id, Vote.flashcard_id, Vote.answer_id).filter(Vote.session_id == session_id).all()
+    stored_votes: Dict[int, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    for _, flashcard_id, answer_id in votes:
+        stored_votes[flashcard_id][str(answer_id)] += 1
+    correct_answers = dict(db.query(Answer.flashcard_id, Answer.id).filter(
+        Answer.flashcard_id.in_(flashcard_ids),
+        Answer.is_correct == True
+    ).all()) if flashcard_ids else {}
+
+    question_summaries = []
+    for question in questions:
+        result = question["result"] or {}
+        vote_counts = result.get("vote_counts", stored_votes.get(question["flashcard_id"], {}))
+        question_summaries.append(QuestionSummary(
+            session_id=session_id,
+            question_index=question["question_index"],
+            flashcard_id=question["flashcard_id"],
+            correct_answer_id=result.get("correct_answer_id", correct_answers.get(question["flashcard_id"])),
+            winning_answer_id=result.get("winning_answer_id"),
+            was_correct=bool(result.get("was_correct", False)),
+            vote_counts=json.dumps(vote_counts),
+            votes_cast=sum(vote_counts.values()),
+            duration_ms=_duration_ms(question["started_at"], question["ended_at"] or game_state.ended_at)
+        ))
+    db.add_all(question_summaries)
+
+    participant_ids = [user_id for (user_id,) in db.query(SessionParticipant.user_id).filter(
+        SessionParticipant.session_id == session_id
+    )]
+
+    max_possible_score = game_state.max_possible_score or 0
+    summary = GameSummary(
+        session_id=session_id,
+        group_id=session.group_id,
+        subject_id=session.subject_id,
+        host_user_id=session.host_user_id,
+        outcome=outcome or "ended_manually",
+        victory=game_state.total_score >= int(max_possible_score * TARGET_SHARE),
+        total_score=game_state.total_score,
+        max_possible_score=max_possible_score,
+        questions_total=max_possible_score // 100,
+        questions_played=len(questions),
+        questions_correct=sum(1 for question in question_summaries if question.was_correct),
+        participant_count=len(participant_ids),
+        started_at=game_state.started_at,
+        ended_at=game_state.ended_at
+    )
+    db.add(summary)
+    record_game_stats(db, summary, question_summaries, participant_ids, votes)
+    return summary
+
+
+def finalize_game(session_id: str) -> bool:
+    """Summarize a game right after it finished.
+
+    Runs in its own transaction so a failure never undoes the finish itself; the maintenance job
+    summarizes whatever was missed before it archives the game.
+    """
+    db = SessionLocal()
+    try:
+        summarized = summarize_game(db, session_id) is not None
+        db.commit()
+        if summarized:
+            record_finished_game(db, session_id)
+        return summarized
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Could not summarize game {session_id}, leaving it to maintenance: {e}")
+        return False
+    finally:
+        db.close()
+
+
+def _pack(rows: Dict[str, list]) -> bytes:
+    return zlib.compress(json.dumps({
+        "columns": {name: ARCHIVE_COLUMNS[name] for name in rows},
+        **rows
+    }, separators=(",", ":")).encode("utf-8"))
+
+
+def _isoformat(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def archive_games(db, session_ids: List[str]) -> List[str]:
+    """Move the raw rows of finished games into one GameArchive row each; part of the caller's transaction.
+
+    Summaries are written first for games that don't have one yet. Journal snapshots are dropped,
+    they only shorten replays of games whose events are still in the live tables.
+    """
+    session_ids = [session_id for session_id in session_ids if summarize_game(db, session_id) is not None]
+    if not session_ids:
+        return []
+    db.flush()
+
+    rows = {session_id: {name: [] for name in ARCHIVE_COLUMNS} for session_id in session_ids}
+    for vote in db.query(Vote).filter(Vote.session_id.in_(session_ids)).order_by(Vote.id):
+        rows[vote.session_id]["votes"].append(
+            [vote.user_id, vote.flashcard_id, vote.answer_id, _isoformat(vote.voted_at)]
+        )
+    for message in db.query(ChatMessage).filter(ChatMessage.session_id.in_(session_ids)).order_by(ChatMessage.id):
+        rows[message.session_id]["chat"].append(
+            [message.id, message.user_id, message.message, _isoformat(message.sent_at)]
+        )
+    for event in db.query(GameEvent).filter(GameEvent.session_id.in_(session_ids)).order_by(GameEvent.id):
+        rows[event.session_id]["events"].append(
+            [event.version, event.event_type, json.loads(event.payload), _isoformat(event.created_at)]
+        )
+
+    db.add_all(
+        GameArchive(
+            session_id=session_id,
+            vote_count=len(game_rows["votes"]),
+            message_count=len(game_rows["chat"]),
+            event_count=len(game_rows["events"]),
+            payload=_pack(game_rows)
+        )
+        for session_id, game_rows in rows.items()
+    )
+    for model in (Vote, ChatMessage, GameEvent, GameSnapshot):
+        db.execute(delete(model).where(model.session_id.in_(session_ids)))
+    return session_ids
+
+
+def load_archive(db, session_id: str) -> Optional[Dict[str, List[dict]]]:
+    """Unpack an archived game into lists of dicts keyed like the original columns"""
+    archive = db.get(GameArchive, session_id)
+    if archive is None:
+        return None
+
+    data = json.loads(zlib.decompress(archive.payload))
+    return {
+        name: [dict(zip(columns, row)) for row in data.get(name, [])]
+        for name, columns in data["columns"].items()
+    }
+
+
+def get_game_summary(db, session_id: str) -> Optional[dict]:
+    """Summary of a finished game with its per-question results"""
+    summary = db.get(GameSummary, session_id)
+    if summary is None:
+        return None
+
+    questions = db.query(QuestionSummary).filter(
+        QuestionSummary.session_id == session_id
+    ).order_by(QuestionSummary.question_index).all()
+
+    return {
+        "session_id": session_id,
+        "outcome": summary.outcome,
+        "victory": summary.victory,
+        "total_score": summary.total_score,
+        "max_possible_score": summary.max_possible_score,
+        "target_score": int(summary.max_possible_score * TARGET_SHARE),
+        "questions_total": summary.questions_total,
+        "questions_played": summary.questions_played,
+        "questions_correct": summary.questions_correct,
+        "participant_count": summary.participant_count,
+        "started_at": _isoformat(summary.started_at),
+        "ended_at": _isoformat(summary.ended_at),
+        "questions": [
+            {
+                "question_index": question.question_index,
+                "flashcard_id": question.flashcard_id,
+                "correct_answer_id": question.correct_answer_id,
+                "winning_answer_id": question.winning_answer_id,
+                "was_correct": question.was_correct,
+                "vote_counts": json.loads(question.vote_counts),
+                "votes_cast": question.votes_cast,
+                "duration_ms": question.duration_ms
+            }
+            for question in questions
+        ]
+    }
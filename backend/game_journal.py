@@ -0,0 +1,136 @@
+"""
+Append-only journal of game events with periodic snapshots of the game state
+
+The GameState row is the source of truth for a running game. Every event is written in the
+transaction of the state change it describes, so the journal can never be ahead of the state: it is
+the game's history, read by the post-game analytics, the archive and the adaptive question queue,
+and replay_game_state rebuilds the state as of any version from it.
+"""
+from typing import Dict, List, Optional
+from datetime import datetime
+import json
+import logging
+
+from database import SessionLocal
+from game_archive import load_archive
+from models import GameEvent, GameSnapshot, GameState
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_INTERVAL = 20  # game state versions between two snapshots
+
+STATE_COLUMNS = [
+    "current_question_index",
+    "current_flashcard_id",
+    "question_started_at",
+    "total_score",
+    "max_possible_score",
+    "status",
+    "started_at",
+    "ended_at",
+    "version",
+    "adaptive_seed",
+]
+DATETIME_COLUMNS = {"question_started_at", "started_at", "ended_at"}
+
+
+def _to_json(values: dict) -> str:
+    return json.dumps({
+        key: value.isoformat() if isinstance(value, datetime) else value
+        for key, value in values.items()
+    })
+
+
+def _parse_datetimes(values: dict) -> dict:
+    for key in DATETIME_COLUMNS:
+        if values.get(key):
+            values[key] = datetime.fromisoformat(values[key])
+    return values
+
+
+def record_event(db, session_id: str, version: Optional[int], event_type: str, changes: Optional[dict] = None, **details):
+    """Add an event to the caller's transaction, so it commits together with the state change"""
+    payload = dict(details)
+    if changes:
+        payload["changes"] = json.loads(_to_json(changes))
+
+    db.add(GameEvent(
+        session_id=session_id,
+        version=version,
+        event_type=event_type,
+        payload=json.dumps(payload)
+    ))
+
+
+def record_snapshot_if_due(db, game_state: GameState):
+    """Snapshot the full game state every SNAPSHOT_INTERVAL versions"""
+    if game_state.version % SNAPSHOT_INTERVAL != 0:
+        return
+
+    db.add(GameSnapshot(
+        session_id=game_state.session_id,
+        version=game_state.version,
+        state=_to_json({column: getattr(game_state, column) for column in STATE_COLUMNS})
+    ))
+
+
+def get_game_events(session_id: str) -> List[dict]:
+    """All journal entries of a game in order, e.g. for post-game analytics; archived games are read from their archive"""
+    db = SessionLocal()
+    try:
+        events = db.query(GameEvent).filter(
+            GameEvent.session_id == session_id
+        ).order_by(GameEvent.id).all()
+
+        if not events:
+            archive = load_archive(db, session_id)
+            return [
+                {
+                    "version": event["version"],
+                    "event_type": event["event_type"],
+                    "created_at": event["created_at"],
+                    **event["payload"]
+                }
+                for event in (archive["events"] if archive else [])
+            ]
+
+        return [
+            {
+                "version": event.version,
+                "event_type": event.event_type,
+                "created_at": event.created_at.isoformat() if event.created_at else None,
+                **json.loads(event.payload)
+            }
+            for event in events
+        ]
+    finally:
+        db.close()
+
+
+def replay_game_state(db, session_id: str, version: Optional[int] = None) -> Optional[Dict]:
+    """Rebuild the game state as of version (default: the latest) from the closest snapshot plus the events after it"""
+    snapshots = db.query(GameSnapshot).filter(GameSnapshot.session_id == session_id)
+    if version is not None:
+        snapshots = snapshots.filter(GameSnapshot.version <= version)
+    snapshot = snapshots.order_by(GameSnapshot.version.desc()).first()
+
+    state = _parse_datetimes(json.loads(snapshot.state)) if snapshot else {}
+    snapshot_version = snapshot.version if snapshot else 0
+
+    tail = db.query(GameEvent).filter(
+        GameEvent.session_id == session_id,
+        GameEvent.version > snapshot_version,
+        GameEvent.event_type != "vote"
+    )
+    if version is not None:
+        tail = tail.filter(GameEvent.version <= version)
+    tail = tail.order_by(GameEvent.id).all()
+
+    if not snapshot and not tail:
+        return None
+
+    for event in tail:
+        state.update(_parse_datetimes(json.loads(event.payload).get("changes", {})))
+        state["version"] = event.version
+
+    return state
@@ -0,0 +1,52 @@
+"""
+Versioned cache of serialized game states for conditional GET requests
+"""
+from typing import Optional
+from collections import OrderedDict
+
+MAX_CACHED_GAME_STATES = 1000
+
+
+class GameStateCache:
+    """Serialized game state per session, bounded like an LRU.
+
+    The ETag is built from GameState.version and the deck's cards_version as stored in the database.
+    Every writer bumps those, including other workers, so a changed state never matches an old ETag.
+    """
+
+    def __init__(self, maxsize: int = MAX_CACHED_GAME_STATES):
+        self.maxsize = maxsize
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()  # session_id -> (etag, body)
+
+    @staticmethod
+    def etag(session_id: str, version: int, cards_version: int) -> str:
+        return f'"{session_id}-{version}-{cards_version or 0}"'
+
+    def get(self, session_id: str, etag: str) -> Optional[bytes]:
+        """Serialized body for the ETag, if it was already built"""
+        entry = self.entries.get(session_id)
+        if entry is None or entry[0] != etag:
+            return None
+        self.entries.move_to_end(session_id)
+        return entry[1]
+
+    def store(self, session_id: str, etag: str, body: bytes):
+        self.entries[session_id] = (etag, body)
+        self.entries.move_to_end(session_id)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def forget(self, session_id: str):
+        """Drop the body of a session, once its game ended or it was deleted"""
+        self.entries.pop(session_id, None)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag"""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+game_state_cache = GameStateCache()
@@ -0,0 +1,259 @@
+"""
+Running totals per player, group, subject and flashcard, plus newest-first game history
+
+The totals are updated once per game, in the transaction that writes its summary, so reading
+statistics never has to look at votes or summaries of past games. History pages are keyset
+scans over (ended_at, session_id) indexes.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+from datetime import datetime
+
+from sqlalchemy import bindparam, case, delete, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import Flashcard, FlashcardStats, GameStats, GameSummary, PlayerGame, QuestionSummary, Subject
+
+STATS_SCOPES = ("user", "group", "subject")
+COUNTERS = (
+    "games_played", "games_won", "questions_played", "questions_correct",
+    "total_score", "max_possible_score", "votes_cast", "votes_correct",
+)
+
+HistoryCursor = Tuple[datetime, str]  # (ended_at, session_id) of the last game on the previous page
+
+
+def _ratio(part: int, whole: int) -> Optional[float]:
+    return round(part / whole, 4) if whole else None
+
+
+def _add_game_totals(db, rows: List[dict], played_at: datetime):
+    """Add one game's counters to the given stats rows; an UPDATE of the stored value, so concurrent games never lose counts"""
+    stats = GameStats.__table__
+    db.execute(sqlite_insert(stats).on_conflict_do_nothing(), [
+        {"scope": row["scope"], "scope_id": row["scope_id"], **{counter: 0 for counter in COUNTERS}}
+        for row in rows
+    ])
+    db.execute(
+        stats.update().where(
+            stats.c.scope == bindparam("key_scope"),
+            stats.c.scope_id == bindparam("key_scope_id")
+        ).values(
+            **{counter: stats.c[counter] + bindparam(f"add_{counter}") for counter in COUNTERS},
+            last_played_at=case(
+                (stats.c.last_played_at > played_at, stats.c.last_played_at),
+                else_=played_at
+            )
+        ),
+        [
+            {
+                "key_scope": row["scope"],
+                "key_scope_id": row["scope_id"],
+                **{f"add_{counter}": row.get(counter, 0) for counter in COUNTERS}
+            }
+            for row in rows
+        ]
+    )
+
+
+def _add_flashcard_totals(db, summary: GameSummary, questions: List[QuestionSummary]):
+    if not questions:
+        return
+    flashcard_stats = FlashcardStats.__table__
+    db.execute(sqlite_insert(flashcard_stats).on_conflict_do_nothing(), [
+        {
+            "flashcard_id": question.flashcard_id,
+            "subject_id": summary.subject_id,
+            "group_id": summary.group_id,
+            "times_asked": 0,
+            "times_correct": 0,
+            "times_missed": 0
+        }
+        for question in questions
+    ])
+    db.execute(
+        flashcard_stats.update().where(
+            flashcard_stats.c.flashcard_id == bindparam("key_flashcard_id")
+        ).values(
+            times_asked=flashcard_stats.c.times_asked + 1,
+            times_correct=flashcard_stats.c.times_correct + bindparam("add_correct"),
+            times_missed=flashcard_stats.c.times_missed + bindparam("add_missed"),
+            last_asked_at=summary.ended_at
+        ),
+        [
+            {
+                "key_flashcard_id": question.flashcard_id,
+                "add_correct": int(question.was_correct),
+                "add_missed": int(not question.was_correct)
+            }
+            for question in questions
+        ]
+    )
+
+
+def record_game_stats(db, summary: GameSummary, questions: List[QuestionSummary],
+                      participant_ids: Iterable[int], votes: Iterable[tuple]):
+    """Fold a freshly summarized game into the running totals; part of the summary's transaction.
+
+    votes are the game's (user_id, flashcard_id, answer_id) rows, a player's vote counts as
+    correct if it picked the card's correct answer, whatever the team decided.
+    """
+    correct_answers = {question.flashcard_id: question.correct_answer_id for question in questions}
+    votes_by_user: Dict[int, List[int]] = {user_id: [0, 0] for user_id in participant_ids}
+    for user_id, flashcard_id, answer_id in votes:
+        cast_and_correct = votes_by_user.setdefault(user_id, [0, 0])
+        cast_and_correct[0] += 1
+        cast_and_correct[1] += int(answer_id == correct_answers.get(flashcard_id))
+
+    game_totals = {
+        "games_played": 1,
+        "games_won": int(bool(summary.victory)),
+        "questions_played": summary.questions_played,
+        "questions_correct": summary.questions_correct,
+        "total_score": summary.total_score,
+        "max_possible_score": summary.max_possible_score,
+        "votes_cast": sum(cast for cast, _ in votes_by_user.values()),
+        "votes_correct": sum(correct for _, correct in votes_by_user.values()),
+    }
+    rows = [
+        {**game_totals, "scope": "group", "scope_id": summary.group_id},
+        {**game_totals, "scope": "subject", "scope_id": summary.subject_id},
+    ] + [
+        {**game_totals, "scope": "user", "scope_id": user_id, "votes_cast": cast, "votes_correct": correct}
+        for user_id, (cast, correct) in votes_by_user.items()
+    ]
+    _add_game_totals(db, rows, summary.ended_at)
+    _add_flashcard_totals(db, summary, questions)
+
+    if votes_by_user:
+        db.execute(PlayerGame.__table__.insert(), [
+            {"user_id": user_id, "session_id": summary.session_id, "ended_at": summary.ended_at}
+            for user_id in votes_by_user
+        ])
+
+
+def get_stats(db, scope: str, scope_id: int) -> dict:
+    """Totals of one player, group or subject; all zero if nothing was played yet"""
+    stats = db.get(GameStats, (scope, scope_id))
+    totals = {counter: getattr(stats, counter) if stats else 0 for counter in COUNTERS}
+    return {
+        **totals,
+        "win_rate": _ratio(totals["games_won"], totals["games_played"]),
+        "accuracy": _ratio(totals["questions_correct"], totals["questions_played"]),
+        "score_rate": _ratio(totals["total_score"], totals["max_possible_score"]),
+        "vote_accuracy": _ratio(totals["votes_correct"], totals["votes_cast"]),
+        "last_played_at": stats.last_played_at.isoformat() if stats and stats.last_played_at else None,
+    }
+
+
+def _serialize_flashcard_stats(row) -> dict:
+    return {
+        "flashcard_id": row.flashcard_id,
+        "question": row.question,
+        "times_asked": row.times_asked,
+        "times_correct": row.times_correct,
+        "times_missed": row.times_missed,
+        "accuracy": _ratio(row.times_correct, row.times_asked),
+    }
+
+
+def _flashcard_stats_query(db):
+    return db.query(
+        FlashcardStats.flashcard_id, Flashcard.question, FlashcardStats.times_asked,
+        FlashcardStats.times_correct, FlashcardStats.times_missed
+    ).join(Flashcard, Flashcard.id == FlashcardStats.flashcard_id)
+
+
+def get_most_missed(db, group_id: int, subject_id: Optional[int] = None, limit: int = 10) -> List[dict]:
+    """Cards the team got wrong most often, in a subject or the whole group"""
+    scope = FlashcardStats.subject_id == subject_id if subject_id is not None else FlashcardStats.group_id == group_id
+    rows = _flashcard_stats_query(db).filter(
+        scope, FlashcardStats.times_missed > 0
+    ).order_by(FlashcardStats.times_missed.desc(), FlashcardStats.flashcard_id).limit(limit)
+    return [_serialize_flashcard_stats(row) for row in rows]
+
+
+def get_flashcard_stats_page(db, subject_id: int, after_id: int = 0, limit: int = 100) -> dict:
+    """Accuracy of every played card of a subject, by flashcard id; next_cursor is the after_id of the next page"""
+    rows = _flashcard_stats_query(db).filter(
+        FlashcardStats.subject_id == subject_id,
+        FlashcardStats.flashcard_id > after_id
+    ).order_by(FlashcardStats.flashcard_id).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "flashcards": [_serialize_flashcard_stats(row) for row in rows],
+        "next_cursor": rows[-1].flashcard_id if has_more else None
+    }
+
+
+def encode_cursor(ended_at: datetime, session_id: str) -> str:
+    return f"{ended_at.isoformat()}_{session_id}"
+
+
+def decode_cursor(cursor: str) -> HistoryCursor:
+    """Raises ValueError for cursors that weren't produced by encode_cursor"""
+    ended_at, separator, session_id = cursor.partition("_")
+    if not separator or not session_id:
+        raise ValueError("Ungültiger Cursor")
+    return datetime.fromisoformat(ended_at), session_id
+
+
+def get_history_page(db, scope: str, scope_id: int, before: Optional[HistoryCursor] = None, limit: int = 20) -> dict:
+    """Newest-first finished games of a player, group or subject"""
+    query = db.query(GameSummary, Subject.name).outerjoin(Subject, Subject.id == GameSummary.subject_id)
+    if scope == "user":
+        query = query.join(PlayerGame, PlayerGame.session_id == GameSummary.session_id).filter(PlayerGame.user_id == scope_id)
+        ended_at, session_id = PlayerGame.ended_at, PlayerGame.session_id
+    else:
+        column = GameSummary.group_id if scope == "group" else GameSummary.subject_id
+        query = query.filter(column == scope_id)
+        ended_at, session_id = GameSummary.ended_at, GameSummary.session_id
+
+    if before is not None:
+        query = query.filter(tuple_(ended_at, session_id) < tuple_(*before))
+    rows = query.order_by(ended_at.desc(), session_id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    games = [
+        {
+            "session_id": summary.session_id,
+            "subject_id": summary.subject_id,
+            "subject_name": subject_name,
+            "group_id": summary.group_id,
+            "outcome": summary.outcome,
+            "victory": summary.victory,
+            "total_score": summary.total_score,
+            "max_possible_score": summary.max_possible_score,
+            "questions_played": summary.questions_played,
+            "questions_correct": summary.questions_correct,
+            "participant_count": summary.participant_count,
+            "started_at": summary.started_at.isoformat() if summary.started_at else None,
+            "ended_at": summary.ended_at.isoformat() if summary.ended_at else None,
+        }
+        for summary, subject_name in rows
+    ]
+    last = rows[-1][0] if rows else None
+    return {
+        "games": games,
+        "next_cursor": encode_cursor(last.ended_at, last.session_id) if has_more else None
+    }
+
+
+def remove_flashcard_stats(db, flashcard_ids: Iterable[int]):
+    """Drop totals of deleted flashcards; part of the caller's transaction"""
+    flashcard_ids = list(flashcard_ids)
+    if flashcard_ids:
+        db.execute(delete(FlashcardStats).where(FlashcardStats.flashcard_id.in_(flashcard_ids)))
+
+
+def remove_scope_stats(db, scope: str, scope_ids):
+    """Drop totals of deleted groups or subjects, including those of their flashcards.
+
+    scope_ids is a list of ids or a select of them; part of the caller's transaction.
+    """
+    if isinstance(scope_ids, (list, tuple)) and not scope_ids:
+        return
+    db.execute(delete(GameStats).where(GameStats.scope == scope, GameStats.scope_id.in_(scope_ids)))
+    column = FlashcardStats.group_id if scope == "group" else FlashcardStats.subject_id
+    db.execute(delete(FlashcardStats).where(column.in_(scope_ids)))
@@ -0,0 +1,295 @@
+"""
+Card difficulty and group performance computed with NumPy over the per-question summaries of finished games
+
+A group's question outcomes are loaded once into columnar arrays (card, subject, game, correct,
+time) and every statistic is a handful of bincount passes over them. Results are cached per group
+and reused until the group's game counter in game_stats moves, i.e. until another game finishes.
+"""
+from typing import Optional
+import logging
+import time
+
+import numpy as np
+from sqlalchemy import func, literal_column, select
+
+from caching import TTLCache
+from models import Flashcard, GameStats, GameSummary, PlayerGame, QuestionSummary, Subject
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_CACHE_TTL = 3600  # seconds; entries are also replaced as soon as the group finished another game
+MIN_ATTEMPTS = 3  # cards asked fewer times get no discrimination or trend
+MIN_TREND_SPREAD_DAYS = 1.0  # standard deviation of play dates below which no trend is reported
+analytics_cache = TTLCache(maxsize=200, ttl=ANALYTICS_CACHE_TTL)  # group_id -> (games_played, analytics)
+report_cache = TTLCache(maxsize=400, ttl=ANALYTICS_CACHE_TTL)  # (group_id, card_limit) -> (games_played, report)
+
+
+class OutcomeColumns:
+    """One entry per played question: which card, subject and game, whether the team got it right and when"""
+
+    def __init__(self, card: np.ndarray, subject: np.ndarray, game: np.ndarray, correct: np.ndarray,
+                 day: np.ndarray, game_users: Optional[tuple] = None):
+        self.card = card  # flashcard ids
+        self.subject = subject  # subject ids
+        self.game = game  # dense game index 0..n_games-1
+        self.correct = correct  # float 0.0 / 1.0
+        self.day = day  # days since the epoch the game ended, as float
+        self.game_users = game_users  # (game index, user id) arrays of the players of each game
+
+    def __len__(self) -> int:
+        return len(self.correct)
+
+
+def _fetch_array(db, statement, width: int) -> np.ndarray:
+    """Stream a query with numeric columns from the DBAPI cursor into a (rows, width) float array.
+
+    Skipping SQLAlchemy's row objects makes loading a few times faster for millions of rows.
+    """
+    compiled = statement.compile(dialect=db.get_bind().dialect)
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.execute(str(compiled), tuple(compiled.params[name] for name in compiled.positiontup))
+        return np.fromiter(cursor, dtype=np.dtype((np.float64, width)))
+    finally:
+        cursor.close()
+
+
+def load_outcomes(db, group_id: int) -> OutcomeColumns:
+    """Read the question summaries of a group's finished games into arrays"""
+    game_rowid = literal_column("game_summaries.rowid")  # numeric stand-in for the session id
+    outcomes = _fetch_array(db, select(
+        QuestionSummary.flashcard_id,
+        GameSummary.subject_id,
+        game_rowid,
+        func.coalesce(QuestionSummary.__table__.c.was_correct, 0),
+        func.coalesce(func.julianday(GameSummary.ended_at) - 2440587.5, 0)
+    ).join(GameSummary, GameSummary.session_id == QuestionSummary.session_id).where(
+        GameSummary.group_id == group_id
+    ), 5)
+    players = _fetch_array(db, select(game_rowid, PlayerGame.user_id).join(
+        GameSummary, GameSummary.session_id == PlayerGame.session_id
+    ).where(GameSummary.group_id == group_id), 2)
+
+    game_rowids, game = _dense_index(outcomes[:, 2].astype(np.int64))
+    # players of games without question summaries are dropped
+    player_game = np.searchsorted(game_rowids, players[:, 0].astype(np.int64))
+    known = player_game < len(game_rowids)
+    known[known] = game_rowids[player_game[known]] == players[known, 0]
+
+    return OutcomeColumns(
+        card=outcomes[:, 0].astype(np.int64),
+        subject=outcomes[:, 1].astype(np.int64),
+        game=game,
+        correct=outcomes[:, 3],
+        day=outcomes[:, 4],
+        game_users=(player_game[known], players[known, 1].astype(np.int64))
+    )
+
+
+def _dense_index(keys: np.ndarray) -> tuple:
+    """(distinct ids, index of each key into them), like np.unique(return_inverse=True).
+
+    Database ids are small non-negative integers, so a lookup table replaces the sort np.unique needs.
+    """
+    if len(keys) and keys.min() >= 0 and keys.max() <= 4 * len(keys) + 65536:
+        ids = np.flatnonzero(np.bincount(keys))
+        lookup = np.zeros(int(ids[-1]) + 1, dtype=np.int64)
+        lookup[ids] = np.arange(len(ids))
+        return ids, lookup[keys]
+    return np.unique(keys, return_inverse=True)
+
+
+def _grouped_sums(index: np.ndarray, size: int, *weights: np.ndarray) -> list:
+    return [np.bincount(index, weights=weight, minlength=size) for weight in weights]
+
+
+def _weekly_trend(n, sum_t, sum_x, sum_tt, sum_tx):
+    """Least-squares slope of correctness over days, per week, from grouped sums.
+
+    nan where the games were played too close together for a slope to mean anything.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        spread = n * sum_tt - sum_t * sum_t  # n² times the variance of the play dates
+        slope = (n * sum_tx - sum_t * sum_x) / spread * 7
+        return np.where(spread >= (n * MIN_TREND_SPREAD_DAYS) ** 2, slope, np.nan)
+
+
+def _per_key(keys: np.ndarray, outcomes: OutcomeColumns, rest: np.ndarray, rest_known: np.ndarray,
+             day: np.ndarray) -> dict:
+    """Accuracy, difficulty, discrimination and trend for every distinct value of keys"""
+    ids, index = _dense_index(keys)
+    size = len(ids)
+    x = outcomes.correct
+    x_known = x * rest_known  # rest is 0 where unknown, so only x needs masking
+    n, sum_x, sum_t, sum_tt, sum_tx, n_known, sum_x_known, sum_r, sum_rr, sum_xr = _grouped_sums(
+        index, size, None, x, day, day * day, day * x, rest_known, x_known, rest, rest * rest, x_known * rest
+    )
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        accuracy = sum_x / n
+        # Missed share with one pseudo-hit and one pseudo-miss, so a card asked once isn't "100 % hard"
+        difficulty = (n - sum_x + 1) / (n + 2)
+        # Point-biserial correlation between getting this card right and the rest of the game going well
+        mean_x, mean_r = sum_x_known / n_known, sum_r / n_known
+        covariance = sum_xr / n_known - mean_x * mean_r
+        spread = np.sqrt((mean_x - mean_x ** 2) * (sum_rr / n_known - mean_r ** 2))
+        discrimination = covariance / spread
+    trend = _weekly_trend(n, sum_t, sum_x, sum_tt, sum_tx)
+
+    too_few = n < MIN_ATTEMPTS
+    discrimination[too_few] = np.nan
+    trend[too_few] = np.nan
+    return {
+        "ids": ids,
+        "attempts": n.astype(np.int64),
+        "correct": sum_x.astype(np.int64),
+        "accuracy": accuracy,
+        "difficulty": difficulty,
+        "discrimination": discrimination,
+        "trend": trend,
+    }
+
+
+def compute_analytics(outcomes: OutcomeColumns) -> dict:
+    """All statistics of a group as arrays; see summarize_analytics for the JSON shape"""
+    if len(outcomes) == 0:
+        return {"games": 0, "outcomes": 0}
+
+    n_games = int(outcomes.game.max()) + 1
+    x = outcomes.correct
+    game_n, game_correct = _grouped_sums(outcomes.game, n_games, None, x)
+
+    # Share of the game's other questions that were answered correctly, the reference for discrimination
+    others = game_n[outcomes.game] - 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rest = np.where(others > 0, (game_correct[outcomes.game] - x) / others, np.nan)
+    rest_known = (~np.isnan(rest)).astype(np.float64)
+    rest = np.nan_to_num(rest)
+
+    # Days relative to the first game keep the sums of squares small enough for float64
+    day = outcomes.day - outcomes.day.min()
+
+    cards = _per_key(outcomes.card, outcomes, rest, rest_known, day)
+    subjects = _per_key(outcomes.subject, outcomes, rest, rest_known, day)
+    n = len(x)
+    overall_trend = _weekly_trend(n, day.sum(), x.sum(), (day * day).sum(), (day * x).sum())
+
+    users = None
+    if outcomes.game_users is not None and len(outcomes.game_users[0]):
+        player_game, player_user = outcomes.game_users
+        user_ids, user_index = _dense_index(player_user)
+        played, answered_correctly, games_played = _grouped_sums(
+            user_index, len(user_ids), game_n[player_game], game_correct[player_game], None
+        )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            users = {
+                "ids": user_ids,
+                "games": games_played.astype(np.int64),
+                "questions": played.astype(np.int64),
+                "accuracy": answered_correctly / played,
+            }
+
+    return {
+        "games": n_games,
+        "outcomes": n,
+        "accuracy": float(x.mean()),
+        "trend": float(overall_trend) if np.isfinite(overall_trend) else None,
+        "game_accuracy_quartiles": np.percentile(game_correct / game_n, [25, 50, 75]).tolist(),
+        "cards": cards,
+        "subjects": subjects,
+        "users": users,
+    }
+
+
+def _number(value) -> Optional[float]:
+    value = float(value)
+    return round(value, 4) if np.isfinite(value) else None
+
+
+def _rows(stats: dict, order: np.ndarray, id_name: str, columns: tuple) -> list:
+    return [
+        {id_name: int(stats["ids"][i]), **{column: (
+            int(stats[column][i]) if stats[column].dtype == np.int64 else _number(stats[column][i])
+        ) for column in columns}}
+        for i in order
+    ]
+
+
+def summarize_analytics(db, analytics: dict, card_limit: int = 20) -> dict:
+    """Turn the arrays into JSON: the hardest cards first, every subject and player of the group"""
+    if not analytics["games"]:
+        return {"games": 0, "outcomes": 0, "cards": [], "subjects": [], "users": []}
+
+    cards = analytics["cards"]
+    # hardest first; ties broken by more attempts, then by id for a stable order
+    order = np.lexsort((cards["ids"], -cards["attempts"], -cards["difficulty"]))[:card_limit]
+    card_rows = _rows(cards, order, "flashcard_id",
+                      ("attempts", "correct", "accuracy", "difficulty", "discrimination", "trend"))
+    questions = dict(db.query(Flashcard.id, Flashcard.question).filter(
+        Flashcard.id.in_([row["flashcard_id"] for row in card_rows])
+    ).all())
+    for row in card_rows:
+        row["question"] = questions.get(row["flashcard_id"])
+
+    subjects = analytics["subjects"]
+    subject_rows = _rows(subjects, np.argsort(-subjects["difficulty"], kind="stable"), "subject_id",
+                         ("attempts", "correct", "accuracy", "difficulty", "trend"))
+    names = dict(db.query(Subject.id, Subject.name).filter(
+        Subject.id.in_([row["subject_id"] for row in subject_rows])
+    ).all())
+    for row in subject_rows:
+        row["subject_name"] = names.get(row["subject_id"])
+
+    users = analytics["users"]
+    user_rows = _rows(users, np.argsort(-users["accuracy"], kind="stable"), "user_id",
+                      ("games", "questions", "accuracy")) if users else []
+
+    return {
+        "games": analytics["games"],
+        "outcomes": analytics["outcomes"],
+        "accuracy": _number(analytics["accuracy"]),
+        "trend": _number(analytics["trend"]) if analytics["trend"] is not None else None,
+        "game_accuracy_quartiles": [_number(value) for value in analytics["game_accuracy_quartiles"]],
+        "cards": card_rows,
+        "subjects": subject_rows,
+        "users": user_rows,
+    }
+
+
+def _games_played(db, group_id: int) -> int:
+    return db.query(GameStats.games_played).filter(
+        GameStats.scope == "group", GameStats.scope_id == group_id
+    ).scalar() or 0
+
+
+def get_group_analytics(db, group_id: int, games_played: Optional[int] = None) -> dict:
+    """Cached arrays of a group, recomputed once the group has finished another game"""
+    if games_played is None:
+        games_played = _games_played(db, group_id)
+
+    cached = analytics_cache.get(group_id)
+    if cached is not None and cached[0] == games_played:
+        return cached[1]
+
+    started = time.perf_counter()
+    outcomes = load_outcomes(db, group_id)
+    loaded = time.perf_counter()
+    analytics = compute_analytics(outcomes)
+    logger.info(
+        f"Analytics for group {group_id}: {len(outcomes)} outcomes loaded in {(loaded - started) * 1000:.0f} ms, "
+        f"computed in {(time.perf_counter() - loaded) * 1000:.0f} ms"
+    )
+    analytics_cache.set(group_id, (games_played, analytics))
+    return analytics
+
+
+def get_group_report(db, group_id: int, card_limit: int = 20) -> dict:
+    """JSON report of a group, cached like the arrays until the group finishes another game"""
+    games_played = _games_played(db, group_id)
+    cached = report_cache.get((group_id, card_limit))
+    if cached is not None and cached[0] == games_played:
+        return cached[1]
+
+    report = summarize_analytics(db, get_group_analytics(db, group_id, games_played), card_limit)
+    report_cache.set((group_id, card_limit), (games_played, report))
+    return report
@@ -8,6 +8,7 @@ from database import get_db
 from auth import get_current_user
 from models import User, QuizSession, SessionParticipant, Subject, Group, Flashcard
 from schemas import SessionResponse
+from session_access import session_access
 
 router = APIRouter(prefix="/api/lobby", tags=["lobby"])
 
@@ -55,6 +56,7 @@ async def create_lobby(
     )
     db.add(host_participant)
     db.commit()
+    session_access.add_participant(session.id, current_user.id)
     
     
     participants = [{
@@ -105,6 +107,7 @@ async def join_lobby_with_code(
         )
         db.add(participant)
         db.commit()
+        session_access.add_participant(session.id, current_user.id)
         
         print(f"\n🔔 NEW PARTICIPANT JOINED:")
         print(f"   User: {current_user.username} (ID: {current_user.id})")
@@ -169,6 +172,7 @@ async def join_existing_session(
             )
             db.add(participant)
             db.commit()
+            session_access.add_participant(session.id, current_user.id)
     
     participants = get_session_participants(db, session)
     
@@ -227,13 +231,16 @@ async def leave_lobby(
                 SessionParticipant.session_id == session_id
             ).delete()
             db.delete(session)
+            db.commit()
+            session_access.forget(session_id)
     else:
         db.query(SessionParticipant).filter(
             SessionParticipant.session_id == session_id,
             SessionParticipant.user_id == current_user.id
         ).delete()
+        db.commit()
+        session_access.remove_participant(session_id, current_user.id)
     
-    db.commit()
     return {"status": "left"}
 
 @router.post("/{session_id}/start")
@@ -325,6 +332,7 @@ async def get_session_details(
                 )
                 db.add(participant)
                 db.commit()
+                session_access.add_participant(session.id, current_user.id)
                 
                 print(f"\n🔔 AUTO-JOINED via URL:")
                 print(f"   User: {current_user.username} (ID: {current_user.id})")
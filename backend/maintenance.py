@@ -0,0 +1,73 @@
+"""
+In-process scheduler for periodic database maintenance
+"""
+from typing import Callable, List, Optional
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+MAINTENANCE_TICK = 30  # seconds between checks for due jobs
+
+
+class MaintenanceJob:
+    def __init__(self, name: str, interval: float, function: Callable[[], object],
+                 on_loop: Optional[Callable[[object], object]] = None):
+        self.name = name
+        self.interval = interval
+        self.function = function
+        self.on_loop = on_loop  # gets the result on the event loop thread; what it returns is logged
+        self.next_run = time.monotonic() + interval
+
+
+class MaintenanceScheduler:
+    """Runs registered jobs one at a time on a worker thread, so the event loop never waits for them.
+
+    Jobs are expected to work in small, time-boxed transactions and pick up leftovers on their next run.
+    """
+
+    def __init__(self, tick: float = MAINTENANCE_TICK):
+        self.tick = tick
+        self.jobs: List[MaintenanceJob] = []
+        self.task: Optional[asyncio.Task] = None
+
+    def add_job(self, name: str, interval: float, function: Callable[[], object], run_at_start: bool = False,
+                on_loop: Optional[Callable[[object], object]] = None):
+        """Register a job; on_loop is for follow-up work on in-memory state the event loop shares"""
+        job = MaintenanceJob(name, interval, function, on_loop)
+        if run_at_start:
+            job.next_run = time.monotonic()
+        self.jobs.append(job)
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    async def run_job(self, job: MaintenanceJob):
+        started = time.monotonic()
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(None, job.function)
+            if job.on_loop is not None:
+                result = job.on_loop(result)
+            if result:
+                logger.info(f"Maintenance job {job.name}: {result} ({time.monotonic() - started:.2f}s)")
+        except Exception as e:
+            logger.error(f"Maintenance job {job.name} failed: {e}")
+        finally:
+            job.next_run = time.monotonic() + job.interval
+
+    async def _run(self):
+        while True:
+            for job in self.jobs:
+                if time.monotonic() >= job.next_run:
+                    await self.run_job(job)
+            await asyncio.sleep(self.tick)
+
+
+maintenance = MaintenanceScheduler()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Text, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
@@ -26,11 +26,13 @@ class Group(Base):
 class UserGroupAssociation(Base):
     __tablename__ = "user_group_associations"
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
-    group_id = Column(Integer, ForeignKey("groups.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    group_id = Column(Integer, ForeignKey("groups.id"), index=True)
     user = relationship("User", back_populates="user_groups")
     group = relationship("Group", back_populates="group_users")
 
+    __table_args__ = (Index("ix_user_group_associations_user_group", "user_id", "group_id"),)
+
 class Invitation(Base):
     __tablename__ = "invitations"
     id = Column(Integer, primary_key=True, index=True)
@@ -46,6 +48,7 @@ class Subject(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)  # Removed unique=True
     group_id = Column(Integer, ForeignKey("groups.id"), index=True)
+    cards_version = Column(Integer, default=0, server_default="0", nullable=False)  # bumped on every deck change
     group = relationship("Group", back_populates="subjects")
     flashcards = relationship("Flashcard", back_populates="subject", cascade="all, delete-orphan")
 
@@ -68,19 +71,21 @@ class Answer(Base):
 class RefreshToken(Base):
     __tablename__ = "refresh_tokens"
     id = Column(Integer, primary_key=True, index=True)
-    token = Column(String, unique=True, index=True)
+    token = Column(String, unique=True, index=True)  # SHA-256 of the token handed to the client
     user_id = Column(Integer, ForeignKey("users.id"))
-    expires_at = Column(DateTime)
+    expires_at = Column(DateTime, index=True)  # pruning scans by expiry alone
     created_at = Column(DateTime, default=datetime.utcnow)
     user = relationship("User", back_populates="refresh_tokens")
 
+    __table_args__ = (Index("ix_refresh_tokens_user_expires", "user_id", "expires_at"),)
+
 
 class QuizSession(Base):
     __tablename__ = "quiz_sessions"
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    subject_id = Column(Integer, ForeignKey("subjects.id"))
-    group_id = Column(Integer, ForeignKey("groups.id"))
+    subject_id = Column(Integer, ForeignKey("subjects.id"), index=True)
+    group_id = Column(Integer, ForeignKey("groups.id"), index=True)
     host_user_id = Column(Integer, ForeignKey("users.id"))
     status = Column(String, default="waiting")  # waiting, in_progress, finished
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -135,6 +140,8 @@ class GameState(Base):
     status = Column(String, default="waiting")  # waiting, question_active, question_ended, game_finished
     started_at = Column(DateTime, nullable=True)
     ended_at = Column(DateTime, nullable=True)
+    version = Column(Integer, default=0, server_default="0", nullable=False)  # bumped on every write, used for compare-and-swap
+    adaptive_seed = Column(Integer, nullable=True)  # set for adaptive games, seeds their question order
     
     session = relationship("QuizSession", back_populates="game_state")
     current_flashcard = relationship("Flashcard", foreign_keys=[current_flashcard_id])
@@ -155,12 +162,14 @@ class Vote(Base):
     user = relationship("User")
     answer = relationship("Answer")
 
+    __table_args__ = (Index("ix_votes_session_flashcard", "session_id", "flashcard_id"),)
+
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
     
     id = Column(Integer, primary_key=True, index=True)
-    session_id = Column(String, ForeignKey("quiz_sessions.id"))
+    session_id = Column(String, ForeignKey("quiz_sessions.id"), index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     message = Column(String)
     sent_at = Column(DateTime, default=datetime.utcnow)
@@ -168,3 +177,118 @@ class ChatMessage(Base):
     session = relationship("QuizSession", back_populates="chat_messages")
     user = relationship("User")
 
+
+
+class GameEvent(Base):
+    __tablename__ = "game_events"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    session_id = Column(String, ForeignKey("quiz_sessions.id"), index=True)
+    version = Column(Integer)  # game state version after the event, votes keep the current one
+    event_type = Column(String)  # started, vote, question_ended, advanced, finished
+    payload = Column(Text)  # JSON
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class GameSnapshot(Base):
+    __tablename__ = "game_snapshots"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    session_id = Column(String, ForeignKey("quiz_sessions.id"), index=True)
+    version = Column(Integer)
+    state = Column(Text)  # JSON of all GameState columns at that version
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class GameSummary(Base):
+    __tablename__ = "game_summaries"
+
+    session_id = Column(String, ForeignKey("quiz_sessions.id"), primary_key=True)
+    group_id = Column(Integer, ForeignKey("groups.id"))
+    subject_id = Column(Integer, ForeignKey("subjects.id"))
+    host_user_id = Column(Integer, ForeignKey("users.id"))
+    outcome = Column(String)  # won, lost, ended_manually
+    victory = Column(Boolean)  # reached the 90 % target, however the game ended
+    total_score = Column(Integer)
+    max_possible_score = Column(Integer)
+    questions_total = Column(Integer)
+    questions_played = Column(Integer)
+    questions_correct = Column(Integer)
+    participant_count = Column(Integer)
+    started_at = Column(DateTime)
+    ended_at = Column(DateTime)
+
+    # newest-first history pages of a group or subject are keyset scans over these
+    __table_args__ = (
+        Index("ix_game_summaries_group_history", "group_id", "ended_at", "session_id"),
+        Index("ix_game_summaries_subject_history", "subject_id", "ended_at", "session_id"),
+    )
+
+
+class QuestionSummary(Base):
+    __tablename__ = "question_summaries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    session_id = Column(String, ForeignKey("quiz_sessions.id"), index=True)
+    question_index = Column(Integer)
+    flashcard_id = Column(Integer, ForeignKey("flashcards.id"))
+    correct_answer_id = Column(Integer)
+    winning_answer_id = Column(Integer, nullable=True)  # None if nobody voted or the question was skipped
+    was_correct = Column(Boolean)
+    vote_counts = Column(Text)  # JSON {answer_id: votes}
+    votes_cast = Column(Integer)
+    duration_ms = Column(Integer, nullable=True)
+
+
+class GameArchive(Base):
+    __tablename__ = "game_archives"
+
+    session_id = Column(String, ForeignKey("quiz_sessions.id"), primary_key=True)
+    vote_count = Column(Integer)
+    message_count = Column(Integer)
+    event_count = Column(Integer)
+    payload = Column(LargeBinary)  # zlib-compressed JSON of the votes, chat messages and journal events
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+
+class PlayerGame(Base):
+    __tablename__ = "player_games"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    session_id = Column(String, ForeignKey("quiz_sessions.id"), primary_key=True)
+    ended_at = Column(DateTime)
+
+    __table_args__ = (Index("ix_player_games_history", "user_id", "ended_at", "session_id"),)
+
+
+class GameStats(Base):
+    __tablename__ = "game_stats"
+
+    scope = Column(String, primary_key=True)  # user, group, subject
+    scope_id = Column(Integer, primary_key=True)
+    games_played = Column(Integer, default=0, nullable=False)
+    games_won = Column(Integer, default=0, nullable=False)
+    questions_played = Column(Integer, default=0, nullable=False)
+    questions_correct = Column(Integer, default=0, nullable=False)
+    total_score = Column(Integer, default=0, nullable=False)
+    max_possible_score = Column(Integer, default=0, nullable=False)
+    votes_cast = Column(Integer, default=0, nullable=False)
+    votes_correct = Column(Integer, default=0, nullable=False)  # votes for the correct answer
+    last_played_at = Column(DateTime, nullable=True)
+
+
+class FlashcardStats(Base):
+    __tablename__ = "flashcard_stats"
+
+    flashcard_id = Column(Integer, ForeignKey("flashcards.id"), primary_key=True)
+    subject_id = Column(Integer, ForeignKey("subjects.id"))
+    group_id = Column(Integer, ForeignKey("groups.id"))
+    times_asked = Column(Integer, default=0, nullable=False)
+    times_correct = Column(Integer, default=0, nullable=False)
+    times_missed = Column(Integer, default=0, nullable=False)
+    last_asked_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_flashcard_stats_subject_missed", "subject_id", "times_missed"),
+        Index("ix_flashcard_stats_group_missed", "group_id", "times_missed"),
+    )
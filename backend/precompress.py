@@ -0,0 +1,66 @@
+"""
+Write .br and .gz copies next to the compressible files of the frontend build, for frontend_assets to serve
+
+Run after every frontend build: python backend/precompress.py frontend/build
+Brotli copies are only written if the brotli package is installed.
+"""
+from typing import Callable, List, Tuple
+import gzip
+import os
+import sys
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = (".html", ".js", ".css", ".json", ".map", ".svg", ".txt", ".ico", ".webmanifest")
+MIN_SIZE = 256  # bytes; smaller files fit in one packet anyway
+MAX_RATIO = 0.9  # a copy that saves less than 10 % isn't worth serving
+
+
+def _compressors() -> List[Tuple[str, Callable[[bytes], bytes]]]:
+    compressors = [(".gz", lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        compressors.insert(0, (".br", lambda data: brotli.compress(data, quality=11)))
+    return compressors
+
+
+def precompress(build_dir: str) -> List[Tuple[str, int, dict]]:
+    """Compress every eligible file; returns (path, size, {suffix: compressed size}) per file.
+
+    Copies that would not be smaller than MAX_RATIO of the original are removed, so a stale one
+    from an earlier build can never be served.
+    """
+    compressors = _compressors()
+    results = []
+    for directory, _, names in os.walk(build_dir):
+        for name in sorted(names):
+            if not name.endswith(COMPRESSIBLE):
+                continue
+            path = os.path.join(directory, name)
+            with open(path, "rb") as file:
+                data = file.read()
+
+            sizes = {}
+            for suffix, compress in compressors:
+                compressed = compress(data) if len(data) >= MIN_SIZE else None
+                if compressed is not None and len(compressed) <= len(data) * MAX_RATIO:
+                    with open(path + suffix, "wb") as file:
+                        file.write(compressed)
+                    sizes[suffix] = len(compressed)
+                elif os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+            results.append((path, len(data), sizes))
+    return results
+
+
+if __name__ == "__main__":
+    build_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(__file__), "..", "frontend", "build")
+    if not os.path.isdir(build_dir):
+        sys.exit(f"Build directory {build_dir} not found, run 'npm run build' first")
+    if brotli is None:
+        print("brotli is not installed, writing gzip copies only")
+    for path, size, sizes in precompress(build_dir):
+        print(f"{os.path.relpath(path, build_dir)}: {size} bytes"
+              + "".join(f", {suffix[1:]} {compressed}" for suffix, compressed in sizes.items()))
@@ -1,7 +1,16 @@
-from pydantic import BaseModel, EmailStr, field_validator
+from pydantic import BaseModel, EmailStr, field_validator, model_validator
 from typing import Optional, List
 from datetime import datetime
 
+def check_answers(antworten: list) -> list:
+    """Flashcards need exactly 4 answers with exactly one marked correct"""
+    if len(antworten) != 4:
+        raise ValueError('Es müssen genau 4 Antworten angegeben werden')
+    correct_count = sum(1 for answer in antworten if answer.get('is_correct', False))
+    if correct_count != 1:
+        raise ValueError('Es muss genau eine richtige Antwort geben')
+    return antworten
+
 class UserCreate(BaseModel):
     username: str
     email: EmailStr
@@ -58,12 +67,7 @@ class FlashcardCreate(BaseModel):
     
     @field_validator('antworten')
     def validate_answers(cls, v):
-        if len(v) != 4:
-            raise ValueError('Es müssen genau 4 Antworten angegeben werden')
-        correct_count = sum(1 for answer in v if answer.get('is_correct', False))
-        if correct_count != 1:
-            raise ValueError('Es muss genau eine richtige Antwort geben')
-        return v
+        return check_answers(v)
 
 class FlashcardUpdate(BaseModel):
     flashcard_id: int
@@ -72,16 +76,34 @@ class FlashcardUpdate(BaseModel):
     
     @field_validator('antworten')
     def validate_answers(cls, v):
-        if len(v) != 4:
-            raise ValueError('Es müssen genau 4 Antworten angegeben werden')
-        correct_count = sum(1 for answer in v if answer.get('is_correct', False))
-        if correct_count != 1:
-            raise ValueError('Es muss genau eine richtige Antwort geben')
-        return v
+        return check_answers(v)
 
 class FlashcardDelete(BaseModel):
     flashcard_id: int
 
+class FlashcardOperation(BaseModel):
+    action: str  # create, update, delete
+    flashcard_id: Optional[int] = None
+    frage: Optional[str] = None
+    antworten: Optional[list[dict]] = None  # [{"answer_id": optional, "text": "...", "is_correct": true/false}, ...]
+    
+    @model_validator(mode='after')
+    def validate_operation(self):
+        if self.action not in ("create", "update", "delete"):
+            raise ValueError("action muss create, update oder delete sein")
+        if self.action != "create" and self.flashcard_id is None:
+            raise ValueError(f"flashcard_id fehlt für {self.action}")
+        if self.action != "delete":
+            if not self.frage:
+                raise ValueError(f"frage fehlt für {self.action}")
+            check_answers(self.antworten or [])
+        return self
+
+class FlashcardBatch(BaseModel):
+    fach: str
+    gruppe: str
+    operations: List[FlashcardOperation]
+
 
 class SessionCreate(BaseModel):
     subject_name: str
@@ -238,6 +260,12 @@ class FachDeleteRequest(BaseModel):
     fach_name: str
     gruppen_name: str
 
+class FachCloneRequest(BaseModel):
+    fach_name: str
+    gruppen_name: str
+    ziel_gruppen_name: str
+    neuer_fach_name: Optional[str] = None  # defaults to fach_name
+
 class KarteiKarteRequest(BaseModel):
     Fach:str
     Gruppe:str
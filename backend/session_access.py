@@ -0,0 +1,88 @@
+"""
+In-memory access control data for active quiz sessions
+"""
+from typing import Optional, Set
+
+from sqlalchemy.orm import Session
+from caching import TTLCache
+from models import QuizSession, SessionParticipant
+
+MAX_CACHED_SESSIONS = 5000
+SESSION_ACCESS_TTL = 1800  # seconds; longer than a lobby plus a game, bounds what a finished game keeps in memory
+
+
+class SessionAccess:
+    def __init__(self, host_user_id: int, group_id: int, participant_ids: Set[int]):
+        self.host_user_id = host_user_id
+        self.group_id = group_id
+        self.participant_ids = participant_ids
+
+
+class SessionAccessCache:
+    """Participant set, host and group of each session, loaded from the DB on first use.
+
+    Join/leave code paths keep the cached sets in sync without counting as lookups; a host change
+    drops the entry. A negative membership answer is always re-checked against the DB, so joins
+    done by another worker are never refused.
+    Entries are dropped when a game finishes; the LRU bound and ttl catch sessions nobody finishes.
+    """
+
+    def __init__(self):
+        self.entries = TTLCache(maxsize=MAX_CACHED_SESSIONS, ttl=SESSION_ACCESS_TTL)
+
+    def get(self, db: Session, session_id: str) -> Optional[SessionAccess]:
+        entry = self.entries.get(session_id)
+        if entry is not None:
+            return entry
+
+        session = db.query(QuizSession.host_user_id, QuizSession.group_id).filter(
+            QuizSession.id == session_id
+        ).first()
+        if session is None:
+            return None
+
+        participant_ids = {
+            user_id for (user_id,) in db.query(SessionParticipant.user_id).filter(
+                SessionParticipant.session_id == session_id
+            )
+        }
+        entry = SessionAccess(session.host_user_id, session.group_id, participant_ids)
+        self.entries.set(session_id, entry)
+        return entry
+
+    def is_participant(self, db: Session, session_id: str, user_id: int) -> bool:
+        entry = self.get(db, session_id)
+        if entry is None:
+            return False
+        if user_id in entry.participant_ids:
+            return True
+
+        joined_elsewhere = db.query(SessionParticipant.user_id).filter(
+            SessionParticipant.session_id == session_id,
+            SessionParticipant.user_id == user_id
+        ).first()
+        if joined_elsewhere:
+            entry.participant_ids.add(user_id)
+            return True
+        return False
+
+    def is_host(self, db: Session, session_id: str, user_id: int) -> bool:
+        entry = self.get(db, session_id)
+        return entry is not None and entry.host_user_id == user_id
+
+    def add_participant(self, session_id: str, user_id: int):
+        entry = self.entries.peek(session_id)
+        if entry is not None:
+            entry.participant_ids.add(user_id)
+
+    def remove_participant(self, session_id: str, user_id: int):
+        entry = self.entries.peek(session_id)
+        if entry is not None:
+            entry.participant_ids.discard(user_id)
+
+    def forget(self, session_id: str):
+        """Drop a session, e.g. after it was deleted or finished or its host changed"""
+        self.entries.pop(session_id)
+
+
+session_access = SessionAccessCache()
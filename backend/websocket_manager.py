@@ -1,18 +1,26 @@
 """
 WebSocket Manager for real-time online user tracking
 """
-from typing import Dict, Set, List
+from typing import Deque, Dict, Set, List, Optional
+from collections import deque
 from fastapi import WebSocket
 import json
 import logging
+import uuid
 
 logger = logging.getLogger(__name__)
 
+GAME_EVENT_BUFFER_SIZE = 256  # events kept per game for reconnect replay
+
 class ConnectionManager:
     def __init__(self):
         self.active_connections: Dict[int, WebSocket] = {}
         self.group_users: Dict[str, Set[int]] = {}
         self.user_names: Dict[int, str] = {}
+        # Sequence numbers restart with the process, the epoch tells clients when that happened
+        self.epoch = uuid.uuid4().hex[:8]
+        self.game_sequences: Dict[str, int] = {}
+        self.game_events: Dict[str, Deque[dict]] = {}
 
     async def connect(self, websocket: WebSocket, user_id: int, username: str):
         """Connect a user and track them"""
@@ -74,8 +82,50 @@ class ConnectionManager:
         
         return online_users
 
+    def _record_game_event(self, group_name: str, message: dict) -> dict:
+        """Stamp a game room event with the next sequence number and keep it for replay"""
+        seq = self.game_sequences.get(group_name, 0) + 1
+        self.game_sequences[group_name] = seq
+        message = {**message, "seq": seq}
+
+        if group_name not in self.game_events:
+            self.game_events[group_name] = deque(maxlen=GAME_EVENT_BUFFER_SIZE)
+        self.game_events[group_name].append(message)
+        return message
+
+    def get_game_sequence(self, session_id: str) -> int:
+        """Sequence number of the last event broadcast to a game room"""
+        return self.game_sequences.get(f"game_{session_id}", 0)
+
+    def get_missed_game_events(self, session_id: str, last_seq: int, epoch: Optional[str]) -> Optional[List[dict]]:
+        """Events after last_seq, or None if the buffer can no longer fill the gap"""
+        if epoch != self.epoch:
+            return None
+
+        group_name = f"game_{session_id}"
+        current_seq = self.game_sequences.get(group_name, 0)
+        if last_seq > current_seq:
+            return None
+        if last_seq == current_seq:
+            return []
+
+        buffered = self.game_events.get(group_name)
+        if not buffered or buffered[0]["seq"] > last_seq + 1:
+            return None
+
+        return [event for event in buffered if event["seq"] > last_seq]
+
+    def forget_game(self, session_id: str):
+        """Drop the replay buffer of a game"""
+        group_name = f"game_{session_id}"
+        self.game_sequences.pop(group_name, None)
+        self.game_events.pop(group_name, None)
+
     async def broadcast_to_group(self, group_name: str, message: dict):
         """Send message to all users in a group"""
+        if group_name.startswith("game_"):
+            message = self._record_game_event(group_name, message)
+
         print(f"🔥 WEBSOCKET DEBUG: Broadcasting to group {group_name}")
         print(f"🔥 WEBSOCKET DEBUG: Message: {message}")
         print(f"🔥 WEBSOCKET DEBUG: Group users: {self.group_users.get(group_name, 'NOT_FOUND')}")
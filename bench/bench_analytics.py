@@ -0,0 +1,88 @@
+"""
+Loading, computing and serializing the analytics report of one group with a large number of question outcomes
+
+Run: python bench/bench_analytics.py [outcomes]   (default 10M, 10 questions per game)
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import DateTime, bindparam, text
+
+from common import count_arg, create_deck, create_group, create_users, measure, new_session
+
+from group_analytics import compute_analytics, get_group_report, load_outcomes, summarize_analytics
+
+OUTCOMES = count_arg(10_000_000)
+QUESTIONS = 10  # per game
+GAMES = OUTCOMES // QUESTIONS
+SUBJECTS = 20
+CARDS = 250  # per subject
+USERS = 200
+PLAYERS = 4  # per game
+
+FILL_GAMES_SQL = text("""
+WITH RECURSIVE n(i) AS (SELECT :start UNION ALL SELECT i + 1 FROM n WHERE i < :stop)
+INSERT INTO game_summaries (session_id, group_id, subject_id, outcome, victory, total_score, max_possible_score,
+                            questions_total, questions_played, questions_correct, participant_count, ended_at)
+SELECT printf('game-%09d', i), :group_id, :first_subject + i % :subjects, 'lost', 0, 0, 0, :questions, :questions, 0,
+       :players, datetime(:first, printf('+%d minutes', i))
+FROM n
+""").bindparams(bindparam("first", type_=DateTime))
+
+# Cards of a game come from its subject; harder cards (higher number) are missed more often
+FILL_OUTCOMES_SQL = text("""
+WITH RECURSIVE n(i) AS (SELECT :start UNION ALL SELECT i + 1 FROM n WHERE i < :stop),
+     q(k) AS (SELECT 0 UNION ALL SELECT k + 1 FROM q WHERE k + 1 < :questions),
+     o(i, k, card) AS (SELECT i, k, (i * 7 + k * 31) % :cards FROM n, q)
+INSERT INTO question_summaries (session_id, question_index, flashcard_id, correct_answer_id, was_correct, votes_cast)
+SELECT printf('game-%09d', i), k, :first_card + (i % :subjects) * :cards + card, 1,
+       abs(random() % :cards) >= card / 2, :players
+FROM o
+""")
+
+FILL_PLAYERS_SQL = text("""
+WITH RECURSIVE n(i) AS (SELECT :start UNION ALL SELECT i + 1 FROM n WHERE i < :stop),
+     p(k) AS (SELECT 0 UNION ALL SELECT k + 1 FROM p WHERE k + 1 < :players)
+INSERT INTO player_games (user_id, session_id, ended_at)
+SELECT :first_user + (i * :players + k) % :users, printf('game-%09d', i), datetime(:first, printf('+%d minutes', i))
+FROM n, p
+""").bindparams(bindparam("first", type_=DateTime))
+
+db = new_session()
+user_ids = create_users(db, USERS)
+group_id = create_group(db, "bench", user_ids)
+subject_ids = [create_deck(db, group_id, f"deck{n}", CARDS, answers=1) for n in range(SUBJECTS)]
+first_card = db.execute(text("SELECT min(id) FROM flashcards")).scalar()
+first = datetime.utcnow() - timedelta(minutes=GAMES + 60)
+with measure(f"fill {OUTCOMES} outcomes"):
+    for start in range(0, GAMES, 100_000):
+        window = {"start": start + 1, "stop": min(start + 100_000, GAMES)}
+        db.execute(FILL_GAMES_SQL, {**window, "group_id": group_id, "first_subject": subject_ids[0], "subjects": SUBJECTS,
+                                    "questions": QUESTIONS, "players": PLAYERS, "first": first})
+        db.execute(FILL_OUTCOMES_SQL, {**window, "questions": QUESTIONS, "cards": CARDS, "first_card": first_card,
+                                       "subjects": SUBJECTS, "players": PLAYERS})
+        db.execute(FILL_PLAYERS_SQL, {**window, "first_user": user_ids[0], "users": USERS, "players": PLAYERS,
+                                      "first": first})
+        db.commit()
+    db.execute(text("""
+        INSERT INTO game_stats (scope, scope_id, games_played, games_won, questions_played, questions_correct,
+                                total_score, max_possible_score, votes_cast, votes_correct)
+        VALUES ('group', :group_id, :games, 0, 0, 0, 0, 0, 0, 0)
+    """), {"group_id": group_id, "games": GAMES})
+    db.commit()
+print(f"{OUTCOMES} outcomes of {GAMES} games, {SUBJECTS * CARDS} cards, {USERS} players")
+
+for memory in (False, True):
+    with measure("load outcomes", memory):
+        outcomes = load_outcomes(db, group_id)
+for memory in (False, True):
+    with measure("compute analytics", memory):
+        analytics = compute_analytics(outcomes)
+with measure("summarize into the report"):
+    summarize_analytics(db, analytics)
+del outcomes, analytics
+
+with measure("report, cold"):
+    get_group_report(db, group_id)
+with measure("report, cached"):
+    get_group_report(db, group_id)
+db.close()
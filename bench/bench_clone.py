@@ -0,0 +1,25 @@
+"""
+Cloning a large deck into another group
+
+Run: python bench/bench_clone.py [cards]   (default 50000)
+"""
+from sqlalchemy import event
+
+from common import count_arg, create_deck, create_group, measure, new_session
+
+from database import engine
+from db_operations import clone_subject
+
+CARDS = count_arg(50000)
+
+db = new_session()
+source_subject_id = create_deck(db, create_group(db, "source"), "deck", CARDS)
+target_group_id = create_group(db, "target")
+db.close()
+print(f"{CARDS} cards, 4 answers each")
+
+statements = []
+event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+with measure("clone"):
+    assert isinstance(clone_subject(source_subject_id, target_group_id, "copy"), int)
+print(f"{len(statements)} statements")
@@ -0,0 +1,72 @@
+"""
+Cold start of a worker: a fresh process imports the app, runs its startup and answers a first request
+
+Each run is a new interpreter, so nothing is warm but the OS page cache. Three cases: a database the
+models were already applied to (the schema check is skipped), the same database with its schema
+fingerprint removed (every table is inspected, as before the fingerprint existed), and an empty one.
+Run: python bench/bench_cold_start.py [runs]   (default 5 per case)
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from common import ROOT, count_arg
+
+from database import engine, schema_version
+
+RUNS = count_arg(5)
+
+CHILD = """
+import time
+began = time.perf_counter()
+import json, sys
+sys.path.insert(0, {backend!r})
+from starlette.testclient import TestClient
+import app
+with TestClient(app.app) as client:
+    ready = time.perf_counter()
+    assert client.post("/register", json={{"username": "first", "email": "first@example.com",
+                                          "password": "secret123"}}).status_code in (200, 400)
+    answered = time.perf_counter()
+print(json.dumps({{**app.app.state.startup_timings, "ready": (ready - began) * 1000,
+                  "first_request": (answered - ready) * 1000}}))
+""".format(backend=os.path.join(ROOT, "backend"))
+
+
+def cold_start(database: str) -> dict:
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD], env={**os.environ, "TEST_DATABASE": database},
+        capture_output=True, text=True, check=True
+    ).stdout
+    timings = json.loads(output.splitlines()[-1])
+    timings["process"] = (time.perf_counter() - started) * 1000
+    return timings
+
+
+def report(label: str, runs: list):
+    median = {name: statistics.median(run[name] for run in runs) for name in runs[0]}
+    print(f"{label}: process {median['process']:.0f} ms, ready {median['ready']:.0f} ms "
+          f"(imports {median['imports']:.0f} ms, schema {median['schema']:.0f} ms), "
+          f"first request {median['first_request']:.0f} ms")
+
+
+database = os.environ["TEST_DATABASE"]
+cold_start(database)  # page cache and .pyc files
+report("schema unchanged", [cold_start(database) for _ in range(RUNS)])
+
+
+def without_fingerprint() -> dict:
+    with engine.begin() as connection:
+        connection.execute(schema_version.delete())
+    return cold_start(database)
+
+
+report("schema fingerprint missing", [without_fingerprint() for _ in range(RUNS)])
+
+empty = os.path.join(os.path.dirname(database), "empty-{}.db")
+report("empty database", [cold_start(empty.format(run)) for run in range(RUNS)])
+print(f"medians of {RUNS} runs")
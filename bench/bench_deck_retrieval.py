@@ -0,0 +1,37 @@
+"""
+Whole-deck, paginated and streamed deck retrieval on a large synthetic subject
+
+Run: python bench/bench_deck_retrieval.py [cards]   (default 50000)
+"""
+import json
+
+from common import count_arg, create_deck, create_group, measure, new_session
+
+from db_operations import get_subject_cards_by_id, get_subject_cards_page, iter_subject_cards
+
+CARDS = count_arg(50000)
+
+db = new_session()
+subject_id = create_deck(db, create_group(db, "bench"), "deck", CARDS)
+db.close()
+print(f"{CARDS} cards, 4 answers each")
+
+for memory in (False, True):
+    with measure("whole deck, built and serialized", memory):
+        json.dumps(get_subject_cards_by_id(subject_id))
+
+with measure("first page of 500"):
+    first_page = get_subject_cards_page(subject_id, 0, 500)
+last_cursor = first_page["flashcards"][0]["flashcard_id"] + CARDS - 501
+with measure("page of 500 at the end of the deck"):
+    get_subject_cards_page(subject_id, last_cursor, 500)
+
+cards = iter_subject_cards(subject_id)
+with measure("stream, time to first card"):
+    json.dumps(next(cards))
+cards.close()
+
+for memory in (False, True):
+    with measure("stream, whole deck", memory):
+        for card in iter_subject_cards(subject_id):
+            json.dumps(card)
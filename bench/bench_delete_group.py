@@ -0,0 +1,49 @@
+"""
+Deleting a large group: subjects, flashcards, answers and finished games with their votes and chat
+
+Run: python bench/bench_delete_group.py [cards] [sessions]   (default 30000 cards, 3000 sessions)
+"""
+import sys
+import uuid
+
+from sqlalchemy import func, insert, select
+
+from common import count_arg, create_deck, create_group, create_users, measure, new_session
+
+from db_operations import delete_group, delete_subject_from_group
+from models import ChatMessage, Flashcard, GameState, QuizSession, SessionParticipant, Vote
+
+CARDS = count_arg(30000)
+SESSIONS = int(sys.argv[2]) if len(sys.argv) > 2 else 3000
+VOTES_PER_SESSION = 4
+
+db = new_session()
+user_id, = create_users(db, 1)
+group_id = create_group(db, "bench", [user_id])
+subject_ids = [create_deck(db, group_id, f"deck {n}", CARDS // 2) for n in range(2)]
+flashcard_ids = db.scalars(select(Flashcard.id).where(Flashcard.subject_id == subject_ids[0]).limit(VOTES_PER_SESSION)).all()
+session_ids = [str(uuid.uuid4()) for _ in range(SESSIONS)]
+db.execute(insert(QuizSession), [
+    {"id": session_id, "group_id": group_id, "subject_id": subject_ids[n % 2], "host_user_id": user_id, "status": "finished"}
+    for n, session_id in enumerate(session_ids)
+])
+db.execute(insert(GameState), [{"session_id": session_id, "status": "game_finished"} for session_id in session_ids])
+db.execute(insert(SessionParticipant), [{"session_id": session_id, "user_id": user_id} for session_id in session_ids])
+db.execute(insert(Vote), [
+    {"session_id": session_id, "flashcard_id": flashcard_id, "user_id": user_id}
+    for session_id in session_ids for flashcard_id in flashcard_ids
+])
+db.execute(insert(ChatMessage), [{"session_id": session_id, "user_id": user_id, "message": "gg"} for session_id in session_ids])
+db.commit()
+db.close()
+print(f"{CARDS} cards in 2 subjects, {SESSIONS} finished games")
+
+with measure("delete one subject"):
+    assert delete_subject_from_group("deck 0", group_id) == "Subject erfolgreich gelöscht"
+with measure("delete the group"):
+    assert delete_group("bench") is None
+
+db = new_session()
+left = {model.__tablename__: db.scalar(select(func.count()).select_from(model)) for model in (Flashcard, QuizSession, Vote)}
+db.close()
+print(f"rows left: {left}")
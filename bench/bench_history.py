@@ -0,0 +1,107 @@
+"""
+Game history pages and running totals next to a large number of archived games
+
+The history and the statistics only read game_summaries, player_games and game_stats, never the
+archive blobs, so those three tables are filled. Run: python bench/bench_history.py [games]   (default 1M)
+"""
+from datetime import datetime, timedelta
+import time
+
+from sqlalchemy import DateTime, bindparam, text
+
+from common import count_arg, measure, new_session
+
+from game_stats import decode_cursor, get_history_page, get_stats, record_game_stats
+from models import GameSummary, QuestionSummary
+
+GAMES = count_arg(1_000_000)
+USERS = 20000
+GROUPS = 100
+SUBJECTS = 1000
+PLAYERS = 4  # per game
+QUESTIONS = 10  # per game, for the totals update
+REPEAT = 200
+DEEP_PAGES = 5  # pages of 20 games to skip before timing a page deep in the history
+
+FILL_GAMES_SQL = text("""
+WITH RECURSIVE n(i) AS (SELECT :start UNION ALL SELECT i + 1 FROM n WHERE i < :stop)
+INSERT INTO game_summaries (session_id, group_id, subject_id, host_user_id, outcome, victory, total_score,
+                            max_possible_score, questions_total, questions_played, questions_correct,
+                            participant_count, started_at, ended_at)
+SELECT printf('game-%09d', i), i % :subjects % :groups + 1, i % :subjects + 1, i % :users + 1,
+       CASE WHEN i % 3 THEN 'lost' ELSE 'won' END, i % 3 = 0, 700, 1000, 10, 10, 7, :players,
+       datetime(:first, printf('+%d minutes', i)), datetime(:first, printf('+%d minutes', i + 15))
+FROM n
+""").bindparams(bindparam("first", type_=DateTime))
+
+FILL_PLAYERS_SQL = text("""
+WITH RECURSIVE n(i) AS (SELECT :start UNION ALL SELECT i + 1 FROM n WHERE i < :stop),
+     p(k) AS (SELECT 0 UNION ALL SELECT k + 1 FROM p WHERE k + 1 < :players)
+INSERT INTO player_games (user_id, session_id, ended_at)
+SELECT (i * :players + k) % :users + 1, printf('game-%09d', i), datetime(:first, printf('+%d minutes', i + 15))
+FROM n, p
+""").bindparams(bindparam("first", type_=DateTime))
+
+FILL_STATS_SQL = text("""
+WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < :count)
+INSERT INTO game_stats (scope, scope_id, games_played, games_won, questions_played, questions_correct,
+                        total_score, max_possible_score, votes_cast, votes_correct)
+SELECT :scope, i, 100, 30, 1000, 700, 70000, 100000, 1000, 700 FROM n
+""")
+
+db = new_session()
+first = datetime.utcnow() - timedelta(minutes=GAMES + 60)
+with measure(f"fill {GAMES} games"):
+    for start in range(0, GAMES, 100_000):
+        window = {"start": start + 1, "stop": min(start + 100_000, GAMES), "first": first}
+        db.execute(FILL_GAMES_SQL, {**window, "users": USERS, "groups": GROUPS, "subjects": SUBJECTS, "players": PLAYERS})
+        db.execute(FILL_PLAYERS_SQL, {**window, "users": USERS, "players": PLAYERS})
+        db.commit()
+    for scope, count in (("user", USERS), ("group", GROUPS), ("subject", SUBJECTS)):
+        db.execute(FILL_STATS_SQL, {"scope": scope, "count": count})
+    db.commit()
+print(f"{GAMES} games, {GAMES * PLAYERS // USERS} per player, {GAMES // GROUPS} per group, {GAMES // SUBJECTS} per subject")
+
+
+def per_call(label: str, call):
+    started = time.perf_counter()
+    for n in range(REPEAT):
+        call(n)
+    print(f"{label}: {(time.perf_counter() - started) / REPEAT * 1000:.2f} ms")
+
+
+def deep_cursor(scope: str, scope_id: int):
+    """Cursor and number of the DEEP_PAGES + 1st page (or the last one, in smaller runs), found by walking the history"""
+    cursor, page = None, 1
+    while page <= DEEP_PAGES:
+        next_cursor = get_history_page(db, scope, scope_id, cursor)["next_cursor"]
+        if next_cursor is None:
+            break
+        cursor, page = decode_cursor(next_cursor), page + 1
+    return cursor, page
+
+
+for scope, scope_ids in (("user", USERS), ("group", GROUPS), ("subject", SUBJECTS)):
+    per_call(f"{scope} history, first page", lambda n: get_history_page(db, scope, n % scope_ids + 1))
+    cursor, page = deep_cursor(scope, 1)
+    per_call(f"{scope} history, page {page}", lambda n: get_history_page(db, scope, 1, cursor))
+    per_call(f"{scope} totals", lambda n: get_stats(db, scope, n % scope_ids + 1))
+
+
+def record_game(n: int):
+    ended_at = datetime.utcnow()
+    summary = GameSummary(session_id=f"new-{n}", group_id=n % GROUPS + 1, subject_id=n % SUBJECTS + 1, victory=True,
+                          total_score=900, max_possible_score=1000, questions_played=QUESTIONS,
+                          questions_correct=9, ended_at=ended_at)
+    questions = [
+        QuestionSummary(flashcard_id=n * QUESTIONS + q + 1, correct_answer_id=1, was_correct=q > 0)
+        for q in range(QUESTIONS)
+    ]
+    players = [(n * PLAYERS + p) % USERS + 1 for p in range(PLAYERS)]
+    votes = [(user_id, question.flashcard_id, 1) for user_id in players for question in questions]
+    record_game_stats(db, summary, questions, players, votes)
+    db.commit()
+
+
+per_call(f"running totals of a finished game ({PLAYERS} players, {QUESTIONS} questions)", record_game)
+db.close()
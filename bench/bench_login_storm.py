@@ -0,0 +1,64 @@
+"""
+Event-loop lag during a login storm, with bcrypt on the password pool and inline on the loop
+
+Run: python bench/bench_login_storm.py [logins]   (default 30, bcrypt cost BCRYPT_ROUNDS or 10)
+"""
+import asyncio
+import os
+import time
+
+os.environ.setdefault("BCRYPT_ROUNDS", "10")
+
+from common import count_arg  # noqa: E402  sets up the database before the app is imported
+
+import httpx  # noqa: E402
+
+import app as app_module  # noqa: E402
+import auth  # noqa: E402
+
+LOGINS = count_arg(30)
+PROBE_INTERVAL = 0.01  # seconds
+
+
+async def probe_lag(stop: asyncio.Event, lags: list):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(time.perf_counter() - started - PROBE_INTERVAL)
+
+
+async def storm(client: httpx.AsyncClient, label: str):
+    stop, lags = asyncio.Event(), []
+    probe = asyncio.create_task(probe_lag(stop, lags))
+    started = time.perf_counter()
+    responses = await asyncio.gather(*[
+        client.post("/login", data={"username": f"user{n}", "password": "secret123"}) for n in range(LOGINS)
+    ])
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe
+    lags.sort()
+    ok = sum(response.status_code == 200 for response in responses)
+    print(f"{label}: {ok}/{LOGINS} logins in {elapsed:.2f} s, loop lag p50 {lags[len(lags) // 2] * 1000:.0f} ms, "
+          f"p99 {lags[int(len(lags) * 0.99)] * 1000:.0f} ms, max {lags[-1] * 1000:.0f} ms")
+
+
+async def main():
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app_module.app), base_url="http://bench") as client:
+        for n in range(LOGINS):
+            response = await client.post("/register", json={
+                "username": f"user{n}", "email": f"user{n}@example.com", "password": "secret123"
+            })
+            assert response.status_code == 200, response.text
+        print(f"{LOGINS} concurrent logins, bcrypt cost {auth.BCRYPT_ROUNDS}")
+
+        await storm(client, "password pool")
+
+        async def verify_inline(plain_password, hashed_password):
+            return auth.verify_password(plain_password, hashed_password)
+
+        app_module.verify_password_async = verify_inline
+        await storm(client, "inline bcrypt")
+
+
+asyncio.run(main())
@@ -0,0 +1,35 @@
+"""
+is_user_in_group for groups of 10, 1k and 10k members, from the database and from the membership cache
+
+Run: python bench/bench_membership.py
+"""
+import time
+
+from common import create_group, create_users, new_session
+
+from db_operations import _load_membership, is_user_in_group, membership_cache
+
+SIZES = (10, 1000, 10000)
+REPEAT = 200
+
+db = new_session()
+user_ids = create_users(db, max(SIZES))
+for size in SIZES:
+    create_group(db, f"group{size}", user_ids[:size])
+db.close()
+
+
+def per_call(check) -> float:
+    started = time.perf_counter()
+    for _ in range(REPEAT):
+        check()
+    return (time.perf_counter() - started) / REPEAT * 1e6
+
+
+for size in SIZES:
+    username, group = f"user{size - 1}", f"group{size}"
+    membership_cache.clear()
+    database = per_call(lambda: _load_membership(username, group))
+    cached = per_call(lambda: is_user_in_group(username, group))
+    outsider = per_call(lambda: is_user_in_group("nobody", group))
+    print(f"{size} members: query {database:.0f} us, cached {cached:.1f} us, non-member {outsider:.0f} us")
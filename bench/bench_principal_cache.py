@@ -0,0 +1,56 @@
+"""
+Authenticated request throughput with the principal cache on and off
+
+Requests go through the ASGI app in-process, round robin over USERS users with their own access
+tokens. /api/cache-stats does nothing but authenticate, /api/stats/me adds one query of its own.
+Run: python bench/bench_principal_cache.py [requests]   (default 5000 per case)
+"""
+import asyncio
+import os
+import time
+
+os.environ["CACHE_STATS_ENABLED"] = "1"
+
+import httpx  # noqa: E402
+
+from common import count_arg, create_users, new_session  # noqa: E402
+
+import app as app_module  # noqa: E402
+from auth import PRINCIPAL_CACHE_TTL, create_access_token, load_principal, principal_cache  # noqa: E402
+
+REQUESTS = count_arg(5000)
+USERS = 1000
+REPEAT = 20000
+
+db = new_session()
+create_users(db, USERS)
+db.close()
+usernames = [f"user{n}" for n in range(USERS)]
+headers = [{"Authorization": f"Bearer {create_access_token(data={'sub': username})}"} for username in usernames]
+
+
+def lookup_time() -> float:
+    started = time.perf_counter()
+    for n in range(REPEAT):
+        load_principal(usernames[n % USERS])
+    return (time.perf_counter() - started) / REPEAT * 1e6
+
+
+async def throughput(path: str) -> float:
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app_module.app), base_url="http://testserver") as client:
+        for n in range(USERS):  # warm the cache, if it is on
+            assert (await client.get(path, headers=headers[n])).status_code == 200
+        started = time.perf_counter()
+        for n in range(REQUESTS):
+            await client.get(path, headers=headers[n % USERS])
+        return REQUESTS / (time.perf_counter() - started)
+
+
+for label, ttl in (("cache on", PRINCIPAL_CACHE_TTL), ("cache off", -1)):
+    principal_cache.ttl = ttl  # a negative TTL expires every entry right away
+    principal_cache.clear()
+    lookup_time()
+    print(f"{label}: principal lookup {lookup_time():.1f} us, "
+          f"/api/cache-stats {asyncio.run(throughput('/api/cache-stats')):.0f} requests/s, "
+          f"/api/stats/me {asyncio.run(throughput('/api/stats/me')):.0f} requests/s")
+print(f"{USERS} users, {REQUESTS} requests per endpoint and case")
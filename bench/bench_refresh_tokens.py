@@ -0,0 +1,57 @@
+"""
+Refresh-token lookup, issue, rotation and pruning against a large refresh_tokens table
+
+Half of the generated rows are expired. Run: python bench/bench_refresh_tokens.py [rows]   (default 10M)
+"""
+from datetime import datetime, timedelta
+import time
+
+from sqlalchemy import DateTime, bindparam, func, select, text
+
+from common import count_arg, create_users, measure, new_session
+
+from auth import issue_refresh_token, prune_expired_refresh_tokens, rotate_refresh_token, validate_refresh_token
+from models import RefreshToken
+
+ROWS = count_arg(10_000_000)
+USERS = 50000
+REPEAT = 200
+
+FILL_SQL = text("""
+WITH RECURSIVE n(i) AS (SELECT :start UNION ALL SELECT i + 1 FROM n WHERE i < :stop)
+INSERT INTO refresh_tokens (token, user_id, expires_at, created_at)
+SELECT lower(hex(randomblob(32))), i % :users + 1, CASE WHEN i % 2 THEN :past ELSE :future END, :now FROM n
+""").bindparams(bindparam("past", type_=DateTime), bindparam("future", type_=DateTime), bindparam("now", type_=DateTime))
+
+db = new_session()
+user_ids = create_users(db, USERS)
+now = datetime.utcnow()
+with measure(f"fill {ROWS} rows"):
+    for start in range(0, ROWS, 1_000_000):
+        db.execute(FILL_SQL, {
+            "start": start + 1, "stop": min(start + 1_000_000, ROWS), "users": USERS,
+            "past": now - timedelta(days=1), "future": now + timedelta(days=3), "now": now
+        })
+        db.commit()
+print(f"{ROWS} rows, {ROWS // USERS} per user, half of them expired")
+
+
+def per_call(label: str, call):
+    started = time.perf_counter()
+    for n in range(REPEAT):
+        call(n)
+    print(f"{label}: {(time.perf_counter() - started) / REPEAT * 1000:.2f} ms")
+
+
+tokens = [issue_refresh_token(db, user_ids[n]) for n in range(REPEAT)]
+db.commit()
+per_call("lookup", lambda n: validate_refresh_token(tokens[n], db))
+per_call("issue with the per-user cap", lambda n: (issue_refresh_token(db, user_ids[n]), db.commit()))
+per_call("rotate", lambda n: rotate_refresh_token(tokens[n], db))
+db.close()
+
+with measure("prune expired rows"):
+    removed = prune_expired_refresh_tokens()
+db = new_session()
+print(f"pruned {removed} rows in batches of 1000, {db.scalar(select(func.count(RefreshToken.id)))} left")
+db.close()
@@ -0,0 +1,92 @@
+"""
+Flashcard search over a large synthetic corpus, FTS5 index against the LIKE fallback
+
+Questions and answers are drawn from a vocabulary of made-up words with a skewed frequency, so
+there are common and rare terms. Run: python bench/bench_search.py [cards]   (default 1M)
+"""
+import itertools
+import random
+import time
+
+from sqlalchemy import insert, text
+
+from common import INSERT_BATCH, count_arg, create_group, measure, new_session
+
+from database import engine
+from flashcard_search import INDEX_ROWS_SQL, fts_tables, index_flashcards, search_flashcards
+from models import Answer, Flashcard, Subject
+
+CARDS = count_arg(1_000_000)
+GROUPS = 100
+SUBJECTS = 10  # per group
+ANSWERS = 4  # per card
+VOCABULARY = 20000
+REPEAT = 50
+
+rng = random.Random(42)
+syllables = ["ka", "lo", "mi", "ne", "ru", "ta", "sche", "ber", "din", "gor", "fal", "wen", "tri", "zu"]
+words = sorted({"".join(rng.choices(syllables, k=rng.randint(2, 5))) for _ in range(VOCABULARY * 2)})[:VOCABULARY]
+cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(words))))  # Zipf: a few words are everywhere
+
+
+def sentence(length: int) -> str:
+    return " ".join(rng.choices(words, cum_weights=cum_weights, k=length))
+
+
+db = new_session()
+subjects = []
+for g in range(GROUPS):
+    group_id = create_group(db, f"group{g}")
+    subjects += [(group_id, subject_id) for subject_id in db.execute(insert(Subject).returning(Subject.id), [
+        {"name": f"subject{s}", "group_id": group_id} for s in range(SUBJECTS)
+    ]).scalars().all()]
+db.commit()
+
+with measure(f"fill {CARDS} cards"):
+    subject_cycle = itertools.cycle(subjects)
+    for start in range(0, CARDS, INSERT_BATCH):
+        flashcard_ids = db.execute(insert(Flashcard).returning(Flashcard.id), [
+            {"question": sentence(10), "subject_id": next(subject_cycle)[1]}
+            for _ in range(start, min(start + INSERT_BATCH, CARDS))
+        ]).scalars().all()
+        db.execute(insert(Answer), [
+            {"antwort": sentence(4), "is_correct": number == 0, "flashcard_id": flashcard_id}
+            for flashcard_id in flashcard_ids for number in range(ANSWERS)
+        ])
+        db.commit()
+with measure("build the full-text index"):
+    db.execute(text(INDEX_ROWS_SQL))
+    db.commit()
+print(f"{CARDS} cards of {ANSWERS} answers in {GROUPS * SUBJECTS} subjects of {GROUPS} groups, {len(words)} words")
+
+queries = {
+    "common word": words[:REPEAT],
+    "rare word": words[-REPEAT:],
+    "two words": [f"{words[n]} {words[n + 100]}" for n in range(REPEAT)],
+    "prefix": [words[n * 7][:3] for n in range(REPEAT)],
+}
+
+
+def per_query(label: str, texts: list, subject_scope: bool):
+    found = 0
+    started = time.perf_counter()
+    for n, search_text in enumerate(texts):
+        group_id, subject_id = subjects[n * 37 % len(subjects)]
+        found += len(search_flashcards(db, search_text, group_id, subject_id if subject_scope else None))
+    elapsed = (time.perf_counter() - started) / len(texts) * 1000
+    print(f"{label}: {elapsed:.2f} ms, {found / len(texts):.1f} results")
+
+
+for path, enabled in (("FTS5", True), ("LIKE", False)):
+    fts_tables[engine] = enabled
+    for scope in ("group", "subject"):
+        for kind, texts in queries.items():
+            per_query(f"{path}, {scope}, {kind}", texts[:REPEAT if enabled else 5], scope == "subject")
+fts_tables[engine] = True
+
+flashcard_id = db.query(Flashcard.id).filter(Flashcard.subject_id == subjects[0][1]).limit(1).scalar()
+with measure(f"reindex one card, {REPEAT} times"):
+    for _ in range(REPEAT):
+        index_flashcards(db, [flashcard_id])
+        db.commit()
+db.close()
@@ -0,0 +1,84 @@
+"""
+Bytes and throughput of a page load of the React build: precompressed copies, gzip per request, plain files
+
+A page load is index.html plus every bundle under static/. The requests go through the ASGI app
+in-process, so the numbers compare the work of the server, not a network.
+Run: python bench/bench_static_assets.py [page loads]   (default 200 per case)
+"""
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+
+import httpx
+
+from common import ROOT, count_arg
+
+from starlette.applications import Starlette
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.routing import Route
+
+import app as app_module
+from frontend_assets import ENCODINGS, FrontendBuild, frontend
+
+PAGE_LOADS = count_arg(200)
+BUILD = os.path.join(ROOT, "frontend", "build")
+
+frontend.directories = (BUILD,)
+frontend.load()
+page = ["index.html"] + sorted(
+    path for path in frontend.files
+    if path.startswith("static/") and path.endswith((".js", ".css"))
+)
+
+# The same build without its .br/.gz copies, compressed by middleware on every request instead
+plain_dir = tempfile.mkdtemp(prefix="teamquiz-bench-build-")
+shutil.copytree(BUILD, plain_dir, dirs_exist_ok=True,
+                ignore=shutil.ignore_patterns(*(f"*{suffix}" for _, suffix in ENCODINGS)))
+plain_build = FrontendBuild((plain_dir,))
+plain_build.load()
+
+
+async def serve_plain(request):
+    return plain_build.response(request.path_params["path"], request.headers)
+
+
+gzip_per_request = GZipMiddleware(Starlette(routes=[Route("/{path:path}", serve_plain)]), minimum_size=256)
+
+
+async def page_loads(asgi_app, accept_encoding: str) -> tuple:
+    """(bytes of one page load, page loads per second)"""
+    headers = {"Accept-Encoding": accept_encoding}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=asgi_app), base_url="http://testserver") as client:
+        async def load_page() -> int:
+            size = 0
+            for path in page:
+                # raw bytes: decoding them would put the client's decompression into the numbers
+                async with client.stream("GET", f"/{path}", headers=headers) as response:
+                    assert response.status_code == 200, path
+                    async for chunk in response.aiter_raw():
+                        size += len(chunk)
+            return size
+
+        size = await load_page()
+        started = time.perf_counter()
+        for _ in range(PAGE_LOADS):
+            await load_page()
+        return size, PAGE_LOADS / (time.perf_counter() - started)
+
+
+async def main():
+    print(f"page load: {len(page)} files, {PAGE_LOADS} page loads per case")
+    for label, asgi_app, accept_encoding in (
+        ("brotli, precompressed", app_module.app, "gzip, deflate, br"),
+        ("gzip, precompressed", app_module.app, "gzip, deflate"),
+        ("gzip, per request", gzip_per_request, "gzip, deflate"),
+        ("plain", app_module.app, "identity"),
+    ):
+        size, rate = await page_loads(asgi_app, accept_encoding)
+        print(f"{label}: {size / 1024:.0f} KiB per page load, {rate:.0f} page loads/s, {rate * len(page):.0f} requests/s")
+
+
+asyncio.run(main())
+shutil.rmtree(plain_dir, ignore_errors=True)
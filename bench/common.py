@@ -0,0 +1,97 @@
+"""
+Shared setup of the benchmark scripts: the backend on sys.path and a throwaway database
+
+Import this module before any backend module, it points TEST_DATABASE at a temporary file
+that is removed again when the script exits.
+"""
+from contextlib import contextmanager
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+_database_dir = tempfile.mkdtemp(prefix="teamquiz-bench-")
+atexit.register(shutil.rmtree, _database_dir, ignore_errors=True)
+os.environ["TEST_DATABASE"] = os.path.relpath(os.path.join(_database_dir, "bench.db"))
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+from sqlalchemy import insert  # noqa: E402
+
+import models  # noqa: E402,F401  registers the tables
+from database import SessionLocal, ensure_schema  # noqa: E402
+from flashcard_search import ensure_search_index  # noqa: E402
+from models import Answer, Flashcard, Group, Subject, User, UserGroupAssociation  # noqa: E402
+
+ensure_schema()
+ensure_search_index()
+
+INSERT_BATCH = 10000
+
+
+def count_arg(default: int) -> int:
+    """Size of the benchmark from the first command line argument"""
+    return int(sys.argv[1]) if len(sys.argv) > 1 else default
+
+
+@contextmanager
+def measure(label: str, memory: bool = False):
+    """Print the wall time of the block, or with memory=True the peak of its Python allocations.
+
+    Tracing allocations slows the block down several times, so the two are never measured together.
+    """
+    if memory:
+        tracemalloc.start()
+        yield
+        print(f"{label}: peak {tracemalloc.get_traced_memory()[1] / 2**20:.1f} MiB")
+        tracemalloc.stop()
+        return
+    started = time.perf_counter()
+    yield
+    print(f"{label}: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+
+def create_users(db, count: int, prefix: str = "user") -> list:
+    ids = []
+    for start in range(0, count, INSERT_BATCH):
+        ids += db.execute(insert(User).returning(User.id), [
+            {"username": f"{prefix}{n}", "email": f"{prefix}{n}@example.com", "password_hash": "x"}
+            for n in range(start, min(start + INSERT_BATCH, count))
+        ]).scalars().all()
+    db.commit()
+    return ids
+
+
+def create_group(db, name: str, user_ids=()) -> int:
+    group_id = db.execute(insert(Group).returning(Group.id), [{"name": name}]).scalar()
+    for start in range(0, len(user_ids), INSERT_BATCH):
+        db.execute(insert(UserGroupAssociation), [
+            {"user_id": user_id, "group_id": group_id} for user_id in user_ids[start:start + INSERT_BATCH]
+        ])
+    db.commit()
+    return group_id
+
+
+def create_deck(db, group_id: int, name: str, cards: int, answers: int = 4) -> int:
+    """A subject with cards flashcards of answers answers each, written with bulk inserts"""
+    subject_id = db.execute(insert(Subject).returning(Subject.id), [{"name": name, "group_id": group_id}]).scalar()
+    for start in range(0, cards, INSERT_BATCH):
+        flashcard_ids = db.execute(insert(Flashcard).returning(Flashcard.id), [
+            {"question": f"Frage {n} zu {name}", "subject_id": subject_id}
+            for n in range(start, min(start + INSERT_BATCH, cards))
+        ]).scalars().all()
+        db.execute(insert(Answer), [
+            {"antwort": f"Antwort {number} zu Karte {flashcard_id}", "is_correct": number == 0,
+             "flashcard_id": flashcard_id}
+            for flashcard_id in flashcard_ids for number in range(answers)
+        ])
+    db.commit()
+    return subject_id
+
+
+def new_session():
+    return SessionLocal()
@@ -30,4 +30,8 @@ fi
 
 cd ..
 
+# Write .br/.gz copies of the bundles for the backend to serve
+echo "Precompressing frontend build..."
+python backend/precompress.py frontend/build
+
 echo "Build completed successfully!"
\ No newline at end of file
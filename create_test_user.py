@@ -5,6 +5,7 @@ import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
 
+from database import ensure_schema
 from db_operations import create_user, is_username_taken
 from passlib.context import CryptContext
 
@@ -13,6 +14,8 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 def create_test_user():
     username = "Testbenutzer"
     password = "test123456"
+
+    ensure_schema()
     
     # Check if user already exists
     if is_username_taken(username):
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import { useAuth } from './AuthContext';
 import axios from './api/axios';
@@ -30,6 +30,20 @@ const Game = () => {
   const [isHost, setIsHost] = useState(false);
   const [websocket, setWebsocket] = useState(null);
   
+  // Version of the game state on screen. Host commands send it along, so a double click is applied
+  // only once: the second click still carries the old version and is rejected.
+  const [stateVersion, setStateVersion] = useState(0);
+  const rememberVersion = (version) => {
+    if (typeof version === 'number') {
+      setStateVersion(prev => Math.max(prev, version));
+    }
+  };
+  
+  // Last game event seen, sent on reconnect so the server only replays what we missed
+  const lastSeqRef = useRef(null);
+  const epochRef = useRef(null);
+  const unmountedRef = useRef(false);
+  
   // UI state
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
@@ -49,6 +63,7 @@ const Game = () => {
     setupWebSocket();
     
     return () => {
+      unmountedRef.current = true;
       if (websocket) {
         websocket.close();
       }
@@ -59,6 +74,7 @@ const Game = () => {
     try {
       const gameStateResponse = await axios.get(`/api/game/state/${sessionId}`);
       const gameData = gameStateResponse.data;
+      rememberVersion(gameData.version);
       
       // Update game state while preserving scores (WebSocket is authoritative)
       setGameState(prev => {
@@ -132,6 +148,37 @@ const Game = () => {
     }
   };
 
+  const applySnapshot = (snapshot) => {
+    const gameData = snapshot.game_state;
+    if (!gameData) return;
+    rememberVersion(gameData.version);
+    
+    setGameState(prev => (prev ? {
+      ...prev,
+      current_question_index: gameData.current_question_index,
+      current_flashcard_id: gameData.current_flashcard_id,
+      status: gameData.status,
+      total_score: gameData.total_score
+    } : gameData));
+    
+    if (gameData.current_question) {
+      setCurrentQuestion(gameData.current_question);
+      setShowResult(gameData.status === 'question_ended' || !!gameData.show_result);
+      if (gameData.question_result) {
+        setQuestionResult(gameData.question_result);
+      }
+    }
+    
+    setVotes(snapshot.votes || []);
+    setVoteCounts(snapshot.vote_counts || {});
+    setUserVote(snapshot.user_vote ?? null);
+    
+    if (snapshot.final_result) {
+      setGameResult(snapshot.final_result);
+      setShowFinalResult(true);
+    }
+  };
+
   const loadSessionData = async () => {
     try {
       setLoading(true);
@@ -150,6 +197,7 @@ const Game = () => {
       try {
         const gameStateResponse = await axios.get(`/api/game/state/${sessionId}`);
         const gameData = gameStateResponse.data;
+        rememberVersion(gameData.version);
         
         // Only update gameState if we don't have one, otherwise preserve WebSocket scores
         setGameState(prev => {
@@ -212,7 +260,9 @@ const Game = () => {
       console.log('Game WebSocket connected successfully!');
       ws.send(JSON.stringify({
         type: 'join_game',
-        session_id: sessionId
+        session_id: sessionId,
+        last_seq: lastSeqRef.current,
+        epoch: epochRef.current
       }));
     };
     
@@ -223,26 +273,47 @@ const Game = () => {
 
     ws.onmessage = (event) => {
       const message = JSON.parse(event.data);
+      if (message.seq !== undefined && message.type !== 'game_joined') {
+        lastSeqRef.current = message.seq;
+      }
       handleWebSocketMessage(message);
     };
 
     ws.onclose = () => {
       console.log('WebSocket disconnected');
+      if (!unmountedRef.current) {
+        setTimeout(setupWebSocket, 1000);
+      }
     };
 
     setWebsocket(ws);
   };
 
   const handleWebSocketMessage = (message) => {
+    rememberVersion(message.version);
     
     switch (message.type) {
       case 'game_joined':
         console.log('Successfully joined game');
-        // Reload game state to get current question if game already started
-        // Add small delay to ensure auto-join is complete
-        setTimeout(() => {
-          loadGameState();
-        }, 100);
+        epochRef.current = message.epoch;
+        if (message.resync === 'replay') {
+          // Reconnected: only apply the events we missed
+          message.events.forEach(missedEvent => {
+            lastSeqRef.current = missedEvent.seq;
+            handleWebSocketMessage(missedEvent);
+          });
+          lastSeqRef.current = message.seq;
+        } else if (message.resync === 'snapshot') {
+          applySnapshot(message.snapshot);
+          lastSeqRef.current = message.seq;
+        } else {
+          lastSeqRef.current = message.seq;
+          // Reload game state to get current question if game already started
+          // Add small delay to ensure auto-join is complete
+          setTimeout(() => {
+            loadGameState();
+          }, 100);
+        }
         break;
         
       case 'game_started':
@@ -315,10 +386,27 @@ const Game = () => {
     }
   };
 
+  // Returns false if the command was rejected as stale, the current state is reloaded then
+  const sendHostCommand = async (command) => {
+    try {
+      await axios.post(`/api/game/${command}/${sessionId}`, null, {
+        params: { expected_version: stateVersion }
+      });
+      return true;
+    } catch (err) {
+      if (err.response?.status === 409) {
+        console.log(`Host command ${command} rejected:`, err.response.data?.detail);
+        loadGameState();
+        return false;
+      }
+      throw err;
+    }
+  };
+
   const startGame = async () => {
     try {
       setLoading(true);
-      await axios.post(`/api/game/start/${sessionId}`);
+      await sendHostCommand('start');
     } catch (err) {
       console.error('Error starting game:', err);
       setError('Fehler beim Starten des Spiels');
@@ -366,7 +454,7 @@ const Game = () => {
     if (!isHost) return;
     
     try {
-      await axios.post(`/api/game/end-question/${sessionId}`);
+      await sendHostCommand('end-question');
       // WebSocket will handle updates
     } catch (err) {
       console.error('Error ending question:', err);
@@ -377,7 +465,7 @@ const Game = () => {
   const nextQuestion = async () => {
     if (!isHost) return;
     try {
-      await axios.post(`/api/game/next-question/${sessionId}`);
+      await sendHostCommand('next-question');
     } catch (err) {
       console.error('Error moving to next question:', err);
       setError('Fehler beim Wechsel zur nächsten Frage');
@@ -388,7 +476,7 @@ const Game = () => {
     if (!isHost) return;
     
     try {
-      await axios.post(`/api/game/end/${sessionId}`);
+      await sendHostCommand('end');
       // WebSocket will handle updates
     } catch (err) {
       console.error('Error ending game:', err);
@@ -0,0 +1,18 @@
+"""
+The tests run the app in-process against a throwaway SQLite database
+"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+
+# database.py builds a path relative to the working directory from TEST_DATABASE
+_database_dir = tempfile.mkdtemp(prefix="teamquiz-tests-")
+os.environ["TEST_DATABASE"] = os.path.relpath(os.path.join(_database_dir, "test.db"))
+
+import models  # noqa: E402,F401  registers the tables
+from database import ensure_schema  # noqa: E402
+
+ensure_schema()
@@ -0,0 +1,77 @@
+"""
+Shared setup for the API tests: users, a group with a deck, lobbies
+"""
+from typing import Awaitable, Callable, Dict, List
+import asyncio
+import uuid
+
+import httpx
+
+from app import app
+
+
+def run(test: Callable[[httpx.AsyncClient], Awaitable]):
+    """Run an async test body with a client talking to the app in-process"""
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://testserver") as client:
+            return await test(client)
+    return asyncio.run(main())
+
+
+def unique(prefix: str) -> str:
+    return f"{prefix}{uuid.uuid4().hex[:10]}"
+
+
+async def register(client: httpx.AsyncClient, username: str = None) -> Dict[str, str]:
+    username = username or unique("user")
+    response = await client.post("/register", json={"username": username, "email": f"{username}@example.org", "password": "secret123"})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def create_group(client: httpx.AsyncClient, host: Dict[str, str], cards: int = 3, members: List[str] = ()) -> tuple:
+    """A new group with one subject of cards flashcards; returns (group name, subject name)"""
+    group, subject = unique("group"), unique("subject")
+    assert (await client.post("/gruppe-erstellen", json={"gruppen_name": group}, headers=host)).status_code == 200
+    for number in range(cards):
+        response = await client.post("/flashcard/create", json={
+            "fach": subject, "gruppe": group, "frage": f"Frage {number}",
+            "antworten": [{"text": f"Antwort {letter}", "is_correct": letter == "a"} for letter in "abcd"]
+        }, headers=host)
+        assert response.status_code == 200, response.text
+    for member in members:
+        await client.post("/send-invitation", json={"gruppen_name": group, "username": member}, headers=host)
+    return group, subject
+
+
+async def create_lobby(client: httpx.AsyncClient, host: Dict[str, str], group: str, subject: str) -> str:
+    response = await client.post("/api/lobby/create", json={"subject_name": subject, "group_name": group}, headers=host)
+    assert response.status_code == 200, response.text
+    return response.json()["session"]["id"]
+
+
+async def game_version(client: httpx.AsyncClient, host: Dict[str, str], session_id: str) -> int:
+    response = await client.get(f"/api/game/state/{session_id}", headers=host)
+    assert response.status_code == 200, response.text
+    return response.json()["version"]
+
+
+async def host_command(client: httpx.AsyncClient, host: Dict[str, str], session_id: str, command: str,
+                       version: int = None) -> httpx.Response:
+    """POST start, end-question, next-question or end with the state version the host saw (0 before the start)"""
+    if version is None:
+        response = await client.get(f"/api/game/state/{session_id}", headers=host)
+        version = response.json()["version"] if response.status_code == 200 else 0
+    return await client.post(f"/api/game/{command}/{session_id}", params={"expected_version": version}, headers=host)
+
+
+async def play_game(client: httpx.AsyncClient, host: Dict[str, str], group: str, subject: str):
+    """A lobby of the host alone, played to the end without votes"""
+    session_id = await create_lobby(client, host, group, subject)
+    assert (await host_command(client, host, session_id, "start")).status_code == 200
+    for _ in range(10):
+        response = await host_command(client, host, session_id, "next-question")
+        assert response.status_code == 200, response.text
+        if response.json()["game_finished"]:
+            return
+    raise AssertionError("game did not finish")
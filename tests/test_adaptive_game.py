@@ -0,0 +1,32 @@
+"""
+Adaptive games: harder cards tend to come first, and a lost queue is rebuilt in the same order
+"""
+from difficulty_index import DifficultyIndex, _build_queue, adaptive_queues
+from helpers import create_group, create_lobby, host_command, register, run
+
+
+def test_hard_cards_tend_to_come_first():
+    index = DifficultyIndex({1: (10, 0), 2: (10, 10)})  # difficulty 11/12 and 1/12
+    hard_first = sum(_build_queue(index, [1, 2], seed)[0][1] == 1 for seed in range(200))
+    assert 160 < hard_first < 200  # expected 11/12 of the seeds
+
+
+def test_rebuilt_queue_asks_the_card_the_lost_one_would_have_asked():
+    async def body(client):
+        host = await register(client)
+        group, subject = await create_group(client, host, cards=5)
+        session_id = await create_lobby(client, host, group, subject)
+        started = await client.post(f"/api/game/start/{session_id}", params={"expected_version": 0, "adaptive": "true"},
+                                    headers=host)
+        assert started.status_code == 200, started.text
+        assert (await host_command(client, host, session_id, "end-question")).status_code == 200
+
+        expected = adaptive_queues.peek(session_id)
+        adaptive_queues.forget(session_id)  # as if another worker ran the game so far
+        assert (await host_command(client, host, session_id, "next-question")).status_code == 200
+        state = (await client.get(f"/api/game/state/{session_id}", headers=host)).json()
+        return expected, state["current_question"]["flashcard_id"]
+
+    expected, asked = run(body)
+    assert expected is not None
+    assert asked == expected
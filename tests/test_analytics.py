@@ -0,0 +1,51 @@
+"""
+Group analytics report: cached per finished game count, computed off the event loop
+"""
+import asyncio
+import time
+
+import group_analytics
+from helpers import create_group, play_game, register, run
+
+
+def test_report_follows_finished_games():
+    async def body(client):
+        host = await register(client)
+        outsider = await register(client)
+        group, subject = await create_group(client, host, cards=2)
+        url = f"/api/analytics/group/{group}"
+
+        assert (await client.get(url, headers=outsider)).status_code == 403
+        await play_game(client, host, group, subject)
+        first = (await client.get(url, headers=host)).json()["content"]
+        assert first["games"] == 1 and len(first["cards"]) == 2
+
+        await play_game(client, host, group, subject)
+        assert (await client.get(url, headers=host)).json()["content"]["games"] == 2
+    run(body)
+
+
+def test_report_does_not_block_the_event_loop(monkeypatch):
+    def slow_report(db, group_id, card_limit=20):
+        time.sleep(0.5)
+        return {"games": 0}
+
+    monkeypatch.setattr(group_analytics, "get_group_report", slow_report)
+
+    async def body(client):
+        host = await register(client)
+        group, _ = await create_group(client, host, cards=1)
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticking = asyncio.create_task(ticker())
+        response = await client.get(f"/api/analytics/group/{group}", headers=host)
+        ticking.cancel()
+        assert response.status_code == 200
+        assert ticks >= 20  # the loop kept running while the report was built
+    run(body)
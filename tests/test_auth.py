@@ -0,0 +1,66 @@
+"""
+Authentication: the principal cache is bounded by its TTL, the bcrypt pool sheds load, old hashes are upgraded
+"""
+import time
+
+import auth
+from auth import principal_cache
+from database import SessionLocal
+from helpers import register, run, unique
+from models import User
+
+
+def test_deleted_user_is_rejected_once_the_ttl_passed():
+    username = unique("user")
+
+    async def body(client):
+        headers = await register(client, username)
+        assert (await client.get("/me", headers=headers)).status_code == 200
+        assert username in principal_cache.entries
+
+        db = SessionLocal()
+        try:
+            db.query(User).filter(User.username == username).delete()
+            db.commit()
+        finally:
+            db.close()
+
+        # within the TTL the cached principal is still served
+        assert principal_cache.get(username) is not None
+        _, principal = principal_cache.entries[username]
+        principal_cache.entries[username] = (time.monotonic() - 1, principal)  # the TTL has passed
+        return (await client.get("/me", headers=headers)).status_code
+
+    assert run(body) == 401
+
+
+def test_logins_are_shed_when_the_password_pool_is_saturated(monkeypatch):
+    username = unique("user")
+
+    async def body(client):
+        await register(client, username)
+        monkeypatch.setattr(auth, "PASSWORD_HASH_MAX_PENDING", 0)
+        return await client.post("/login", data={"username": username, "password": "secret123"})
+
+    response = run(body)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "2"
+
+
+def test_login_rehashes_a_password_with_an_outdated_cost(monkeypatch):
+    username = unique("user")
+
+    async def body(client):
+        await register(client, username)
+        monkeypatch.setattr(auth, "BCRYPT_ROUNDS", auth.BCRYPT_ROUNDS + 1)
+        response = await client.post("/login", data={"username": username, "password": "secret123"})
+        assert response.status_code == 200, response.text
+
+    run(body)
+    db = SessionLocal()
+    try:
+        password_hash = db.query(User.password_hash).filter(User.username == username).scalar()
+    finally:
+        db.close()
+    assert password_hash.startswith(f"$2b${auth.BCRYPT_ROUNDS:02d}$")
+    assert auth.verify_password("secret123", password_hash)
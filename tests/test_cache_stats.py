@@ -0,0 +1,24 @@
+"""
+Cache internals are only served when a worker is started for debugging
+"""
+import app as app_module
+from helpers import register, run
+
+
+def test_cache_stats_are_hidden_by_default():
+    async def body(client):
+        host = await register(client)
+        assert (await client.get("/api/cache-stats", headers=host)).status_code == 404
+    run(body)
+
+
+def test_cache_stats_with_the_debug_flag(monkeypatch):
+    monkeypatch.setattr(app_module, "CACHE_STATS_ENABLED", True)
+
+    async def body(client):
+        assert (await client.get("/api/cache-stats")).status_code == 401
+        host = await register(client)
+        response = await client.get("/api/cache-stats", headers=host)
+        assert response.status_code == 200
+        assert "principals" in response.json()["content"]
+    run(body)
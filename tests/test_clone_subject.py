@@ -0,0 +1,46 @@
+"""
+Cloning a subject copies every flashcard with its own answers
+"""
+from database import SessionLocal
+from helpers import create_group, register, run
+from models import Flashcard, Group, Subject
+
+
+def _deck(group: str, subject: str) -> dict:
+    db = SessionLocal()
+    try:
+        cards = db.query(Flashcard).join(Subject).join(Group).filter(
+            Group.name == group, Subject.name == subject
+        ).order_by(Flashcard.id).all()
+        return {card.question: sorted((answer.antwort, answer.is_correct) for answer in card.answers) for card in cards}
+    finally:
+        db.close()
+
+
+def test_clone_keeps_answers_with_their_flashcards():
+    async def body(client):
+        host = await register(client)
+        group, subject = await create_group(client, host, cards=0)
+        for number in range(5):
+            response = await client.post("/flashcard/create", json={
+                "fach": subject, "gruppe": group, "frage": f"Frage {number}",
+                "antworten": [{"text": f"Antwort {number}{letter}", "is_correct": letter == "abcd"[number % 4]}
+                              for letter in "abcd"]
+            }, headers=host)
+            assert response.status_code == 200, response.text
+
+        response = await client.post("/fach-kopieren", json={
+            "fach_name": subject, "gruppen_name": group, "ziel_gruppen_name": group, "neuer_fach_name": "Kopie"
+        }, headers=host)
+        assert response.status_code == 200, response.text
+        repeated = await client.post("/fach-kopieren", json={
+            "fach_name": subject, "gruppen_name": group, "ziel_gruppen_name": group, "neuer_fach_name": "Kopie 2"
+        }, headers=host)
+        assert repeated.status_code == 200, repeated.text
+        return group, subject
+
+    group, subject = run(body)
+    original = _deck(group, subject)
+    assert len(original) == 5
+    assert _deck(group, "Kopie") == original
+    assert _deck(group, "Kopie 2") == original
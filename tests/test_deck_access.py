@@ -0,0 +1,24 @@
+"""
+Deck pages and streams are only for members of the subject's group
+"""
+import pytest
+
+from helpers import create_group, register, run
+
+DECK_ENDPOINTS = ("/get-subject-cards/page", "/get-subject-cards/stream")
+
+
+@pytest.mark.parametrize("endpoint", DECK_ENDPOINTS)
+def test_deck_requires_membership(endpoint):
+    async def body(client):
+        host = await register(client)
+        outsider = await register(client)
+        group, subject = await create_group(client, host, cards=2)
+        params = {"subjectname": subject, "gruppenname": group}
+
+        assert (await client.get(endpoint, params=params)).status_code == 401
+        assert (await client.get(endpoint, params=params, headers=outsider)).status_code == 403
+        response = await client.get(endpoint, params=params, headers=host)
+        assert response.status_code == 200
+        assert "Frage 1" in response.text
+    run(body)
@@ -0,0 +1,58 @@
+"""
+Deck import: duplicates are skipped, bad rows reported by line, Anki exports may carry extra fields
+"""
+import io
+import json
+
+from deck_import import parse_import_file
+from helpers import create_group, register, run
+
+
+async def import_file(client, headers, group, subject, name: str, content: str) -> dict:
+    response = await client.post("/flashcard/import", data={"fach": subject, "gruppe": group},
+                                 files={"file": (name, content.encode("utf-8"))}, headers=headers)
+    assert response.status_code == 200, response.text
+    return [json.loads(line) for line in response.text.splitlines()][-1]
+
+
+def test_csv_import_skips_duplicates_and_reports_bad_rows():
+    csv_file = "\n".join([
+        "Frage,Richtig,Falsch 1,Falsch 2,Falsch 3",
+        "Frage 0,a,b,c,d",  # already in the subject
+        "Neue Frage,a,b,c,d",
+        "neue frage ,e,f,g,h",  # earlier in the file
+        "Nur drei,Spalten,hier",
+        "Noch eine Frage,a,b,c,d",
+    ])
+
+    async def body(client):
+        host = await register(client)
+        group, subject = await create_group(client, host, cards=1)
+        return await import_file(client, host, group, subject, "deck.csv", csv_file)
+
+    summary = run(body)
+    assert summary["type"] == "summary"
+    assert (summary["processed"], summary["imported"], summary["duplicates"], summary["error_count"]) == (5, 2, 2, 1)
+    assert [error["row"] for error in summary["errors"]] == [5]
+
+
+def test_anki_import_ignores_metadata_and_extra_fields():
+    anki_file = "\n".join([
+        "#separator:tab",
+        "#html:false",
+        "Hauptstadt von Frankreich?\tParis\tLyon\tNizza\tLille\tgeografie europa",
+        "Hauptstadt von Italien?\tRom\tMailand\tTurin\tNeapel",
+        "Zu kurz\tA\tB",
+    ])
+
+    rows = list(parse_import_file(io.BytesIO(anki_file.encode("utf-8")), "anki"))
+    assert [(row_number, error is None) for row_number, _, error in rows] == [(3, True), (4, True), (5, False)]
+    assert [answer["text"] for answer in rows[0][1]["antworten"]] == ["Paris", "Lyon", "Nizza", "Lille"]
+
+    async def body(client):
+        host = await register(client)
+        group, subject = await create_group(client, host, cards=0)
+        return await import_file(client, host, group, subject, "deck.txt", anki_file)
+
+    summary = run(body)
+    assert (summary["imported"], summary["error_count"]) == (2, 1)
@@ -0,0 +1,54 @@
+"""
+Batch updates keep the rows of unchanged answers, so votes cast for them stay valid
+"""
+from database import SessionLocal
+from db_operations import apply_flashcard_batch
+from helpers import create_group, create_lobby, host_command, register, run
+from models import Answer, Flashcard, Vote
+
+
+def test_batch_update_keeps_answer_ids_and_votes():
+    async def body(client):
+        host = await register(client)
+        group, subject = await create_group(client, host, cards=1)
+        session_id = await create_lobby(client, host, group, subject)
+        assert (await host_command(client, host, session_id, "start")).status_code == 200
+        question = (await client.get(f"/api/game/state/{session_id}", headers=host)).json()["current_question"]
+        voted = question["answers"][1]
+        vote = {"session_id": session_id, "flashcard_id": question["flashcard_id"], "answer_id": voted["id"]}
+        assert (await client.post("/api/game/vote", json=vote, headers=host)).status_code == 200
+        return question["flashcard_id"]
+
+    flashcard_id = run(body)
+    db = SessionLocal()
+    try:
+        flashcard = db.get(Flashcard, flashcard_id)
+        subject_id = flashcard.subject_id
+        before = {answer.antwort: answer.id for answer in flashcard.answers}
+    finally:
+        db.close()
+
+    # new question text, answers reordered and one of them reworded
+    result = apply_flashcard_batch(subject_id, [{
+        "action": "update", "flashcard_id": flashcard_id, "frage": "Frage 0, neu formuliert",
+        "antworten": [
+            {"text": "Antwort d (neu)", "is_correct": False},
+            {"text": "Antwort c", "is_correct": False},
+            {"text": "Antwort b", "is_correct": False},
+            {"text": "Antwort a", "is_correct": True},
+        ]
+    }])
+    assert result["updated"] == 1
+
+    db = SessionLocal()
+    try:
+        after = {answer.antwort: answer.id for answer in db.query(Answer).filter(Answer.flashcard_id == flashcard_id)}
+        assert {text: after[text] for text in ("Antwort a", "Antwort b", "Antwort c")} == {
+            text: before[text] for text in ("Antwort a", "Antwort b", "Antwort c")
+        }
+        assert after["Antwort d (neu)"] == before["Antwort d"]  # reworded in place
+
+        vote = db.query(Vote).filter(Vote.flashcard_id == flashcard_id).one()
+        assert db.get(Answer, vote.answer_id).antwort == "Antwort b"
+    finally:
+        db.close()
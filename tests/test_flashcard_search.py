@@ -0,0 +1,56 @@
+"""
+Flashcards written without the app's startup still reach the full-text index; outdated indexes are rebuilt
+"""
+from sqlalchemy import text
+
+import flashcard_search
+from database import engine
+from helpers import create_group, register, run
+
+
+def test_writes_before_startup_are_indexed(monkeypatch):
+    with engine.begin() as connection:
+        if not connection.execute(text(flashcard_search.TABLE_EXISTS_SQL)).first():
+            connection.execute(text(flashcard_search.CREATE_INDEX_SQL))
+    monkeypatch.setattr(flashcard_search, "fts_tables", {})
+
+    async def body(client):
+        host = await register(client)
+        group, subject = await create_group(client, host, cards=2)
+        response = await client.get("/flashcard/search", params={"q": "Frage", "gruppenname": group}, headers=host)
+        assert response.status_code == 200
+        return group, response.json()["content"]
+
+    group, content = run(body)
+    assert flashcard_search.fts_tables == {engine: True}
+    with engine.connect() as connection:
+        indexed = connection.execute(text(
+            "SELECT count(*) FROM flashcard_search WHERE flashcard_search MATCH :query"
+        ), {"query": f'scope : "g{_group_id(connection, group)}"'}).scalar()
+    assert indexed == 2
+    assert content
+
+
+def _group_id(connection, group: str) -> int:
+    return connection.execute(text("SELECT id FROM groups WHERE name = :name"), {"name": group}).scalar()
+
+
+def test_index_with_an_older_definition_is_rebuilt():
+    old_definition = flashcard_search.CREATE_INDEX_SQL.replace(", prefix = '3 4 5 6'", "")
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE IF EXISTS flashcard_search"))
+        connection.execute(text(old_definition))
+        connection.execute(text(flashcard_search.INDEX_ROWS_SQL))
+
+    assert flashcard_search.ensure_search_index() == "fts5"
+    with engine.connect() as connection:
+        stored = connection.execute(text(flashcard_search.TABLE_DEFINITION_SQL)).scalar()
+        indexed = connection.execute(text("SELECT count(*) FROM flashcard_search")).scalar()
+        flashcards = connection.execute(text("SELECT count(*) FROM flashcards")).scalar()
+    assert "prefix = '3 4 5 6'" in stored
+    assert indexed == flashcards
+
+
+def test_short_words_are_not_prefix_terms():
+    assert flashcard_search.build_match_query("Rom ist", 7) == '{question answers} : ("Rom"* "ist"*) AND scope : "g7"'
+    assert flashcard_search.build_match_query("Es war", 7, 3) == '{question answers} : ("Es" "war"*) AND scope : "s3"'
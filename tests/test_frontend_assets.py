@@ -0,0 +1,51 @@
+"""
+Frontend build: the precompressed copy follows Accept-Encoding, caches are told with Vary
+"""
+import os
+
+from frontend_assets import FrontendBuild, choose_encoding
+
+BUNDLE = "static/js/main.07818dc5.js"
+
+
+def test_choose_encoding_follows_accept_encoding():
+    available = ("br", "gzip")
+    assert choose_encoding("gzip, deflate, br", available) == "br"
+    assert choose_encoding("gzip, deflate", available) == "gzip"
+    assert choose_encoding("br;q=0, gzip", available) == "gzip"
+    assert choose_encoding("br;q=0, gzip;q=0", available) is None
+    assert choose_encoding("*", available) == "br"
+    assert choose_encoding("identity", available) is None
+
+
+def test_build_serves_the_accepted_copy(tmp_path):
+    os.makedirs(tmp_path / "static" / "js")
+    (tmp_path / "index.html").write_text("<html></html>")
+    bundle = tmp_path / BUNDLE
+    bundle.write_bytes(b"console.log('plain')")
+    (tmp_path / (BUNDLE + ".br")).write_bytes(b"brotli copy")
+    (tmp_path / (BUNDLE + ".gz")).write_bytes(b"gzip copy")
+
+    build = FrontendBuild(directories=(str(tmp_path),))
+    assert build.load() == 2
+
+    def get(path, **headers):
+        return build.response(path, {name.replace("_", "-"): value for name, value in headers.items()})
+
+    brotli = get(BUNDLE, accept_encoding="gzip, br")
+    assert (brotli.body, brotli.headers["content-encoding"], brotli.headers["vary"]) == (
+        b"brotli copy", "br", "Accept-Encoding"
+    )
+    gzip = get(BUNDLE, accept_encoding="gzip")
+    assert (gzip.body, gzip.headers["content-encoding"]) == (b"gzip copy", "gzip")
+    plain = get(BUNDLE)
+    assert plain.body == b"console.log('plain')"
+    assert "content-encoding" not in plain.headers and plain.headers["vary"] == "Accept-Encoding"
+    assert len({brotli.headers["etag"], gzip.headers["etag"], plain.headers["etag"]}) == 3
+
+    assert get(BUNDLE, accept_encoding="br", if_none_match=brotli.headers["etag"]).status_code == 304
+    assert get(BUNDLE, accept_encoding="gzip", if_none_match=brotli.headers["etag"]).status_code == 200
+
+    page = get("lobby/abc", accept_encoding="br")  # client-side route, no precompressed index.html
+    assert page.body == b"<html></html>" and "vary" not in page.headers
+    assert get("static/js/missing.js") is None
@@ -0,0 +1,37 @@
+"""
+The journal holds every change of the game state, so replaying it gives the stored state back
+"""
+from database import SessionLocal
+from game_journal import STATE_COLUMNS, replay_game_state
+from helpers import create_group, create_lobby, host_command, register, run
+from models import GameState
+
+
+def test_journal_replays_into_the_stored_game_state(monkeypatch):
+    monkeypatch.setattr("game_journal.SNAPSHOT_INTERVAL", 3)  # the replay starts from a snapshot
+
+    async def body(client):
+        host = await register(client)
+        group, subject = await create_group(client, host, cards=3)
+        session_id = await create_lobby(client, host, group, subject)
+        assert (await host_command(client, host, session_id, "start")).status_code == 200
+        question = (await client.get(f"/api/game/state/{session_id}", headers=host)).json()["current_question"]
+        vote = {"session_id": session_id, "flashcard_id": question["flashcard_id"], "answer_id": question["answers"][0]["id"]}
+        assert (await client.post("/api/game/vote", json=vote, headers=host)).status_code == 200
+        for command in ("end-question", "next-question", "end-question", "next-question", "end"):
+            assert (await host_command(client, host, session_id, command)).status_code == 200
+        return session_id
+
+    session_id = run(body)
+    db = SessionLocal()
+    try:
+        stored = db.query(GameState).filter(GameState.session_id == session_id).one()
+        replayed = replay_game_state(db, session_id)
+        assert replayed == {column: getattr(stored, column) for column in STATE_COLUMNS}
+        assert replayed["status"] == "game_finished"
+
+        started = replay_game_state(db, session_id, version=1)
+        assert started["status"] == "question_active"
+        assert started["current_question_index"] == 0
+    finally:
+        db.close()
@@ -0,0 +1,94 @@
+"""
+Host commands on one game issued against the same state: exactly one of them may win, the others get 409
+"""
+import asyncio
+
+from helpers import create_group, create_lobby, game_version, host_command, register, run
+
+CONCURRENT_COMMANDS = 5
+
+
+async def started_game(client, cards: int = 3):
+    host = await register(client)
+    group, subject = await create_group(client, host, cards=cards)
+    session_id = await create_lobby(client, host, group, subject)
+    assert (await host_command(client, host, session_id, "start")).status_code == 200
+    return host, session_id
+
+
+def status_codes(responses) -> list:
+    return sorted(response.status_code for response in responses)
+
+
+def test_double_start_starts_once():
+    async def body(client):
+        host = await register(client)
+        group, subject = await create_group(client, host)
+        session_id = await create_lobby(client, host, group, subject)
+        responses = await asyncio.gather(*(
+            host_command(client, host, session_id, "start") for _ in range(CONCURRENT_COMMANDS)
+        ))
+        assert status_codes(responses) == [200] + [409] * (CONCURRENT_COMMANDS - 1)
+    run(body)
+
+
+def test_double_next_advances_once():
+    async def body(client):
+        host, session_id = await started_game(client)
+        version = await game_version(client, host, session_id)
+        responses = await asyncio.gather(*(
+            client.post(f"/api/game/next-question/{session_id}", params={"expected_version": version}, headers=host)
+            for _ in range(CONCURRENT_COMMANDS)
+        ))
+        assert status_codes(responses) == [200] + [409] * (CONCURRENT_COMMANDS - 1)
+        state = (await client.get(f"/api/game/state/{session_id}", headers=host)).json()
+        assert state["current_question_index"] == 1
+    run(body)
+
+
+def test_sequential_double_click_advances_once():
+    async def body(client):
+        host, session_id = await started_game(client)
+        version = await game_version(client, host, session_id)
+        first = await host_command(client, host, session_id, "next-question", version)
+        second = await host_command(client, host, session_id, "next-question", version)
+        assert (first.status_code, second.status_code) == (200, 409)
+        assert first.json()["version"] == await game_version(client, host, session_id)
+        state = (await client.get(f"/api/game/state/{session_id}", headers=host)).json()
+        assert state["current_question_index"] == 1
+    run(body)
+
+
+def test_host_commands_without_version_are_rejected():
+    async def body(client):
+        host, session_id = await started_game(client)
+        for command in ("end-question", "next-question", "end"):
+            response = await client.post(f"/api/game/{command}/{session_id}", headers=host)
+            assert response.status_code == 409
+        assert (await client.get(f"/api/game/state/{session_id}", headers=host)).json()["current_question_index"] == 0
+    run(body)
+
+
+def test_end_and_next_race_has_one_winner():
+    async def body(client):
+        host, session_id = await started_game(client)
+        version = await game_version(client, host, session_id)
+        params = {"expected_version": version}
+        responses = await asyncio.gather(
+            client.post(f"/api/game/end/{session_id}", params=params, headers=host),
+            client.post(f"/api/game/next-question/{session_id}", params=params, headers=host),
+            client.post(f"/api/game/end/{session_id}", params=params, headers=host),
+            client.post(f"/api/game/next-question/{session_id}", params=params, headers=host),
+        )
+        assert status_codes(responses) == [200, 409, 409, 409]
+    run(body)
+
+
+def test_finished_game_cannot_be_restarted():
+    async def body(client):
+        host, session_id = await started_game(client)
+        assert (await host_command(client, host, session_id, "end")).status_code == 200
+        response = await host_command(client, host, session_id, "start")
+        assert response.status_code == 409
+        assert response.json()["detail"] == "Das Spiel ist bereits beendet"
+    run(body)
@@ -0,0 +1,66 @@
+"""
+Reconnecting game clients get the events they missed, or a snapshot if those are gone
+"""
+import asyncio
+
+from starlette.testclient import TestClient
+
+import websocket_manager
+from app import app
+from helpers import create_group, create_lobby, host_command, register, run
+from websocket_manager import ConnectionManager, manager
+
+
+def _broadcast(connections: ConnectionManager, session_id: str, count: int):
+    async def main():
+        for number in range(count):
+            await connections.broadcast_to_group(f"game_{session_id}", {"type": "new_question", "number": number})
+    asyncio.run(main())
+
+
+def test_missed_events_are_replayed_from_the_buffer():
+    connections = ConnectionManager()
+    _broadcast(connections, "s", 3)
+
+    missed = connections.get_missed_game_events("s", 1, connections.epoch)
+    assert [event["seq"] for event in missed] == [2, 3]
+    assert connections.get_missed_game_events("s", 3, connections.epoch) == []
+
+
+def test_gaps_the_buffer_cannot_fill_need_a_snapshot(monkeypatch):
+    monkeypatch.setattr(websocket_manager, "GAME_EVENT_BUFFER_SIZE", 2)
+    connections = ConnectionManager()
+    _broadcast(connections, "s", 4)
+
+    assert connections.get_missed_game_events("s", 1, connections.epoch) is None  # event 2 fell out
+    assert [event["seq"] for event in connections.get_missed_game_events("s", 2, connections.epoch)] == [3, 4]
+    assert connections.get_missed_game_events("s", 5, connections.epoch) is None  # from before a restart
+    assert connections.get_missed_game_events("s", 2, "other-process") is None
+
+
+def test_join_game_replays_or_sends_a_snapshot():
+    async def body(client):
+        host = await register(client)
+        group, subject = await create_group(client, host, cards=2)
+        session_id = await create_lobby(client, host, group, subject)
+        assert (await host_command(client, host, session_id, "start")).status_code == 200
+        assert (await host_command(client, host, session_id, "end-question")).status_code == 200
+        return host["Authorization"].split()[1], session_id
+
+    token, session_id = run(body)
+    current_seq = manager.get_game_sequence(session_id)
+    assert current_seq >= 2
+
+    with TestClient(app).websocket_connect(f"/ws/{token}") as websocket:
+        websocket.send_json({"type": "join_game", "session_id": session_id,
+                             "last_seq": current_seq - 1, "epoch": manager.epoch})
+        joined = websocket.receive_json()
+        assert joined["resync"] == "replay"
+        assert [event["seq"] for event in joined["events"]] == [current_seq]
+        assert joined["events"][0]["type"] == "question_ended"
+
+        websocket.send_json({"type": "join_game", "session_id": session_id, "last_seq": current_seq, "epoch": "stale"})
+        joined = websocket.receive_json()
+        assert joined["resync"] == "snapshot"
+        assert joined["snapshot"]["game_state"]["status"] == "question_ended"
+        assert joined["seq"] == current_seq
@@ -0,0 +1,92 @@
+"""
+Conditional GETs of the game state: never stale once a change is broadcast, bounded memory
+"""
+from database import SessionLocal
+from game_state_cache import GameStateCache, game_state_cache
+from models import GameState
+from helpers import create_group, create_lobby, host_command, register, run
+from websocket_manager import manager
+
+
+def test_state_is_fresh_while_the_change_is_broadcast(monkeypatch):
+    async def body(client):
+        host = await register(client)
+        group, subject = await create_group(client, host, cards=3)
+        session_id = await create_lobby(client, host, group, subject)
+        assert (await host_command(client, host, session_id, "start")).status_code == 200
+        before = await client.get(f"/api/game/state/{session_id}", headers=host)
+
+        seen = []
+
+        async def refetching_broadcast(group_name, message):
+            # what a client does when it receives the broadcast
+            seen.append(await client.get(f"/api/game/state/{session_id}", headers={
+                **host, "If-None-Match": before.headers["etag"]
+            }))
+
+        monkeypatch.setattr(manager, "broadcast_to_group", refetching_broadcast)
+        assert (await host_command(client, host, session_id, "next-question")).status_code == 200
+
+        assert seen and all(response.status_code == 200 for response in seen)
+        assert seen[-1].json()["current_question_index"] == 1
+    run(body)
+
+
+def test_finished_games_are_dropped():
+    async def body(client):
+        host = await register(client)
+        group, subject = await create_group(client, host, cards=1)
+        session_id = await create_lobby(client, host, group, subject)
+        assert (await host_command(client, host, session_id, "start")).status_code == 200
+        await client.get(f"/api/game/state/{session_id}", headers=host)
+        assert session_id in game_state_cache.entries
+
+        assert (await host_command(client, host, session_id, "end")).status_code == 200
+        assert session_id not in game_state_cache.entries
+    run(body)
+
+
+def test_writes_by_another_worker_are_not_served_as_304():
+    async def body(client):
+        host = await register(client)
+        group, subject = await create_group(client, host, cards=2)
+        session_id = await create_lobby(client, host, group, subject)
+        assert (await host_command(client, host, session_id, "start")).status_code == 200
+        before = await client.get(f"/api/game/state/{session_id}", headers=host)
+
+        db = SessionLocal()
+        try:
+            db.query(GameState).filter(GameState.session_id == session_id).update(
+                {"status": "question_ended", "version": GameState.version + 1}
+            )
+            db.commit()
+        finally:
+            db.close()
+
+        after = await client.get(f"/api/game/state/{session_id}", headers={**host, "If-None-Match": before.headers["etag"]})
+        assert after.status_code == 200
+        assert after.json()["status"] == "question_ended"
+    run(body)
+
+
+def test_votes_after_the_question_ended_are_rejected():
+    async def body(client):
+        host = await register(client)
+        group, subject = await create_group(client, host, cards=2)
+        session_id = await create_lobby(client, host, group, subject)
+        assert (await host_command(client, host, session_id, "start")).status_code == 200
+        question = (await client.get(f"/api/game/state/{session_id}", headers=host)).json()["current_question"]
+        vote = {"session_id": session_id, "flashcard_id": question["flashcard_id"], "answer_id": question["answers"][0]["id"]}
+        assert (await client.post("/api/game/vote", json=vote, headers=host)).status_code == 200
+
+        assert (await host_command(client, host, session_id, "end-question")).status_code == 200
+        assert (await client.post("/api/game/vote", json=vote, headers=host)).status_code == 409
+    run(body)
+
+
+def test_cache_is_bounded():
+    cache = GameStateCache(maxsize=2)
+    for session_id in ("a", "b", "c"):
+        cache.store(session_id, cache.etag(session_id, 1, 1), b"{}")
+    assert list(cache.entries) == ["b", "c"]
+    assert cache.get("b", cache.etag("b", 2, 1)) is None
@@ -0,0 +1,22 @@
+"""
+Game statistics: every finished game is added to the totals of its players, group and subject
+"""
+from helpers import create_group, play_game, register, run
+
+
+def test_totals_count_every_finished_game():
+    async def body(client):
+        host = await register(client)
+        group, subject = await create_group(client, host, cards=2)
+        for _ in range(2):
+            await play_game(client, host, group, subject)
+
+        mine = (await client.get("/api/stats/me", headers=host)).json()["content"]["stats"]
+        group_stats = (await client.get(f"/api/stats/group/{group}", headers=host)).json()["content"]["stats"]
+        subject_stats = (await client.get(f"/api/stats/group/{group}", params={"subjectname": subject},
+                                          headers=host)).json()["content"]["stats"]
+        return mine, group_stats, subject_stats
+
+    mine, group_stats, subject_stats = run(body)
+    assert mine["games_played"] == group_stats["games_played"] == subject_stats["games_played"] == 2
+    assert group_stats["questions_played"] == 4
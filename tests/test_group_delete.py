@@ -0,0 +1,44 @@
+"""
+Deleting a group or subject runs in the database, however many sessions hang off it
+"""
+import uuid
+
+from sqlalchemy import func, insert
+
+from database import SessionLocal
+from db_operations import delete_group
+from helpers import create_group, register, run
+from models import Flashcard, Group, QuizSession, Subject
+
+SESSION_COUNT = 260000  # more bound parameters than SQLite allows per statement (32766 by default, 250000 in distro builds)
+
+
+def test_delete_group_with_more_sessions_than_bound_parameters():
+    async def body(client):
+        host = await register(client)
+        group, subject = await create_group(client, host, cards=2)
+        return group
+
+    group = run(body)
+    db = SessionLocal()
+    try:
+        group_id = db.query(Group.id).filter(Group.name == group).scalar()
+        subject_id = db.query(Subject.id).filter(Subject.group_id == group_id).scalar()
+        db.execute(insert(QuizSession), [
+            {"id": str(uuid.uuid4()), "group_id": group_id, "subject_id": subject_id if n < 100 else None,
+             "status": "finished"}
+            for n in range(SESSION_COUNT)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+    assert delete_group(group) is None
+
+    db = SessionLocal()
+    try:
+        assert db.query(func.count(QuizSession.id)).filter(QuizSession.group_id == group_id).scalar() == 0
+        assert db.query(func.count(Flashcard.id)).filter(Flashcard.subject_id == subject_id).scalar() == 0
+        assert db.query(Group.id).filter(Group.id == group_id).first() is None
+    finally:
+        db.close()
@@ -0,0 +1,52 @@
+"""
+The group overview keeps the shape it had when it was built from the ORM relationships
+"""
+from database import SessionLocal
+from db_operations import get_group
+from helpers import create_group, create_lobby, register, run
+from models import Group, UserGroupAssociation
+
+
+def test_group_overview_matches_the_relationships():
+    async def body(client):
+        host = await register(client)
+        group, subject = await create_group(client, host, cards=2)
+        for number in range(3):
+            await client.post("/flashcard/create", json={
+                "fach": "Zweites Fach", "gruppe": group, "frage": f"Frage {number}",
+                "antworten": [{"text": f"Antwort {letter}", "is_correct": letter == "a"} for letter in "abcd"]
+            }, headers=host)
+        await create_lobby(client, host, group, subject)
+        member_ids = []
+        for _ in range(2):
+            member = await register(client)
+            member_ids.append((await client.get("/me", headers=member)).json()["id"])
+        return group, member_ids
+
+    group, member_ids = run(body)
+    db = SessionLocal()
+    try:
+        group_row = db.query(Group).filter(Group.name == group).one()
+        db.add_all(UserGroupAssociation(user_id=user_id, group_id=group_row.id) for user_id in member_ids)
+        db.commit()
+        db.refresh(group_row)
+        # what get_group returned before it was rewritten as aggregate queries
+        baseline = {
+            "name": group,
+            "id": group_row.id,
+            "users": [association.user.username for association in group_row.group_users],
+            "subjects": [subject.name for subject in group_row.subjects],
+        }
+        flashcard_counts = [len(subject.flashcards) for subject in group_row.subjects]
+    finally:
+        db.close()
+
+    overview = get_group(group)
+    assert {key: overview[key] for key in baseline} == baseline
+    assert overview["subject_details"] == [
+        {"name": name, "flashcard_count": count} for name, count in zip(baseline["subjects"], flashcard_counts)
+    ]
+    assert flashcard_counts == [2, 3]
+    assert overview["member_count"] == 3
+    assert overview["active_lobbies"] == 1
+    assert get_group("keine-solche-gruppe") == "Gruppe wurde nicht gefunden"
@@ -0,0 +1,85 @@
+"""
+Maintenance jobs work in the database on a thread and clean shared in-memory state on the loop
+"""
+from datetime import datetime, timedelta
+import sqlite3
+import threading
+
+from sqlalchemy import create_engine, event
+
+import database
+from database import AUTO_VACUUM_INCREMENTAL, INCREMENTAL_VACUUM_PAGES, SessionLocal, engine, sqlite_housekeeping
+from helpers import create_group, create_lobby, register, run
+from maintenance import maintenance
+from models import QuizSession
+from session_access import session_access
+
+
+def test_expired_sessions_are_forgotten_on_the_loop_thread(monkeypatch):
+    forgotten = []
+    original_forget = session_access.forget
+
+    def recording_forget(session_id):
+        forgotten.append((session_id, threading.get_ident()))
+        original_forget(session_id)
+
+    monkeypatch.setattr(session_access, "forget", recording_forget)
+    job = next(job for job in maintenance.jobs if job.name == "expire_abandoned_sessions")
+
+    async def body(client):
+        host = await register(client)
+        group, subject = await create_group(client, host, cards=1)
+        session_id = await create_lobby(client, host, group, subject)
+        db = SessionLocal()
+        try:
+            db.query(QuizSession).filter(QuizSession.id == session_id).update(
+                {"created_at": datetime.utcnow() - timedelta(days=30)}
+            )
+            db.commit()
+        finally:
+            db.close()
+
+        await maintenance.run_job(job)
+        assert (session_id, threading.get_ident()) in forgotten
+    run(body)
+
+
+def test_sqlite_housekeeping_returns_free_pages():
+    with engine.begin() as connection:
+        assert connection.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert connection.exec_driver_sql("PRAGMA auto_vacuum").scalar() == AUTO_VACUUM_INCREMENTAL
+        connection.exec_driver_sql("CREATE TABLE scratch (payload BLOB)")
+        for _ in range(INCREMENTAL_VACUUM_PAGES + 50):
+            connection.exec_driver_sql("INSERT INTO scratch VALUES (randomblob(3000))")
+        connection.exec_driver_sql("DROP TABLE scratch")
+
+    done = sqlite_housekeeping()
+    assert done["incremental_vacuum"] == INCREMENTAL_VACUUM_PAGES
+    assert "wal_checkpoint" in done
+
+
+def test_older_databases_are_vacuumed_once(tmp_path, monkeypatch):
+    path = tmp_path / "old.db"
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE cards (question TEXT)")
+    connection.commit()
+    connection.close()
+
+    old_engine = create_engine(f"sqlite:///{path}")
+    event.listen(old_engine, "connect", database._configure_sqlite)
+    monkeypatch.setattr(database, "engine", old_engine)
+    assert database.ensure_incremental_vacuum() is True
+    assert database.ensure_incremental_vacuum() is False
+    with old_engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA auto_vacuum").scalar() == AUTO_VACUUM_INCREMENTAL
+    old_engine.dispose()
+
+
+def test_schema_check_is_skipped_while_the_models_are_unchanged():
+    database.ensure_schema()
+    assert database.ensure_schema() is False
+
+    with engine.begin() as connection:
+        connection.execute(database.schema_version.delete())
+    assert database.ensure_schema() is True
+    assert database.ensure_schema() is False
@@ -0,0 +1,29 @@
+"""
+Name-to-id lookups forget renamed and deleted subjects and groups right away
+"""
+from db_operations import (
+    _lookup_group_id, _lookup_subject_id, delete_group, delete_subject_from_group, update_subject_name
+)
+from helpers import create_group, register, run, unique
+
+
+def test_renamed_and_deleted_names_are_not_served_from_the_cache():
+    async def body(client):
+        host = await register(client)
+        return await create_group(client, host, cards=1)
+
+    group, subject = run(body)
+    group_id = _lookup_group_id(group)
+    subject_id = _lookup_subject_id(subject, group_id)
+    assert subject_id is not None
+
+    renamed = unique("subject")
+    assert update_subject_name(subject, renamed, group_id) == "Subject erfolgreich umbenannt"
+    assert _lookup_subject_id(subject, group_id) is None
+    assert _lookup_subject_id(renamed, group_id) == subject_id
+
+    assert delete_subject_from_group(renamed, group_id) == "Subject erfolgreich gelöscht"
+    assert _lookup_subject_id(renamed, group_id) is None
+
+    assert delete_group(group) is None
+    assert _lookup_group_id(group) is None
@@ -0,0 +1,74 @@
+"""
+The session access cache forgets finished games, follows host changes and stays bounded
+"""
+import uuid
+
+from database import SessionLocal
+from helpers import create_group, create_lobby, host_command, register, run
+from models import SessionParticipant
+from session_access import SessionAccessCache, session_access
+
+
+def test_finished_games_are_forgotten():
+    async def body(client):
+        host = await register(client)
+        group, subject = await create_group(client, host, cards=1)
+        session_id = await create_lobby(client, host, group, subject)
+        assert (await host_command(client, host, session_id, "start")).status_code == 200
+        await client.get(f"/api/game/state/{session_id}", headers=host)
+        assert session_id in session_access.entries.entries
+
+        assert (await host_command(client, host, session_id, "end")).status_code == 200
+        assert session_id not in session_access.entries.entries
+    run(body)
+
+
+def test_entries_are_bounded(monkeypatch):
+    cache = SessionAccessCache()
+    monkeypatch.setattr(cache.entries, "maxsize", 2)
+    for session_id in ("a", "b", "c"):
+        cache.entries.set(session_id, object())
+    assert list(cache.entries.entries) == ["b", "c"]
+
+
+def test_leaving_hands_the_host_to_the_next_participant():
+    async def body(client):
+        host = await register(client)
+        member = await register(client)
+        group, subject = await create_group(client, host, cards=1)
+        response = await client.post("/api/lobby/create", json={"subject_name": subject, "group_name": group}, headers=host)
+        session_id, join_code = response.json()["session"]["id"], response.json()["session"]["join_code"]
+        assert (await client.post("/api/lobby/join", json={"join_code": join_code}, headers=member)).status_code == 200
+        host_id = (await client.get("/me", headers=host)).json()["id"]
+        member_id = (await client.get("/me", headers=member)).json()["id"]
+
+        db = SessionLocal()
+        try:
+            assert session_access.is_host(db, session_id, host_id)
+            assert (await client.post(f"/api/session/leave/{session_id}", headers=host)).status_code == 200
+            assert session_access.is_host(db, session_id, member_id)
+            assert not session_access.is_host(db, session_id, host_id)
+        finally:
+            db.close()
+    run(body)
+
+
+def test_leaving_a_deleted_session_is_not_found():
+    async def body(client):
+        user = await register(client)
+        user_id = (await client.get("/me", headers=user)).json()["id"]
+        session_id = str(uuid.uuid4())
+        db = SessionLocal()
+        try:
+            db.add(SessionParticipant(session_id=session_id, user_id=user_id))
+            db.commit()
+        finally:
+            db.close()
+        return (await client.post(f"/api/session/leave/{session_id}", headers=user)).status_code
+    assert run(body) == 404
+
+
+def test_membership_updates_are_not_counted_as_lookups():
+    cache = SessionAccessCache()
+    cache.add_participant("missing", 1)
+    assert (cache.entries.hits, cache.entries.misses) == (0, 0)